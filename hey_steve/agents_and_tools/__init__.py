@@ -1,3 +1,10 @@
 from .loot_table_tool import LootTableTool
 from .retriever_tool import RetrieverTool
 from .recipe_tool import RecipeTool
+from .name_index import NameIndex
+from .mc_data_store import McDataStore
+from .recipe_graph import RecipeGraph
+from .crafting_tree_tool import CraftingTreeTool
+from .reverse_index import ReverseIndex
+from .item_uses_tool import ItemUsesTool
+from .item_drops_tool import ItemDropsTool
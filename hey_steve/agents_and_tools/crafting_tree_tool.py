@@ -0,0 +1,44 @@
+from smolagents import Tool
+from typing import Optional
+from .recipe_graph import RecipeGraph
+
+
+class CraftingTreeTool(Tool):
+    name = "crafting_tree_look_up"
+    description = (
+        "Resolves the full crafting tree of an item in Minecraft, with every intermediate step and the total raw materials needed, in a single call."
+    )
+    inputs = {
+        "item_name": {
+            "type": "string",
+            "description": "The item to craft in the form of lower_case_word.",
+        },
+        "count": {
+            "type": "integer",
+            "description": "How many of the item to craft. Defaults to 1.",
+            "nullable": True,
+        }
+    }
+    output_type = "string"
+
+    def __init__(self, recipe_graph: RecipeGraph, **kwargs):
+        super().__init__(**kwargs)
+        self.recipe_graph = recipe_graph
+
+    def forward(self, item_name: str, count: Optional[int] = None) -> str:
+        assert isinstance(item_name, str), "Your item_name must be a string"
+
+        item_name = item_name.lower()
+        count = 1 if count is None else count
+        if count < 1:
+            return f"count must be at least 1, got {count}."
+        tree = self.recipe_graph.render(item_name, count)
+
+        if tree is not None:
+            return tree
+        elif self.recipe_graph.is_raw_material(item_name):
+            return f"{item_name} is a raw material, it is not crafted from other items."
+        else:
+            possible_matches = self.recipe_graph.store.recipe_index.search(item_name)
+
+            return f"No exact match is found, but here are a list of possible matches: " + ", ".join(possible_matches)
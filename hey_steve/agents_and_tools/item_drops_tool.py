@@ -0,0 +1,35 @@
+from smolagents import Tool
+from .reverse_index import ReverseIndex
+
+
+class ItemDropsTool(Tool):
+    name = "item_drops_look_up"
+    description = (
+        "Lists every block, entity, chest or other loot table in Minecraft that can drop an item, with the chance, count and conditions of the drop."
+    )
+    inputs = {
+        "item_name": {
+            "type": "string",
+            "description": "The item to look up in the form of lower_case_word.",
+        }
+    }
+    output_type = "string"
+
+    def __init__(self, reverse_index: ReverseIndex, **kwargs):
+        super().__init__(**kwargs)
+        self.reverse_index = reverse_index
+
+    def forward(self, item_name: str) -> str:
+        assert isinstance(item_name, str), "Your item_name must be a string"
+
+        item_name = item_name.lower()
+        drops = self.reverse_index.render_drops(item_name)
+
+        if drops is not None:
+            return drops
+        elif item_name in self.reverse_index.uses:
+            return f"{item_name} is not dropped by any loot table."
+        else:
+            possible_matches = self.reverse_index.item_index.search(item_name)
+
+            return f"No exact match is found, but here are a list of possible matches: " + ", ".join(possible_matches)
@@ -0,0 +1,35 @@
+from smolagents import Tool
+from .reverse_index import ReverseIndex
+
+
+class ItemUsesTool(Tool):
+    name = "item_uses_look_up"
+    description = (
+        "Lists every crafting, smelting, smithing or stonecutting recipe that consumes an item in Minecraft, i.e. what the item can be used to make."
+    )
+    inputs = {
+        "item_name": {
+            "type": "string",
+            "description": "The item to look up in the form of lower_case_word.",
+        }
+    }
+    output_type = "string"
+
+    def __init__(self, reverse_index: ReverseIndex, **kwargs):
+        super().__init__(**kwargs)
+        self.reverse_index = reverse_index
+
+    def forward(self, item_name: str) -> str:
+        assert isinstance(item_name, str), "Your item_name must be a string"
+
+        item_name = item_name.lower()
+        uses = self.reverse_index.render_uses(item_name)
+
+        if uses is not None:
+            return uses
+        elif item_name in self.reverse_index.drops:
+            return f"{item_name} is not used in any recipe."
+        else:
+            possible_matches = self.reverse_index.item_index.search(item_name)
+
+            return f"No exact match is found, but here are a list of possible matches: " + ", ".join(possible_matches)
@@ -1,6 +1,7 @@
-
 from smolagents import Tool
-import os
+from typing import Optional
+from .name_index import NameIndex
+from .mc_data_store import McDataStore
 
 
 class LootTableTool(Tool):
@@ -16,43 +17,31 @@ class LootTableTool(Tool):
     }
     output_type = "string"
 
-    def __init__(self, directory: str = "data/mc/loot_table", **kwargs):
+    def __init__(self, directory: str = "data/mc/loot_table", name_index: Optional[NameIndex] = None,
+                 store: Optional[McDataStore] = None, **kwargs):
         super().__init__(**kwargs)
         self.directory = directory
-        self.loot_table_files = self._get_all_loot_table_files(directory)
-
-    def _get_all_loot_table_files(self, directory):
-        """Recursively gets all JSON loot table files in the given directory and its subdirectories."""
-        loot_table_files = []
-        for root, _, files in os.walk(directory):
-            for file in files:
-                if file.endswith('.json'):
-                    loot_table_files.append(os.path.join(root, file))
-        return loot_table_files
+        self.store = store
+        if store is not None:
+            name_index = name_index or store.loot_table_index
+        self.name_index = name_index or NameIndex.from_directory(
+            directory, recursive=True)
+        self.loot_table_files = [
+            path for paths in self.name_index.entries.values() for path in paths]
 
     def forward(self, target_name: str) -> str:
         assert isinstance(
             target_name, str), "Your target_name must be a string"
 
         target_name = target_name.lower()
-        exact_match = None
-        for loot_table_path in self.loot_table_files:
-            loot_table_filename = os.path.basename(loot_table_path)
-            if loot_table_filename == target_name + ".json":
-                exact_match = loot_table_path
-                break
+        exact_match = self.name_index.paths(target_name)
 
-        if exact_match:
-            with open(exact_match, "r") as f:
+        if exact_match and self.store is not None:
+            return f"The loot table for {target_name} is \n" + self.store.render_loot_table(exact_match[0])
+        elif exact_match:
+            with open(exact_match[0], "r") as f:
                 return f"The loot table for {target_name} is \n" + f.read()
         else:
-            target_name_parts = target_name.split("_")
-            possible_matches = set()
-            for part in target_name_parts:
-                for loot_table_path in self.loot_table_files:
-                    loot_table_filename = os.path.basename(loot_table_path)
-                    if part in loot_table_filename:
-                        possible_matches.add(
-                            loot_table_filename.strip(".json"))
+            possible_matches = self.name_index.search(target_name)
 
-            return f"No exact match is found, but here are a list of possible matches:" + ", ".join(possible_matches)
+            return f"No exact match is found, but here are a list of possible matches: " + ", ".join(possible_matches)
@@ -0,0 +1,432 @@
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+from .name_index import NameIndex
+
+STORE_VERSION = 2
+COOKING_TYPES = {"smelting", "blasting", "smoking", "campfire_cooking"}
+
+
+def _strip_namespace(identifier: str) -> str:
+    return sys.intern(identifier.replace("minecraft:", ""))
+
+
+def _intern(value: Any) -> Any:
+    """Recursively interns the strings of a JSON value, so repeated item names share memory."""
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, list):
+        return [_intern(v) for v in value]
+    if isinstance(value, dict):
+        return {sys.intern(k): _intern(v) for k, v in value.items()}
+    return value
+
+
+def _normalize_ingredient(ingredient: Any) -> List[str]:
+    """Normalizes every ingredient format into a list of alternatives; tags keep their leading '#'."""
+    if isinstance(ingredient, str):
+        return [_strip_namespace(ingredient)]
+    if isinstance(ingredient, list):
+        return [alt for option in ingredient for alt in _normalize_ingredient(option)]
+    if isinstance(ingredient, dict):
+        if "tag" in ingredient:
+            return [_strip_namespace("#" + ingredient["tag"])]
+        if "item" in ingredient:
+            return [_strip_namespace(ingredient["item"])]
+    return []
+
+
+def _normalize_result(recipe: Dict[str, Any]) -> Optional[List[Any]]:
+    result = recipe.get("result")
+    if result is None:
+        return None
+    if isinstance(result, str):
+        return [_strip_namespace(result), recipe.get("count", 1)]
+    item = result.get("id", result.get("item"))
+    if item is None:
+        return None
+    return [_strip_namespace(item), result.get("count", recipe.get("count", 1))]
+
+
+def normalize_recipe(recipe: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Converts a recipe JSON file into a compact form that is the same for every game version.
+
+    Args:
+        recipe: The parsed recipe JSON.
+
+    Returns:
+        A dict with the recipe type without namespace, the result as [item, count], and
+        whichever of pattern, key, ingredients, ingredient, template, base, addition,
+        experience and cookingtime the type uses. Ingredients are lists of alternatives.
+    """
+    recipe_type = _strip_namespace(recipe.get("type", "unknown"))
+    normalized: Dict[str, Any] = {"type": recipe_type}
+    result = _normalize_result(recipe)
+    if result is not None:
+        normalized["result"] = result
+
+    if "pattern" in recipe:
+        normalized["pattern"] = [sys.intern(row) for row in recipe["pattern"]]
+        normalized["key"] = {sys.intern(symbol): _normalize_ingredient(ingredient)
+                             for symbol, ingredient in recipe.get("key", {}).items()}
+    if "ingredients" in recipe:
+        normalized["ingredients"] = [_normalize_ingredient(ingredient)
+                                     for ingredient in recipe["ingredients"]]
+    for field in ("ingredient", "template", "base", "addition", "input", "material"):
+        if field in recipe:
+            normalized[field] = _normalize_ingredient(recipe[field])
+    for field in ("experience", "cookingtime"):
+        if field in recipe:
+            normalized[field] = recipe[field]
+    return normalized
+
+
+def normalize_tag(tag: Dict[str, Any]) -> List[str]:
+    """
+    Converts an item tag JSON file into the list of its values.
+
+    Args:
+        tag: The parsed tag JSON.
+
+    Returns:
+        The item names of the tag without namespace. Nested tags keep their leading '#'.
+    """
+    values = []
+    for value in tag.get("values", []):
+        if isinstance(value, dict):  # {"id": ..., "required": false}
+            value = value.get("id", "")
+        values.append(_strip_namespace(value))
+    return values
+
+
+def flatten_tags(tags: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """
+    Resolves nested tags, so each tag maps to the items it contains.
+
+    Args:
+        tags: Normalized tags, whose values may reference other tags with a leading '#'.
+
+    Returns:
+        Each tag mapped to its items, in order and without duplicates.
+    """
+    def flatten(tag: str, seen: set) -> List[str]:
+        seen.add(tag)
+        members = []
+        for value in tags.get(tag, []):
+            if value.startswith("#"):
+                if value[1:] not in seen:
+                    members.extend(m for m in flatten(value[1:], seen) if m not in members)
+            elif value not in members:
+                members.append(value)
+        return members
+
+    return {tag: flatten(tag, set()) for tag in tags}
+
+
+def _normalize_number(value: Any) -> Any:
+    """Reduces a number provider to a number or a [min, max] range where possible."""
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, dict):
+        provider = _strip_namespace(value.get("type", "uniform"))
+        if provider == "constant":
+            return value.get("value")
+        if provider == "uniform" and "min" in value and "max" in value:
+            return [_normalize_number(value["min"]), _normalize_number(value["max"])]
+        if provider == "binomial":
+            return {"binomial": [_normalize_number(value.get("n")), _normalize_number(value.get("p"))]}
+    return None
+
+
+def _normalize_condition(condition: Dict[str, Any]) -> str:
+    """Renders a loot condition as a short string, e.g. 'random_chance 0.05' or 'not(match_tool silk_touch)'."""
+    name = _strip_namespace(condition.get("condition", "unknown"))
+    if name == "inverted":
+        return f"not({_normalize_condition(condition.get('term', {}))})"
+    if name in ("any_of", "alternative", "all_of"):
+        joiner = " and " if name == "all_of" else " or "
+        return "(" + joiner.join(_normalize_condition(term) for term in condition.get("terms", [])) + ")"
+    if name == "random_chance":
+        chance = condition.get("chance")
+        return f"random_chance {chance}" if isinstance(chance, (int, float)) else name
+    if name == "random_chance_with_looting":
+        return f"random_chance {condition.get('chance')} (+{condition.get('looting_multiplier')}/looting level)"
+    if name == "random_chance_with_enchanted_bonus":
+        chance = condition.get("unenchanted_chance")
+        return f"random_chance {chance} (+looting bonus)" if chance is not None else name
+    if name == "table_bonus":
+        return f"table_bonus {_strip_namespace(condition.get('enchantment', ''))} {condition.get('chances')}"
+    if name == "match_tool":
+        predicate = condition.get("predicate", {})
+        details = []
+        items = predicate.get("items")
+        if items:
+            details.append("|".join(_normalize_ingredient(items)))
+        enchantments = predicate.get("enchantments") or \
+            predicate.get("predicates", {}).get("minecraft:enchantments", [])
+        for enchantment in enchantments:
+            enchantment_ids = enchantment.get("enchantments", enchantment.get("enchantment", ""))
+            details.append("|".join(_normalize_ingredient(enchantment_ids)) or "enchanted")
+        return "match_tool " + " ".join(details) if details else name
+    return name
+
+
+def _normalize_functions(functions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    normalized: Dict[str, Any] = {}
+    bonuses = []
+    for function in functions:
+        name = _strip_namespace(function.get("function", ""))
+        if name == "set_count":
+            normalized["count"] = _normalize_number(function.get("count"))
+        elif name == "apply_bonus":
+            bonuses.append(_strip_namespace(function.get("enchantment", "fortune")))
+        elif name in ("looting_enchant", "enchanted_count_increase"):
+            bonuses.append("looting")
+    if bonuses:
+        normalized["bonus"] = bonuses
+    return normalized
+
+
+def _normalize_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    kind = _strip_namespace(entry.get("type", "item"))
+    normalized: Dict[str, Any] = {"kind": kind}
+    if "name" in entry:
+        normalized["name"] = _strip_namespace(entry["name"])
+    if isinstance(entry.get("value"), str):  # nested loot tables by reference in newer versions
+        normalized["name"] = _strip_namespace(entry["value"])
+    if "weight" in entry:
+        normalized["weight"] = entry["weight"]
+    if entry.get("conditions"):
+        normalized["conditions"] = [_normalize_condition(c) for c in entry["conditions"]]
+    normalized.update(_normalize_functions(entry.get("functions", [])))
+    if entry.get("children"):
+        normalized["children"] = [_normalize_entry(child) for child in entry["children"]]
+    return normalized
+
+
+def normalize_loot_table(loot_table: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Converts a loot table JSON file into a compact form.
+
+    Args:
+        loot_table: The parsed loot table JSON.
+
+    Returns:
+        A dict with the table type and its pools. Each pool has its rolls, conditions and
+        entries; each entry has its kind, name, weight, count, bonus enchantments,
+        conditions and children, where present. Conditions are short strings.
+    """
+    pools = []
+    for pool in loot_table.get("pools", []):
+        normalized_pool: Dict[str, Any] = {
+            "rolls": _normalize_number(pool.get("rolls", 1)),
+            "entries": [_normalize_entry(entry) for entry in pool.get("entries", [])]
+        }
+        if pool.get("conditions"):
+            normalized_pool["conditions"] = [_normalize_condition(c) for c in pool["conditions"]]
+        pools.append(normalized_pool)
+    return {"type": _strip_namespace(loot_table.get("type", "generic")), "pools": pools}
+
+
+def _format_number(value: Any) -> str:
+    if isinstance(value, list):
+        return f"{value[0]}-{value[1]}" if value[0] != value[1] else str(value[0])
+    if isinstance(value, dict) and "binomial" in value:
+        n, p = value["binomial"]
+        return f"binomial(n={n}, p={p})"
+    return "?" if value is None else str(value)
+
+
+def _format_ingredient(alternatives: List[str]) -> str:
+    return " or ".join(f"any {alt}" if alt.startswith("#") else alt for alt in alternatives) or "nothing"
+
+
+class McDataStore:
+    """
+    Every recipe and loot table, preloaded into a compact in-memory store.
+
+    Recipes are keyed by file name, loot tables by their path relative to the loot table
+    directory (e.g. "blocks/diamond_ore") and item tags by their name. All are normalized with interned strings
+    and can be rendered as short plain-text summaries, which cost far fewer LLM input
+    tokens than the raw JSON. The store can be cached as one consolidated JSON file, so
+    later startups read a single file instead of thousands.
+    """
+
+    def __init__(self,
+                 recipes: Dict[str, Dict[str, Any]],
+                 loot_tables: Dict[str, Dict[str, Any]],
+                 tags: Optional[Dict[str, List[str]]] = None):
+        """
+        Initializes the store from normalized data and builds the name indexes.
+
+        Args:
+            recipes (Dict[str, Dict[str, Any]]): Normalized recipes keyed by recipe name.
+            loot_tables (Dict[str, Dict[str, Any]]): Normalized loot tables keyed by relative path without extension.
+            tags (Optional[Dict[str, List[str]]]): Normalized item tags keyed by tag name.
+        """
+        self.recipes = recipes
+        self.loot_tables = loot_tables
+        self.tags = tags or {}
+        self.fingerprint: Optional[List[List[float]]] = None
+        self.recipe_index = NameIndex({name: [name] for name in recipes})
+        loot_table_entries: Dict[str, List[str]] = {}
+        for path in sorted(loot_tables):
+            loot_table_entries.setdefault(path.rsplit("/", 1)[-1], []).append(path)
+        self.loot_table_index = NameIndex(loot_table_entries)
+
+    @classmethod
+    def load(cls,
+             recipe_dir: str = "data/mc/recipe",
+             loot_table_dir: str = "data/mc/loot_table",
+             tag_dir: str = "data/mc/tags/item",
+             cache_path: Optional[str] = "data/mc/mc_data_store.json") -> "McDataStore":
+        """
+        Loads the store from the consolidated cache, or from the data directories if the cache is missing or stale.
+
+        Args:
+            recipe_dir (str): The directory of recipe JSON files.
+            loot_table_dir (str): The directory of loot table JSON files, searched recursively.
+            tag_dir (str): The directory of item tag JSON files. It is optional, recipes using tags then show the tag names only.
+            cache_path (Optional[str]): The consolidated cache file. None disables caching.
+
+        Returns:
+            McDataStore: The loaded store.
+        """
+        fingerprint = [_directory_fingerprint(recipe_dir), _directory_fingerprint(loot_table_dir),
+                       _directory_fingerprint(tag_dir)]
+        if cache_path is not None and os.path.exists(cache_path):
+            with open(cache_path, "r") as f:
+                cached = json.load(f)
+            if cached.get("version") == STORE_VERSION and cached.get("fingerprint") == fingerprint:
+                store = cls(_intern(cached["recipes"]), _intern(cached["loot_tables"]), _intern(cached["tags"]))
+                store.fingerprint = fingerprint
+                return store
+
+        recipes = {name: normalize_recipe(data)
+                   for name, data in _read_json_files(recipe_dir).items()}
+        loot_tables = {name: normalize_loot_table(data)
+                       for name, data in _read_json_files(loot_table_dir).items()}
+        tags = {name: normalize_tag(data)
+                for name, data in _read_json_files(tag_dir).items()}
+
+        if cache_path is not None:
+            tmp_path = cache_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"version": STORE_VERSION, "fingerprint": fingerprint,
+                           "recipes": recipes, "loot_tables": loot_tables, "tags": tags},
+                          f, separators=(",", ":"))
+            os.replace(tmp_path, cache_path)
+        store = cls(recipes, loot_tables, tags)
+        store.fingerprint = fingerprint
+        return store
+
+    def render_recipe(self, name: str) -> Optional[str]:
+        """Renders a recipe as a short plain-text summary, or returns None if there is no such recipe."""
+        recipe = self.recipes.get(name)
+        if recipe is None:
+            return None
+
+        recipe_type = recipe["type"]
+        lines = [f"Recipe {name} ({recipe_type})"]
+        if "result" in recipe:
+            item, count = recipe["result"]
+            lines.append(f"result: {item}" + (f" x{count}" if count != 1 else ""))
+        if "pattern" in recipe:
+            lines.append("pattern (3x3 crafting grid, ' ' is empty):")
+            lines.extend(f"  {row}" for row in recipe["pattern"])
+            lines.extend(f"  {symbol} = {_format_ingredient(alternatives)}"
+                         for symbol, alternatives in recipe["key"].items())
+            lines.append("The shape can be placed anywhere in the grid as long as it stays intact.")
+        if "ingredients" in recipe:
+            counts: Dict[str, int] = {}
+            for alternatives in recipe["ingredients"]:
+                label = _format_ingredient(alternatives)
+                counts[label] = counts.get(label, 0) + 1
+            lines.append("ingredients (any arrangement): " +
+                         ", ".join(f"{count}x {label}" for label, count in counts.items()))
+        for field in ("ingredient", "template", "base", "addition", "input", "material"):
+            if field in recipe:
+                lines.append(f"{field}: {_format_ingredient(recipe[field])}")
+        if recipe_type in COOKING_TYPES:
+            lines.append(f"cooking: {recipe.get('experience', 0)} xp, {recipe.get('cookingtime', '?')} ticks")
+        if recipe_type.startswith("crafting_special"):
+            lines.append("Special recipe without fixed ingredients.")
+        return "\n".join(lines)
+
+    def render_loot_table(self, path: str) -> Optional[str]:
+        """Renders a loot table as a short plain-text summary, or returns None if there is no such loot table."""
+        loot_table = self.loot_tables.get(path)
+        if loot_table is None:
+            return None
+
+        lines = [f"Loot table {path} ({loot_table['type']})"]
+        if not loot_table["pools"]:
+            lines.append("Drops nothing.")
+        for i, pool in enumerate(loot_table["pools"], start=1):
+            header = f"Pool {i}, rolls {_format_number(pool['rolls'])}"
+            if pool.get("conditions"):
+                header += f", only if {' and '.join(pool['conditions'])}"
+            lines.append(header + ":")
+            total_weight = sum(entry.get("weight", 1) for entry in pool["entries"])
+            for entry in pool["entries"]:
+                lines.extend(_render_entry(entry, total_weight, depth=1))
+        return "\n".join(lines)
+
+
+def _render_entry(entry: Dict[str, Any], total_weight: int, depth: int) -> List[str]:
+    indent = "  " * depth
+    kind = entry["kind"]
+    if kind == "empty":
+        label = "nothing"
+    elif kind == "tag":
+        label = f"any #{entry.get('name', '')}"
+    elif kind == "loot_table":
+        label = f"loot table {entry.get('name', '')}"
+    elif "children" in entry:
+        label = {"alternatives": "first matching of", "group": "all of",
+                 "sequence": "in sequence until one fails"}.get(kind, kind)
+    else:
+        label = entry.get("name", kind)
+
+    details = []
+    if "count" in entry:
+        details.append(f"x{_format_number(entry['count'])}")
+    if total_weight > 1 and "children" not in entry:
+        details.append(f"weight {entry.get('weight', 1)}/{total_weight}")
+    if "bonus" in entry:
+        details.append("+" + "/".join(entry["bonus"]) + " bonus")
+    if "conditions" in entry:
+        details.append("if " + " and ".join(entry["conditions"]))
+
+    lines = [f"{indent}- {label}" + (f" ({', '.join(details)})" if details else "")]
+    for child in entry.get("children", []):
+        lines.extend(_render_entry(child, 1, depth + 1))
+    return lines
+
+
+def _read_json_files(directory: str) -> Dict[str, Dict[str, Any]]:
+    """Reads every JSON file under a directory, keyed by its relative path without extension."""
+    data = {}
+    for root, _, files in os.walk(directory):
+        for file in sorted(files):
+            if not file.endswith(".json"):
+                continue
+            path = os.path.join(root, file)
+            name = os.path.relpath(path, directory)[:-len(".json")].replace(os.sep, "/")
+            with open(path, "r") as f:
+                data[name] = json.load(f)
+    return data
+
+
+def _directory_fingerprint(directory: str) -> List[float]:
+    """Returns the number of JSON files under a directory and their latest modification time."""
+    count, latest = 0, 0.0
+    for root, _, files in os.walk(directory):
+        for file in files:
+            if file.endswith(".json"):
+                count += 1
+                latest = max(latest, os.path.getmtime(os.path.join(root, file)))
+    return [count, latest]
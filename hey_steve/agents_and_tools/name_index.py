@@ -0,0 +1,110 @@
+import os
+from typing import Dict, Iterable, List, Optional, Set
+
+from fuzzywuzzy import fuzz
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """
+    An index over lower_case_word names for exact, partial and typo-tolerant lookups.
+
+    It holds a dict from name to the files defining it for exact hits, a token to names
+    inverted index for partial matches ("oak" -> "oak_planks", "oak_door", ...), and a
+    trigram to names index for misspellings ("netherite_ingto"). Candidates from the two
+    inverted indexes are ranked with fuzzywuzzy, so lookups never scan every name.
+    """
+
+    def __init__(self, entries: Dict[str, List[str]]):
+        """
+        Builds the index.
+
+        Args:
+            entries (Dict[str, List[str]]): Maps each name to the paths of the files defining it.
+        """
+        self.entries = entries
+        self._tokens: Dict[str, Set[str]] = {}
+        self._trigrams: Dict[str, Set[str]] = {}
+        for name in entries:
+            for token in name.split("_"):
+                self._tokens.setdefault(token, set()).add(name)
+            for trigram in _trigrams(name):
+                self._trigrams.setdefault(trigram, set()).add(name)
+
+    @classmethod
+    def from_directory(cls, directory: str, recursive: bool = False, extension: str = ".json") -> "NameIndex":
+        """
+        Indexes the file names in a directory, without their extension.
+
+        Args:
+            directory (str): The directory to index.
+            recursive (bool): Whether to include subdirectories, as loot tables are grouped by type.
+            extension (str): Only files with this extension are indexed.
+
+        Returns:
+            NameIndex: The index.
+        """
+        entries: Dict[str, List[str]] = {}
+        if recursive:
+            walk: Iterable = os.walk(directory)
+        else:
+            walk = [(directory, None, os.listdir(directory))]
+        for root, _, files in walk:
+            for file in sorted(files):
+                if file.endswith(extension):
+                    entries.setdefault(file[:-len(extension)], []).append(
+                        os.path.join(root, file))
+        return cls(entries)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def names(self) -> List[str]:
+        """Returns every indexed name."""
+        return list(self.entries)
+
+    def paths(self, name: str) -> Optional[List[str]]:
+        """Returns the files defining an exact name, or None if the name is not indexed."""
+        return self.entries.get(name)
+
+    def search(self, query: str, limit: int = 10, min_score: int = 50) -> List[str]:
+        """
+        Finds the indexed names closest to a query.
+
+        Args:
+            query (str): The name to look for, in the form of lower_case_word.
+            limit (int): The largest number of names to return.
+            min_score (int): The lowest fuzzywuzzy WRatio score (0-100) a name needs to be returned.
+
+        Returns:
+            List[str]: The matching names, best first.
+        """
+        query = query.lower()
+        token_matches: Set[str] = set()
+        for token in query.split("_"):
+            token_matches.update(self._tokens.get(token, ()))
+        candidates = set(token_matches)
+
+        # Names sharing at least a third of the query's trigrams catch partial words and typos
+        query_trigrams = _trigrams(query)
+        shared: Dict[str, int] = {}
+        for trigram in query_trigrams:
+            for name in self._trigrams.get(trigram, ()):
+                shared[name] = shared.get(name, 0) + 1
+        threshold = max(1, len(query_trigrams) // 3)
+        candidates.update(name for name, count in shared.items() if count >= threshold)
+
+        spaced_query = query.replace("_", " ")
+        # Sharing a whole word with the query outranks a mere spelling resemblance
+        scored = [(fuzz.WRatio(spaced_query, name.replace("_", " ")) + 10 * (name in token_matches), name)
+                  for name in candidates]
+        scored = [(score, name) for score, name in scored if score >= min_score]
+        scored.sort(key=lambda x: (-x[0], len(x[1]), x[1]))
+        return [name for _, name in scored[:limit]]
@@ -0,0 +1,282 @@
+import math
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .mc_data_store import McDataStore, flatten_tags
+
+# Recipe types that turn ingredients into an item, in order of preference between equally cheap recipes
+CRAFTING_TYPES = ["crafting_shaped", "crafting_shapeless", "stonecutting", "smelting", "blasting",
+                  "smoking", "campfire_cooking", "smithing_transform", "crafting_transmute"]
+INGREDIENT_FIELDS = ("ingredient", "template", "base", "addition", "input", "material")
+
+
+def recipe_slots(recipe: Dict[str, Any]) -> List[Tuple[List[str], int]]:
+    """
+    Lists what one craft of a normalized recipe consumes.
+
+    Args:
+        recipe: A recipe normalized by `normalize_recipe`.
+
+    Returns:
+        A list of (alternatives, quantity) pairs. Identical slots of shaped and shapeless
+        recipes are merged, so a pickaxe consumes ([#planks], 3) and ([stick], 2).
+    """
+    quantities: Dict[Tuple[str, ...], int] = {}
+    if "pattern" in recipe:
+        for symbol, alternatives in recipe["key"].items():
+            count = sum(row.count(symbol) for row in recipe["pattern"])
+            if alternatives and count:
+                key = tuple(alternatives)
+                quantities[key] = quantities.get(key, 0) + count
+    for alternatives in recipe.get("ingredients", []):
+        if alternatives:
+            key = tuple(alternatives)
+            quantities[key] = quantities.get(key, 0) + 1
+    for field in INGREDIENT_FIELDS:
+        if recipe.get(field):
+            key = tuple(recipe[field])
+            quantities[key] = quantities.get(key, 0) + 1
+    return [(list(key), count) for key, count in quantities.items()]
+
+
+class RecipeGraph:
+    """
+    A dependency graph of every recipe, resolving full crafting trees in one call.
+
+    Each item gets a cost, the number of raw materials one unit of it takes, computed once
+    for the whole graph by relaxing every recipe until no cost improves (Bellman-Ford
+    style). The cheapest recipe of an item is its preferred recipe, and tags and
+    alternative ingredients resolve to their cheapest member, so a crafting tree is a
+    plain walk down preferred recipes. Leftovers of a craft (4 sticks when 2 are needed)
+    are reused by later steps of the same tree.
+
+    Cycles are handled in two ways. Decompression recipes (1 iron_block -> 9 iron_ingot),
+    whose sole ingredient can be crafted back from their result, are ignored, so storage
+    blocks never count as a source of their own ingredients. Any remaining cycle only
+    produces an item through itself, so its cost never becomes finite through it; items
+    that are only craftable through such a cycle count as raw. Items without a usable
+    recipe are raw materials.
+    """
+
+    def __init__(self, store: McDataStore, max_depth: int = 16, cache_size: int = 256):
+        """
+        Builds the graph and precomputes the preferred recipe of every item.
+
+        Args:
+            store (McDataStore): The store holding the recipes and item tags.
+            max_depth (int): The deepest a crafting tree is expanded before the remaining items count as raw.
+            cache_size (int): The number of resolved crafting trees kept in memory.
+        """
+        self.store = store
+        self.max_depth = max_depth
+        self.cache_size = cache_size
+        self._trees: "OrderedDict[Tuple[str, int], Dict[str, Any]]" = OrderedDict()
+
+        self.tag_members = flatten_tags(store.tags)
+        self.producers: Dict[str, List[str]] = {}
+        for name in sorted(store.recipes, key=self._recipe_order):
+            recipe = store.recipes[name]
+            if recipe["type"] in CRAFTING_TYPES and "result" in recipe and recipe_slots(recipe):
+                self.producers.setdefault(recipe["result"][0], []).append(name)
+        self._drop_decompression_recipes()
+
+        self.costs, self.best_recipe = self._compute_costs()
+        self.items = self._known_items()
+
+    def _known_items(self) -> set:
+        """Collects every item that is an ingredient, a tag member or a result of a recipe."""
+        items = {member for members in self.tag_members.values() for member in members}
+        for recipe in self.store.recipes.values():
+            if recipe.get("result"):
+                items.add(recipe["result"][0])
+            for alternatives, _ in recipe_slots(recipe):
+                items.update(option for alternative in alternatives for option in self._options(alternative)
+                             if not option.startswith("#"))
+        return items
+
+    def is_raw_material(self, item: str) -> bool:
+        """Whether an item is known from the recipes but has no recipe to craft it from."""
+        return item in self.items and item not in self.best_recipe
+
+    def _recipe_order(self, name: str) -> Tuple[int, str]:
+        recipe_type = self.store.recipes[name]["type"]
+        rank = CRAFTING_TYPES.index(recipe_type) if recipe_type in CRAFTING_TYPES else len(CRAFTING_TYPES)
+        return (rank, name)
+
+    def _drop_decompression_recipes(self) -> None:
+        """Removes recipes like iron_block -> 9 iron_ingot whose only ingredient is crafted from their result."""
+        for item, names in self.producers.items():
+            kept = []
+            for name in names:
+                recipe = self.store.recipes[name]
+                slots = recipe_slots(recipe)
+                reversible = recipe["result"][1] > 1 and len(slots) == 1 and any(
+                    item in alternatives
+                    for source in slots[0][0]
+                    for other in self.producers.get(source, [])
+                    for alternatives, _ in recipe_slots(self.store.recipes[other]))
+                if not reversible:
+                    kept.append(name)
+            self.producers[item] = kept
+
+    def _options(self, alternative: str) -> List[str]:
+        """Expands an ingredient alternative into items; a tag becomes its members."""
+        if alternative.startswith("#") and self.tag_members.get(alternative[1:]):
+            return self.tag_members[alternative[1:]]
+        return [alternative]
+
+    def _recipe_cost(self, name: str, costs: Dict[str, float]) -> float:
+        recipe = self.store.recipes[name]
+        total = 0.0
+        for alternatives, quantity in recipe_slots(recipe):
+            total += quantity * min(costs.get(option, 1.0)
+                                    for alternative in alternatives
+                                    for option in self._options(alternative))
+        return total / recipe["result"][1]
+
+    def _compute_costs(self) -> Tuple[Dict[str, float], Dict[str, str]]:
+        """
+        Computes the cost and preferred recipe of every craftable item.
+
+        Items with recipes start at infinity and everything else is raw at 1. Items still
+        at infinity after relaxing are only craftable through a cycle, so they become raw
+        too and the recipes using them are relaxed again.
+        """
+        costs = {item: math.inf for item, names in self.producers.items() if names}
+        best_recipe: Dict[str, str] = {}
+        self._relax(costs, best_recipe)
+        stuck = [item for item, cost in costs.items() if math.isinf(cost)]
+        if stuck:
+            costs.update((item, 1.0) for item in stuck)
+            self._relax(costs, best_recipe)
+        return costs, best_recipe
+
+    def _relax(self, costs: Dict[str, float], best_recipe: Dict[str, str], max_passes: int = 64) -> None:
+        for _ in range(max_passes):
+            changed = False
+            for item, names in self.producers.items():
+                for name in names:
+                    cost = self._recipe_cost(name, costs)
+                    # Strictly cheaper only, so ties keep the earlier recipe in preference order
+                    if cost < costs[item] * (1 - 1e-9):
+                        costs[item] = cost
+                        best_recipe[item] = name
+                        changed = True
+            if not changed:
+                break
+
+    def _cheapest_option(self, alternatives: List[str]) -> str:
+        options = [option for alternative in alternatives for option in self._options(alternative)]
+        return min(options, key=lambda option: self.costs.get(option, 1.0))
+
+    def resolve(self, item: str, count: int = 1) -> Dict[str, Any]:
+        """
+        Resolves the full crafting tree and raw material bill of an item.
+
+        Args:
+            item (str): The item to craft, in the form of lower_case_word.
+            count (int): How many of the item are wanted, at least 1.
+
+        Returns:
+            Dict[str, Any]: The item, the count, the tree of crafting steps, the raw materials
+            and the leftovers. Trees are memoized, so the result must not be modified.
+
+        Raises:
+            ValueError: If count is less than 1.
+        """
+        if count < 1:
+            raise ValueError(f"count must be at least 1, got {count}")
+        key = (item, count)
+        if key in self._trees:
+            self._trees.move_to_end(key)
+            return self._trees[key]
+
+        raw: Dict[str, int] = {}
+        surplus: Dict[str, int] = {}
+        tree = self._expand(item, count, raw, surplus, [])
+        result = {
+            "item": item,
+            "count": count,
+            "tree": tree,
+            "raw_materials": raw,
+            "leftovers": {name: amount for name, amount in surplus.items() if amount > 0}
+        }
+        self._trees[key] = result
+        if len(self._trees) > self.cache_size:
+            self._trees.popitem(last=False)
+        return result
+
+    def _expand(self, item: str, count: int, raw: Dict[str, int], surplus: Dict[str, int],
+                stack: List[str]) -> Dict[str, Any]:
+        node: Dict[str, Any] = {"item": item, "count": count}
+        reused = min(surplus.get(item, 0), count)
+        if reused:
+            surplus[item] -= reused
+            node["from_leftovers"] = reused
+        needed = count - reused
+        if needed == 0:
+            return node
+
+        name = self.best_recipe.get(item)
+        if name is None or item in stack or len(stack) >= self.max_depth:
+            raw[item] = raw.get(item, 0) + needed
+            node["raw"] = True
+            return node
+
+        recipe = self.store.recipes[name]
+        crafts = math.ceil(needed / recipe["result"][1])
+        surplus[item] = surplus.get(item, 0) + crafts * recipe["result"][1] - needed
+        node.update({
+            "recipe": name,
+            "type": recipe["type"],
+            "crafts": crafts,
+            "alternatives": [other for other in self.producers[item]
+                             if other != name and math.isfinite(self._recipe_cost(other, self.costs))],
+            "children": [self._expand(self._cheapest_option(alternatives), quantity * crafts,
+                                      raw, surplus, stack + [item])
+                         for alternatives, quantity in recipe_slots(recipe)]
+        })
+        return node
+
+    def render(self, item: str, count: int = 1) -> Optional[str]:
+        """
+        Renders the crafting tree and raw material bill of an item as plain text.
+
+        Args:
+            item (str): The item to craft.
+            count (int): How many of the item are wanted, at least 1.
+
+        Returns:
+            Optional[str]: The rendered tree, or None if no recipe produces the item.
+
+        Raises:
+            ValueError: If count is less than 1.
+        """
+        if item not in self.best_recipe:
+            return None
+        result = self.resolve(item, count)
+        lines = [f"Crafting tree for {count} {item}:"]
+        lines.extend(_render_node(result["tree"], 0))
+        lines.append("Raw materials: " + ", ".join(
+            f"{amount} {name}" for name, amount in result["raw_materials"].items()))
+        if result["leftovers"]:
+            lines.append("Leftovers: " + ", ".join(
+                f"{amount} {name}" for name, amount in result["leftovers"].items()))
+        return "\n".join(lines)
+
+
+def _render_node(node: Dict[str, Any], depth: int) -> List[str]:
+    line = f"{'  ' * depth}- {node['count']} {node['item']}"
+    if "recipe" in node:
+        crafts = f"{node['crafts']} craft" + ("s" if node["crafts"] > 1 else "")
+        line += f" <- {node['recipe']} ({node['type']}, {crafts})"
+        if node["alternatives"]:
+            line += f" [other recipes: {', '.join(node['alternatives'])}]"
+    elif node.get("raw"):
+        line += " (raw)"
+    if node.get("from_leftovers"):
+        line += f" ({node['from_leftovers']} from leftovers)"
+    lines = [line]
+    for child in node.get("children", []):
+        lines.extend(_render_node(child, depth + 1))
+    return lines
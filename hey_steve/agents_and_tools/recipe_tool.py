@@ -1,4 +1,7 @@
 from smolagents import Tool
+from typing import Optional
+from .name_index import NameIndex
+from .mc_data_store import McDataStore
 import os
 
 
@@ -15,11 +18,15 @@ class RecipeTool(Tool):
     }
     output_type = "string"
 
-    def __init__(self, directroy: str = "data/mc/recipe", **kwargs):
+    def __init__(self, directroy: str = "data/mc/recipe", name_index: Optional[NameIndex] = None,
+                 store: Optional[McDataStore] = None, **kwargs):
 
         super().__init__(**kwargs)
-        self.recipe_files = [f.replace(".json", "") for f in os.listdir(
-            directroy) if f.endswith('.json')]
+        self.store = store
+        if store is not None:
+            name_index = name_index or store.recipe_index
+        self.name_index = name_index or NameIndex.from_directory(directroy)
+        self.recipe_files = self.name_index.names()
         self.directroy = directroy
 
     def forward(self, item_name: str) -> str:
@@ -27,17 +34,14 @@ class RecipeTool(Tool):
 
         item_name = item_name.lower()
 
-        if item_name in self.recipe_files:
+        if self.store is not None and item_name in self.store.recipes:
+            return f"The crafting recipe for {item_name} is \n" + self.store.render_recipe(item_name)
+        elif item_name in self.name_index:
             with open(os.path.join(self.directroy, item_name + ".json"), "r") as f:
                 return f"The crafting recipe for {item_name} is \n" + f.read() + \
                     "\n The pattern represents a 3x3 crafting table grid. \
                         If pattern does not show all 9 positions, if can be in any position while maintian the exact shape."
         else:
-            item_name_parts = item_name.split("_")
-            possible_matches = set()
-            for part in item_name_parts:
-                for recipe in self.recipe_files:
-                    if part in recipe:
-                        possible_matches.add(recipe.strip(".json"))
-
-            return f"No exact match is found, but here are a list of possible matches:" + ", ".join(possible_matches)
+            possible_matches = self.name_index.search(item_name)
+
+            return f"No exact match is found, but here are a list of possible matches: " + ", ".join(possible_matches)
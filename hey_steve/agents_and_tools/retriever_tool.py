@@ -1,5 +1,7 @@
+from typing import Union
+
 from smolagents import Tool
-from hey_steve.rag import SteveRAG
+from hey_steve.rag import LazyHandle, SteveRAG
 
 
 class RetrieverTool(Tool):
@@ -20,8 +22,9 @@ class RetrieverTool(Tool):
     }
     output_type = "string"
 
-    def __init__(self, steve_rag: SteveRAG, **kwargs):
+    def __init__(self, steve_rag: Union[SteveRAG, LazyHandle], **kwargs):
         super().__init__(**kwargs)
+        # A LazyHandle lets the agent start before the models are loaded
         self.steve_rag = steve_rag
 
     def forward(self, query: str, n_result: str = 5) -> str:
@@ -29,7 +32,8 @@ class RetrieverTool(Tool):
         assert isinstance(n_result, int), "n_result must be an integer"
         assert n_result > 0, "n_reuslt must be a positive integer"
 
-        docs = self.steve_rag.query_with_reranking(query, n_results=n_result)
+        steve_rag = self.steve_rag.get() if isinstance(self.steve_rag, LazyHandle) else self.steve_rag
+        docs = steve_rag.query_with_reranking(query, n_results=n_result)
         return "\nRetrieved documents:\n" + "".join(
             [f"\n\n===== Document {str(i)} =====\n" +
              doc['text'].replace("search_document: ", "") for i, doc in enumerate(docs)]
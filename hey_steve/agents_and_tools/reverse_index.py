@@ -0,0 +1,174 @@
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from .mc_data_store import STORE_VERSION, McDataStore, flatten_tags, _format_number
+from .name_index import NameIndex
+
+INDEX_VERSION = 1
+
+
+class ReverseIndex:
+    """
+    Reverse lookups over the recipes and loot tables of a McDataStore.
+
+    `uses` maps an item to the recipes consuming it, and `drops` maps an item to the loot
+    tables that can drop it with their chance per roll, count and conditions. Recipes
+    using a tag are listed under every item of the tag. Both are built in one pass over
+    the store and persisted next to it, so a lookup is a dict access rather than a scan
+    of every recipe and loot table.
+    """
+
+    def __init__(self, store: McDataStore, uses: Dict[str, List[List[Any]]], drops: Dict[str, List[Dict[str, Any]]]):
+        """
+        Initializes the index from built or cached data.
+
+        Args:
+            store (McDataStore): The store the index was built from, used to render recipe results.
+            uses (Dict[str, List[List[Any]]]): Maps an item to [recipe name, tag or None] pairs.
+            drops (Dict[str, List[Dict[str, Any]]]): Maps an item to its loot sources.
+        """
+        self.store = store
+        self.uses = uses
+        self.drops = drops
+        self.item_index = NameIndex({item: [item] for item in sorted(set(uses) | set(drops))})
+
+    @classmethod
+    def build(cls, store: McDataStore) -> "ReverseIndex":
+        """
+        Builds the index from a store.
+
+        Args:
+            store (McDataStore): The store to index.
+
+        Returns:
+            ReverseIndex: The index.
+        """
+        tag_members = flatten_tags(store.tags)
+
+        uses: Dict[str, List[List[Any]]] = {}
+        for name in sorted(store.recipes):
+            recipe = store.recipes[name]
+            alternatives = [alt for slot in recipe.get("key", {}).values() for alt in slot]
+            alternatives += [alt for slot in recipe.get("ingredients", []) for alt in slot]
+            for field in ("ingredient", "template", "base", "addition", "input", "material"):
+                alternatives += recipe.get(field, [])
+
+            seen = set()
+            for alternative in alternatives:
+                if alternative.startswith("#"):
+                    items = [(item, alternative) for item in tag_members.get(alternative[1:], [])]
+                    items.append((alternative, None))
+                else:
+                    items = [(alternative, None)]
+                for item, tag in items:
+                    if item not in seen:
+                        seen.add(item)
+                        uses.setdefault(item, []).append([name, tag])
+
+        drops: Dict[str, List[Dict[str, Any]]] = {}
+        for path in sorted(store.loot_tables):
+            for pool_number, pool in enumerate(store.loot_tables[path]["pools"], start=1):
+                total_weight = sum(entry.get("weight", 1) for entry in pool["entries"])
+                for entry in pool["entries"]:
+                    chance = entry.get("weight", 1) / total_weight if total_weight else 1.0
+                    _collect_drops(entry, path, pool_number, pool, chance,
+                                   pool.get("conditions", []), tag_members, drops)
+        return cls(store, uses, drops)
+
+    @classmethod
+    def load(cls, store: McDataStore, cache_path: Optional[str] = "data/mc/reverse_index.json") -> "ReverseIndex":
+        """
+        Loads the index from its cache, or builds and caches it if the cache is missing or the store changed.
+
+        Args:
+            store (McDataStore): The store to index. The cache is reused only if it was built from the same data files
+                with the same store version.
+            cache_path (Optional[str]): The cache file. None disables caching.
+
+        Returns:
+            ReverseIndex: The index.
+        """
+        if cache_path is not None and store.fingerprint is not None and os.path.exists(cache_path):
+            with open(cache_path, "r") as f:
+                cached = json.load(f)
+            if cached.get("version") == INDEX_VERSION and cached.get("store_version") == STORE_VERSION \
+                    and cached.get("fingerprint") == store.fingerprint:
+                return cls(store, cached["uses"], cached["drops"])
+
+        index = cls.build(store)
+        if cache_path is not None and store.fingerprint is not None:
+            tmp_path = cache_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"version": INDEX_VERSION, "store_version": STORE_VERSION, "fingerprint": store.fingerprint,
+                           "uses": index.uses, "drops": index.drops}, f, separators=(",", ":"))
+            os.replace(tmp_path, cache_path)
+        return index
+
+    def render_uses(self, item: str) -> Optional[str]:
+        """Renders the recipes consuming an item as plain text, or returns None if no recipe uses it."""
+        uses = self.uses.get(item)
+        if not uses:
+            return None
+
+        lines = [f"{item} is used in {len(uses)} recipe" + ("s:" if len(uses) > 1 else ":")]
+        for name, tag in uses:
+            recipe = self.store.recipes[name]
+            line = f"- {name} ({recipe['type']})"
+            if "result" in recipe:
+                result, count = recipe["result"]
+                line += f" makes {result}" + (f" x{count}" if count != 1 else "")
+            if tag:
+                line += f", as any {tag}"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def render_drops(self, item: str) -> Optional[str]:
+        """Renders the loot tables that can drop an item as plain text, or returns None if nothing drops it."""
+        drops = self.drops.get(item)
+        if not drops:
+            return None
+
+        lines = [f"{item} can be dropped by {len(drops)} loot table" + ("s:" if len(drops) > 1 else ":")]
+        for drop in drops:
+            details = [f"pool {drop['pool']}", f"{drop['chance']:.1%} per roll",
+                       f"rolls {_format_number(drop['rolls'])}"]
+            if "count" in drop:
+                details.append(f"x{_format_number(drop['count'])}")
+            if "bonus" in drop:
+                details.append("+" + "/".join(drop["bonus"]) + " bonus")
+            if drop["conditions"]:
+                details.append("if " + " and ".join(drop["conditions"]))
+            lines.append(f"- {drop['source']} ({', '.join(details)})")
+        return "\n".join(lines)
+
+
+def _collect_drops(entry: Dict[str, Any],
+                   path: str,
+                   pool_number: int,
+                   pool: Dict[str, Any],
+                   chance: float,
+                   conditions: List[str],
+                   tag_members: Dict[str, List[str]],
+                   drops: Dict[str, List[Dict[str, Any]]]) -> None:
+    """Records the items an entry can drop, descending into composite entries with their conditions."""
+    conditions = conditions + entry.get("conditions", [])
+    kind = entry["kind"]
+    if "children" in entry:
+        for child in entry["children"]:
+            _collect_drops(child, path, pool_number, pool, chance, conditions, tag_members, drops)
+        return
+    if kind == "item":
+        items = [entry["name"]]
+    elif kind == "tag":
+        items = tag_members.get(entry.get("name", ""), [])
+    else:  # empty entries and references to other loot tables drop nothing themselves
+        return
+
+    for item in items:
+        drop: Dict[str, Any] = {"source": path, "pool": pool_number, "chance": round(chance, 4),
+                                "rolls": pool["rolls"], "conditions": conditions}
+        for field in ("count", "bonus"):
+            if field in entry:
+                drop[field] = entry[field]
+        drops.setdefault(item, []).append(drop)
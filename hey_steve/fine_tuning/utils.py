@@ -1,34 +1,55 @@
 import json
 import os
 
+from hey_steve.processing import ChunkStore
 
-def combine_json_files(input_dir, output_path):
-    """
-    Reads all json files in a given directory. These json files will only contain
-    list of strings in json format. Combine them together and store them into
-    a new file that the user provides a path for.
 
-    Args:
-        input_dir (str): The directory containing the json files.
-        output_path (str): The path to the output json file.
-    """
-    combined_list = []
-    for filename in os.listdir(input_dir):
+def iter_json_file_chunks(input_dir):
+    """Yields the chunks of every json file in a directory holding a list of strings."""
+    for filename in sorted(os.listdir(input_dir)):
         if filename.endswith(".json"):
             file_path = os.path.join(input_dir, filename)
             with open(file_path, 'r') as f:
                 data = json.load(f)
                 if isinstance(data, list) and all(isinstance(item, str) for item in data):
-                    combined_list.extend(data)
+                    yield from data
                 else:
                     print(
                         f"Warning: Skipping file {filename} as it does not contain a list of strings.")
 
+
+def combine_json_files(input_dir, output_path):
+    """
+    Reads all json files in a given directory. These json files will only contain
+    list of strings in json format. Combine them together and store them into
+    a new file that the user provides a path for.
+
+    If the directory is a chunk store written by `hey_steve/processing/chunking.py`, its
+    chunks are streamed from the store instead. Either way the chunks are written one at
+    a time, so they are never all held in memory.
+
+    Args:
+        input_dir (str): The directory containing the json files, or a chunk store.
+        output_path (str): The path to the output json file.
+    """
+    if ChunkStore.exists(input_dir):
+        chunks = ChunkStore(input_dir).iter_texts()
+    else:
+        chunks = iter_json_file_chunks(input_dir)
+
+    # Same layout as json.dump(combined_list, f, indent=4)
     with open(output_path, 'w') as f:
-        json.dump(combined_list, f, indent=4)
+        f.write("[")
+        empty = True
+        for chunk in chunks:
+            f.write("\n    " if empty else ",\n    ")
+            f.write(json.dumps(chunk))
+            empty = False
+        f.write("]" if empty else "\n]")
 
 
 if __name__ == '__main__':
+    # Run from the repository root with `python -m hey_steve.fine_tuning.utils`
     input_directory = "data/chunks_custom"  # Replace with your input directory
     # Replace with your desired output path
     output_file_path = "data/chunk_question_pairs_new/all_chunks.json"
@@ -1,6 +1,5 @@
-from .chunking import process_md_file, process_md_directory
+from .chunk_store import ChunkStore
 
 __all__ = [
-    "process_md_file",
-    "process_md_directory"
+    "ChunkStore"
 ]
@@ -0,0 +1,79 @@
+"""Benchmark of HTML table parsing on the largest downloaded wiki pages.
+
+Compares the previous `parse_html_tables` loop, which rebuilt the document and created a
+parser for every table, against the single-pass version with and without a shared parser.
+
+    python hey_steve/processing/benchmark_tables.py data/downloads --pages 20
+"""
+
+import argparse
+import os
+import time
+
+from html_to_markdown import (convert_html_to_markdown, find_table_spans,
+                              html_table_to_markdown, parse_html_tables)
+
+
+def legacy_parse_html_tables(markdown_content):
+    """The previous scan-and-rebuild loop, kept as the baseline. It shares the per-table conversion, so only the scan differs."""
+    while "<table>" in markdown_content:
+        start = markdown_content.index("<table>")
+        end = markdown_content.index("</table>")
+        if start >= end:
+            break
+        table_text = markdown_content[start: end + len("</table>")]
+        md_table_text = html_table_to_markdown(table_text)
+        markdown_content = markdown_content[:start] + \
+            md_table_text + markdown_content[end + len("</table>"):]
+    return markdown_content
+
+
+def time_call(fn, content, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = fn(content)
+        best = min(best, time.perf_counter() - started)
+    return best, output
+
+
+def main(input_dir, pages, repeat):
+    html_files = [os.path.join(input_dir, f) for f in os.listdir(input_dir) if f.endswith('.html')]
+    html_files = sorted(html_files, key=os.path.getsize, reverse=True)[:pages]
+    documents = [(os.path.basename(f), convert_html_to_markdown(f)) for f in html_files]
+
+    variants = {
+        "legacy": legacy_parse_html_tables,
+        "single_pass": parse_html_tables,
+        "single_pass_shared": lambda content: parse_html_tables(content, shared_parser=True),
+    }
+    totals = {name: 0.0 for name in variants}
+    print(f"{'page':<40} {'tables':>6} " + " ".join(f"{name:>18}" for name in variants))
+    for name, content in documents:
+        timings = {}
+        outputs = {}
+        for variant, fn in variants.items():
+            timings[variant], outputs[variant] = time_call(fn, content, repeat)
+            totals[variant] += timings[variant]
+        same = outputs["single_pass"] == outputs["single_pass_shared"]
+        print(f"{name[:40]:<40} {len(find_table_spans(content)):>6} " +
+              " ".join(f"{timings[variant] * 1000:>16.1f}ms" for variant in variants) +
+              ("" if same else "  (shared parser output differs)"))
+
+    print(f"{'total':<47} " + " ".join(f"{totals[variant] * 1000:>16.1f}ms" for variant in variants))
+    for variant in list(variants)[1:]:
+        print(f"{variant}: {totals['legacy'] / totals[variant]:.2f}x speedup over legacy")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Benchmark HTML table parsing on the largest HTML pages of a directory.')
+    parser.add_argument('input_dir', type=str,
+                        help='Path to directory containing HTML files.')
+    parser.add_argument('--pages', type=int, default=20,
+                        help='Number of the largest pages to benchmark.')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of timed runs per page, the best one is reported.')
+    args = parser.parse_args()
+
+    main(args.input_dir, args.pages, args.repeat)
@@ -0,0 +1,186 @@
+"""Append-only JSONL store of the chunks of every page.
+
+Every chunk is one JSON line holding its source page, header path, offsets in the page
+and text. The lines of a page are contiguous, and a manifest maps each page to the
+hash of its markdown, the hash of its records and their byte range. Writing a page
+appends its records and points the manifest at them, so unchanged pages are never
+rewritten; the file is compacted once replaced records make up most of it. Readers
+stream the records of one page at a time, in file order.
+
+    store = ChunkStore("data/chunks")
+    for record in store.iter_records():
+        print(record["source"], record["headers"], record["text"])
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+MANIFEST_FILE = "chunks_manifest.json"
+STORE_VERSION = 1
+
+
+class ChunkStore:
+    """
+    A directory holding the chunk file and its manifest.
+
+    Changes are only visible to readers once `commit` saves the manifest. Records
+    appended by a run that was interrupted before its commit are cut off the next
+    time the store is written, and compaction writes a new chunk file before the
+    manifest switches to it, so the manifest always points at complete records.
+    """
+
+    def __init__(self, directory: str = "data/chunks"):
+        """
+        Args:
+            directory (str): The directory of the store. It is created on the first write.
+        """
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST_FILE)
+        self.manifest = self._load_manifest()
+        self._file = None
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        """Returns whether a directory holds a chunk store."""
+        return os.path.exists(os.path.join(directory, MANIFEST_FILE))
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        empty = {"version": STORE_VERSION, "file": "chunks-0.jsonl", "generation": 0, "size": 0, "sources": {}}
+        if not os.path.exists(self.manifest_path):
+            return empty
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        return manifest if manifest.get("version") == STORE_VERSION else empty
+
+    @property
+    def path(self) -> str:
+        """The chunk file."""
+        return os.path.join(self.directory, self.manifest["file"])
+
+    @property
+    def sources(self) -> Dict[str, Dict[str, Any]]:
+        """Maps every page to its markdown hash, records hash, byte offset, byte length and record count."""
+        return self.manifest["sources"]
+
+    def page_hash(self, source: str) -> Optional[str]:
+        """Returns the markdown hash a page was chunked from, or None if the page is not stored."""
+        entry = self.sources.get(source)
+        return entry["page_hash"] if entry is not None else None
+
+    def iter_sources(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Lists the pages in file order, so reading them one after another is sequential."""
+        return sorted(self.sources.items(), key=lambda item: item[1]["offset"])
+
+    def read(self, source: str) -> List[Dict[str, Any]]:
+        """
+        Reads the records of a page.
+
+        Args:
+            source (str): The page.
+
+        Returns:
+            List[Dict[str, Any]]: The records, each with source, headers, start, end and text.
+        """
+        entry = self.sources[source]
+        with open(self.path, 'rb') as f:
+            f.seek(entry["offset"])
+            data = f.read(entry["length"])
+        return [json.loads(line) for line in data.splitlines()]
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """Streams the records of every page, holding one page in memory at a time."""
+        if not self.sources:
+            return
+        with open(self.path, 'rb') as f:
+            for _, entry in self.iter_sources():
+                f.seek(entry["offset"])
+                for line in f.read(entry["length"]).splitlines():
+                    yield json.loads(line)
+
+    def iter_texts(self) -> Iterator[str]:
+        """Streams the text of every chunk."""
+        for record in self.iter_records():
+            yield record["text"]
+
+    def _open(self):
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._file = open(self.path, 'ab')
+            # Drop the records of an interrupted run, which no manifest refers to
+            self._file.truncate(self.manifest["size"])
+            self._file.seek(self.manifest["size"])
+        return self._file
+
+    def put(self, source: str, page_hash: str, records: List[Dict[str, Any]]) -> None:
+        """
+        Appends the records of a page, replacing its previous records on commit.
+
+        Args:
+            source (str): The page.
+            page_hash (str): The hash of the markdown the records were chunked from.
+            records (List[Dict[str, Any]]): The records, each with headers, start, end and text.
+        """
+        data = b"".join(
+            json.dumps({"source": source, **record}, ensure_ascii=False).encode('utf-8') + b"\n"
+            for record in records)
+        f = self._open()
+        offset = f.tell()
+        f.write(data)
+        self.sources[source] = {
+            "page_hash": page_hash,
+            "hash": hashlib.sha256(data).hexdigest(),
+            "offset": offset,
+            "length": len(data),
+            "count": len(records)
+        }
+        self.manifest["size"] = offset + len(data)
+
+    def remove(self, source: str) -> None:
+        """Removes a page on commit."""
+        self.sources.pop(source, None)
+
+    def commit(self, compact_ratio: float = 0.5) -> None:
+        """
+        Makes the written pages visible to readers.
+
+        Args:
+            compact_ratio (float): The chunk file is compacted when less than this share of it is live records.
+        """
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+        live = sum(entry["length"] for entry in self.sources.values())
+        if self.manifest["size"] and live < self.manifest["size"] * compact_ratio:
+            self._compact()
+        else:
+            self._save_manifest()
+
+    def _compact(self) -> None:
+        """Copies the live records into a new chunk file, then switches the manifest to it."""
+        old_path = self.path
+        generation = self.manifest["generation"] + 1
+        new_file = f"chunks-{generation}.jsonl"
+        offset = 0
+        with open(old_path, 'rb') as src, open(os.path.join(self.directory, new_file), 'wb') as dst:
+            for _, entry in self.iter_sources():
+                src.seek(entry["offset"])
+                dst.write(src.read(entry["length"]))
+                entry["offset"] = offset
+                offset += entry["length"]
+            dst.flush()
+            os.fsync(dst.fileno())
+        self.manifest.update({"file": new_file, "generation": generation, "size": offset})
+        self._save_manifest()
+        os.remove(old_path)
+
+    def _save_manifest(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self.manifest_path)
@@ -1,15 +1,19 @@
 """Module for processing and chunking markdown files into smaller, structured pieces."""
 
+import argparse
+import hashlib
 import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
-from langchain_text_splitters import (
-    MarkdownHeaderTextSplitter,
-    RecursiveCharacterTextSplitter,
-    TextSplitter,
-)
-import tiktoken
+from langchain_text_splitters import MarkdownHeaderTextSplitter
+from tqdm import tqdm
+from chunk_store import ChunkStore
+from token_splitter import TokenBudgetSplitter, token_histogram
 
 # Constants
 HEADERS_TO_SPLIT_ON = [
@@ -18,23 +22,36 @@ HEADERS_TO_SPLIT_ON = [
     ("###", "Header 3"),
 ]
 
-MIN_TOKENS_FOR_SPLIT = 150
-SEPARATORS = ["\n\n", "\n", ".", "?", "!", " ", ""]
+# Chunks are measured with the tokenizer of the embedding model. The target leaves room
+# under the 512 token windows of the embedding model and the reranker for the task
+# prefix and the query.
+EMBEDDING_MODEL = "nomic-ai/nomic-embed-text-v2-moe"
+TARGET_TOKENS = 256
+OVERLAP_TOKENS = 32
+COMMIT_EVERY = 100
 
 # Initialize paths
 INPUT_DIR = Path("data/md")
 SAVE_DIR = Path("data/chunks")
-SAVE_DIR.mkdir(parents=True, exist_ok=True)
 
 # Initialize text splitters
 splitter: MarkdownHeaderTextSplitter = MarkdownHeaderTextSplitter(
     HEADERS_TO_SPLIT_ON)
-tokenizer = tiktoken.get_encoding("cl100k_base")
 
-rcts: RecursiveCharacterTextSplitter = RecursiveCharacterTextSplitter(
-    separators=SEPARATORS,
-    keep_separator=False,
-)
+
+@lru_cache(maxsize=None)
+def get_token_splitter(model_name: str = EMBEDDING_MODEL,
+                       target_tokens: int = TARGET_TOKENS,
+                       overlap_tokens: int = OVERLAP_TOKENS) -> TokenBudgetSplitter:
+    """Loads the token splitter once per process."""
+    return TokenBudgetSplitter.from_pretrained(
+        model_name, target_tokens=target_tokens, overlap_tokens=overlap_tokens)
+
+
+def chunking_config(model_name: str, target_tokens: int, overlap_tokens: int) -> str:
+    """Describes the chunking settings. It is part of every page hash, so changing them rechunks every page."""
+    return json.dumps({"version": 3, "headers": HEADERS_TO_SPLIT_ON, "model": model_name,
+                       "target_tokens": target_tokens, "overlap_tokens": overlap_tokens})
 
 
 def construct_header_string(chunk: Dict[str, Any]) -> str:
@@ -58,59 +75,175 @@ def construct_header_string(chunk: Dict[str, Any]) -> str:
     return f"Content of {' > '.join(headers)}. " if headers else ""
 
 
-def process_markdown_file(filepath: Path) -> None:
+def locate(markdown: str, content: str, cursor: int) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Finds the span of a chunk in its page.
+
+    The splitters strip lines and drop separators, so the chunk is matched line by line
+    from `cursor` rather than as a whole.
+
+    Returns:
+        The start and end offsets, or (None, None) if a line of the chunk is not found.
+    """
+    lines = [line.strip() for line in content.splitlines() if line.strip()]
+    if not lines:
+        return None, None
+    start = pos = markdown.find(lines[0], cursor)
+    if start == -1:
+        return None, None
+    for line in lines:
+        pos = markdown.find(line, pos)
+        if pos == -1:
+            return None, None
+        pos += len(line)
+    return start, pos
+
+
+def chunk_markdown(text: str, token_splitter: TokenBudgetSplitter) -> List[Dict[str, Any]]:
     """
-    Processes a markdown file and saves chunked output as JSON.
+    Splits a markdown page into chunks with their context prepended.
 
     Args:
-        filepath: Path to the markdown file to process
+        text: The markdown page
+        token_splitter: The splitter keeping every chunk, context included, within its token budget
+
+    Returns:
+        List[Dict[str, Any]]: A record per chunk with its header path, its start and end
+        offsets in the page (None when it cannot be located), its token count and its text
     """
-    try:
-        print(f"Processing file: {filepath.name}")
+    header_chunks = splitter.split_text(text)
+    sections = [(construct_header_string(chunk), chunk.page_content) for chunk in header_chunks]
 
-        with filepath.open("r", encoding="utf-8") as f:
-            text = f.read()
+    records: List[Dict[str, Any]] = []
+    cursor = 0
+    for chunk, pieces in zip(header_chunks, token_splitter.split_sections(sections)):
+        headers = [chunk.metadata[name] for _, name in HEADERS_TO_SPLIT_ON if name in chunk.metadata]
+        for piece in pieces:
+            start, end = locate(text, piece["text"], cursor)
+            if start is not None:
+                cursor = start
+            records.append({"headers": headers, "start": start, "end": end,
+                            "tokens": piece["tokens"], "text": piece["header"] + piece["text"]})
+    return records
 
-        header_chunks = splitter.split_text(text)
-        chunks: List[str] = []
 
-        for chunk in header_chunks:
-            header_string = construct_header_string(chunk)
-            num_tokens = len(tokenizer.encode(chunk.page_content))
+def page_hash(content: bytes, config: str) -> str:
+    """Returns the hash a page is chunked from, covering its markdown and the chunking settings."""
+    return hashlib.sha256(config.encode("utf-8") + content).hexdigest()
 
-            if num_tokens > MIN_TOKENS_FOR_SPLIT:
-                split_chunks = rcts.split_text(chunk.page_content)
-                modified_split_chunks = [
-                    header_string + sc for sc in split_chunks]
-                chunks.extend(modified_split_chunks)
-            else:
-                chunks.append(header_string + chunk.page_content)
 
-        # Save processed chunks
-        output_filepath = SAVE_DIR / f"{filepath.stem}.json"
-        with output_filepath.open("w", encoding="utf-8") as outfile:
-            json.dump(chunks, outfile, indent=4)
+def process_markdown_file(filepath: Path, token_splitter: TokenBudgetSplitter) -> List[Dict[str, Any]]:
+    """
+    Processes a markdown file into chunk records.
 
-        print(f"Successfully processed {filepath.name}")
+    Args:
+        filepath: Path to the markdown file to process
+        token_splitter: The splitter keeping every chunk within its token budget
+
+    Returns:
+        List[Dict[str, Any]]: The chunk records, see `chunk_markdown`
+    """
+    with filepath.open("r", encoding="utf-8") as f:
+        text = f.read()
+    return chunk_markdown(text, token_splitter)
 
+
+def _chunk_task(filepath: Path, settings: Tuple[str, int, int]) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+    """Runs `process_markdown_file` in a worker and returns its chunks or the error message."""
+    try:
+        return process_markdown_file(filepath, get_token_splitter(*settings)), None
     except Exception as e:
-        print(f"ERROR: Error processing {filepath.name}: {str(e)}")
-        raise
+        return None, f"{type(e).__name__}: {e}"
 
 
-def main() -> None:
-    """Main function to process all markdown files in the input directory."""
-    print("Starting markdown processing")
+def main(input_dir: Path = INPUT_DIR,
+         save_dir: Path = SAVE_DIR,
+         workers: int = 1,
+         model_name: str = EMBEDDING_MODEL,
+         target_tokens: int = TARGET_TOKENS,
+         overlap_tokens: int = OVERLAP_TOKENS) -> Dict[str, int]:
+    """
+    Chunks the new and changed markdown files of a directory into the chunk store.
 
-    for file in INPUT_DIR.glob("*.md"):
-        try:
-            process_markdown_file(file)
-        except Exception as e:
-            print(f"ERROR: Failed to process {file.name}: {str(e)}")
-            continue
+    Args:
+        input_dir: The directory of markdown files
+        save_dir: The directory of the chunk store
+        workers: The number of worker processes. 1 chunks the pages in this process
+        model_name: The embedding model whose tokenizer measures the chunks
+        target_tokens: The largest number of tokens per chunk
+        overlap_tokens: The number of tokens a chunk shares with the previous one of its section
 
-    print("Markdown processing completed")
+    Returns:
+        Dict[str, int]: The number of chunked, unchanged, removed and failed pages
+    """
+    print("Starting markdown processing")
+    started = time.perf_counter()
+    store = ChunkStore(str(save_dir))
+
+    files = sorted(Path(input_dir).glob("*.md"))
+    settings = (model_name, target_tokens, overlap_tokens)
+    config = chunking_config(*settings)
+    hashes = {file.name: page_hash(file.read_bytes(), config) for file in files}
+    changed = [file for file in files if store.page_hash(file.name) != hashes[file.name]]
+    removed = [source for source in store.sources if source not in hashes]
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    if executor is not None:
+        # map keeps the input order, so every result lines up with its file
+        chunksize = max(1, len(changed) // (workers * 16))
+        results = executor.map(_chunk_task, changed, repeat(settings), chunksize=chunksize)
+    else:
+        results = map(_chunk_task, changed, repeat(settings))
+
+    failed = 0
+    try:
+        for done, (file, (records, error)) in enumerate(
+                tqdm(zip(changed, results), total=len(changed), desc=f"Chunking {len(changed)} changed files"),
+                start=1):
+            if error is not None:
+                print(f"ERROR: Failed to process {file.name}: {error}")
+                failed += 1
+            else:
+                store.put(file.name, hashes[file.name], records)
+            # Committing as we go lets an interrupted run resume from the last commit
+            if done % COMMIT_EVERY == 0:
+                store.commit()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    for source in removed:
+        store.remove(source)
+    store.commit()
+
+    counts = {"chunked": len(changed) - failed, "unchanged": len(files) - len(changed),
+              "removed": len(removed), "failed": failed}
+    print(f"Markdown processing completed in {time.perf_counter() - started:.1f}s: {counts['chunked']} chunked, "
+          f"{counts['unchanged']} unchanged, {counts['removed']} removed, {counts['failed']} failed")
+    # Records of pages that failed or were skipped may predate token counts
+    lengths = [record.get("tokens") for record in store.iter_records()]
+    print("Chunk lengths in tokens:")
+    print(token_histogram([length for length in lengths if length is not None], max_length=target_tokens))
+    if None in lengths:
+        print(f"{lengths.count(None)} chunks without a token count are not included, rechunk their pages to count them")
+    return counts
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(
+        description='Chunk the markdown files of a directory into the chunk store.')
+    parser.add_argument('input_dir', type=str, nargs='?', default=str(INPUT_DIR),
+                        help='Path to directory containing markdown files.')
+    parser.add_argument('--output-dir', type=str, default=str(SAVE_DIR),
+                        help='Path to the chunk store directory.')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes to chunk files in parallel.')
+    parser.add_argument('--model', type=str, default=EMBEDDING_MODEL,
+                        help='Embedding model whose tokenizer measures the chunks.')
+    parser.add_argument('--target-tokens', type=int, default=TARGET_TOKENS,
+                        help='Largest number of tokens per chunk, context included.')
+    parser.add_argument('--overlap-tokens', type=int, default=OVERLAP_TOKENS,
+                        help='Number of tokens a chunk shares with the previous one.')
+    args = parser.parse_args()
+
+    main(Path(args.input_dir), Path(args.output_dir), workers=args.workers, model_name=args.model,
+         target_tokens=args.target_tokens, overlap_tokens=args.overlap_tokens)
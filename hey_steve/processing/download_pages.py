@@ -0,0 +1,311 @@
+"""Concurrent, resumable downloader for the wiki pages listed in download_scripts.
+
+Pages are fetched on a pool of threads, each reusing the connections of its own
+`requests.Session`. Requests to a host are spaced by a shared rate limit, failed requests
+are retried with exponential backoff, and every page is revalidated with its ETag or
+Last-Modified date, so an unchanged page costs a 304 rather than a download. Progress
+is kept in a state file, and a run that was interrupted resumes where it stopped.
+
+    python hey_steve/processing/download_pages.py download_scripts/*.txt --workers 8
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.utils import formatdate
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+
+BASE_URL = "https://minecraft.wiki/w/"
+STATE_VERSION = 1
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# Files this small are error pages rather than wiki pages, as in download_webpages.sh
+MIN_PAGE_SIZE = 1024
+
+
+def page_filename(name: str) -> str:
+    """Returns the file a page is saved to, with the same naming as download_webpages.sh."""
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name) + ".html"
+
+
+def read_page_names(paths: Iterable[str]) -> List[str]:
+    """Reads the page names of one or more name files, in order and without duplicates."""
+    names = {}
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                name = line.strip()
+                if name:
+                    names[name] = None
+    return list(names)
+
+
+class HostRateLimiter:
+    """Spaces the requests to each host by at least 1 / rate seconds, across threads."""
+
+    def __init__(self, rate: float):
+        """
+        Args:
+            rate (float): The largest number of requests per second to a host. 0 disables the limit.
+        """
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host: str) -> None:
+        """Blocks until the next request to a host may be sent."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class PageDownloader:
+    """
+    Downloads pages concurrently, revalidating the ones already on disk.
+
+    The state file maps every URL to its file, its ETag and Last-Modified headers and
+    the time it was last fetched or revalidated. Pages fetched less than `max_age` seconds
+    ago are skipped without a request, which is what makes an interrupted run resume.
+    Files downloaded before the state file existed are revalidated with their
+    modification time.
+    """
+
+    def __init__(self,
+                 output_dir: str = "data/downloads",
+                 workers: int = 8,
+                 rate: float = 4.0,
+                 retries: int = 4,
+                 backoff: float = 1.0,
+                 timeout: float = 30.0,
+                 state_path: Optional[str] = None,
+                 max_age: float = 24 * 3600,
+                 save_every: int = 50):
+        """
+        Args:
+            output_dir (str): The directory the pages are saved to.
+            workers (int): The number of download threads.
+            rate (float): The largest number of requests per second to a host. 0 disables the limit.
+            retries (int): How many times a failed request is retried.
+            backoff (float): The wait before the first retry in seconds, doubled for every later one.
+            timeout (float): The timeout of a request in seconds.
+            state_path (Optional[str]): The state file. None keeps the state in memory only.
+            max_age (float): How long in seconds a fetched page is considered fresh.
+            save_every (int): How many pages are fetched between two saves of the state file.
+        """
+        self.output_dir = output_dir
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.state_path = state_path
+        self.max_age = max_age
+        self.save_every = save_every
+        self.rate_limiter = HostRateLimiter(rate)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.state: Dict[str, Dict] = self._load_state()
+        self.counts: Dict[str, int] = {}
+
+    def _load_state(self) -> Dict[str, Dict]:
+        if self.state_path is None or not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get("version") != STATE_VERSION:
+            return {}
+        return cached["pages"]
+
+    def save_state(self) -> None:
+        """Writes the state file atomically, so an interrupted run never leaves it half written."""
+        if self.state_path is None:
+            return
+        with self._lock:
+            pages = dict(self.state)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": STATE_VERSION, "pages": pages}, f, indent=1)
+        os.replace(tmp_path, self.state_path)
+
+    @property
+    def session(self) -> requests.Session:
+        """The session of the current thread, so every thread keeps its connections open."""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers["User-Agent"] = "HeySteve page downloader"
+            session.mount("http://", HTTPAdapter(pool_maxsize=1))
+            session.mount("https://", HTTPAdapter(pool_maxsize=1))
+            self._local.session = session
+        return session
+
+    def _conditional_headers(self, url: str, path: str) -> Dict[str, str]:
+        if not os.path.exists(path) or os.path.getsize(path) <= MIN_PAGE_SIZE:
+            return {}
+        entry = self.state.get(url, {})
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        if not headers:
+            headers["If-Modified-Since"] = formatdate(os.path.getmtime(path), usegmt=True)
+        return headers
+
+    def _request(self, url: str, headers: Dict[str, str]) -> requests.Response:
+        """Sends a GET request, retrying connection errors and retryable statuses with exponential backoff."""
+        host = urlsplit(url).netloc
+        for attempt in range(self.retries + 1):
+            self.rate_limiter.wait(host)
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+            else:
+                if response.status_code not in RETRY_STATUS or attempt == self.retries:
+                    return response
+                retry_after = response.headers.get("Retry-After", "")
+                delay = float(retry_after) if retry_after.isdigit() else self.backoff * 2 ** attempt
+                response.close()
+            time.sleep(min(delay, 60.0))
+
+    def fetch(self, url: str, path: str) -> str:
+        """
+        Downloads a page unless it is fresh or unchanged.
+
+        Args:
+            url (str): The page URL.
+            path (str): The file to save the page to. It is written atomically.
+
+        Returns:
+            str: "skipped" if the page is fresh, "not_modified" if the server reported it unchanged, or "downloaded".
+
+        Raises:
+            requests.RequestException: If the page could not be downloaded.
+        """
+        entry = self.state.get(url)
+        if (entry is not None and time.time() - entry.get("fetched_at", 0) < self.max_age
+                and os.path.exists(path) and os.path.getsize(path) > MIN_PAGE_SIZE):
+            return "skipped"
+
+        response = self._request(url, self._conditional_headers(url, path))
+        if response.status_code == 304:
+            result = "not_modified"
+        else:
+            response.raise_for_status()
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(response.content)
+            os.replace(tmp_path, path)
+            result = "downloaded"
+
+        new_entry = {"path": path, "fetched_at": time.time()}
+        for key, header in (("etag", "ETag"), ("last_modified", "Last-Modified")):
+            value = response.headers.get(header)
+            if value is None and result == "not_modified" and entry is not None:
+                # A 304 may omit the validators, which then stay the same
+                value = entry.get(key)
+            if value:
+                new_entry[key] = value
+        with self._lock:
+            self.state[url] = new_entry
+        return result
+
+    def download(self, pages: List[Tuple[str, str]]) -> Dict[str, str]:
+        """
+        Downloads pages on the worker pool.
+
+        Args:
+            pages (List[Tuple[str, str]]): (url, path) pairs.
+
+        Returns:
+            Dict[str, str]: The pages that failed, mapped from URL to error. The results of
+            all pages are counted in `counts`.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.counts = {"downloaded": 0, "not_modified": 0, "skipped": 0, "failed": 0}
+        failures = {}
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = {executor.submit(self.fetch, url, path): url for url, path in pages}
+                for done, future in enumerate(tqdm(as_completed(futures), total=len(futures),
+                                                   desc="Downloading pages"), start=1):
+                    try:
+                        self.counts[future.result()] += 1
+                    except requests.RequestException as e:
+                        self.counts["failed"] += 1
+                        failures[futures[future]] = f"{type(e).__name__}: {e}"
+                    if done % self.save_every == 0:
+                        self.save_state()
+        finally:
+            self.save_state()
+        return failures
+
+
+def download_pages(names: List[str],
+                   output_dir: str = "data/downloads",
+                   base_url: str = BASE_URL,
+                   **kwargs) -> PageDownloader:
+    """
+    Downloads wiki pages by name.
+
+    Args:
+        names (List[str]): The page names, appended to `base_url`.
+        output_dir (str): The directory the pages are saved to.
+        base_url (str): The prefix of every page URL.
+        **kwargs: Passed on to PageDownloader. The state file defaults to download_state.json in output_dir.
+
+    Returns:
+        PageDownloader: The downloader, with its counts and state.
+    """
+    kwargs.setdefault("state_path", os.path.join(output_dir, "download_state.json"))
+    downloader = PageDownloader(output_dir, **kwargs)
+    pages = [(base_url + name, os.path.join(output_dir, page_filename(name))) for name in names]
+
+    started = time.perf_counter()
+    failures = downloader.download(pages)
+    elapsed = time.perf_counter() - started
+
+    counts = downloader.counts
+    print(f"{len(pages)} pages in {elapsed:.1f}s: {counts['downloaded']} downloaded, "
+          f"{counts['not_modified']} not modified, {counts['skipped']} skipped, {counts['failed']} failed")
+    for url, error in list(failures.items())[:10]:
+        print(f"  {url}: {error}")
+    return downloader
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Download the wiki pages listed in one or more name files.')
+    parser.add_argument('name_files', type=str, nargs='+',
+                        help='Files listing one page name per line, such as download_scripts/item.txt.')
+    parser.add_argument('--output-dir', type=str, default='data/downloads',
+                        help='Directory to save the HTML files to.')
+    parser.add_argument('--base-url', type=str, default=BASE_URL,
+                        help='Prefix of every page URL.')
+    parser.add_argument('--workers', type=int, default=8,
+                        help='Number of download threads.')
+    parser.add_argument('--rate', type=float, default=4.0,
+                        help='Largest number of requests per second to a host, 0 for no limit.')
+    parser.add_argument('--retries', type=int, default=4,
+                        help='Number of retries of a failed request.')
+    parser.add_argument('--max-age', type=float, default=24,
+                        help='Hours during which a fetched page is not requested again.')
+    args = parser.parse_args()
+
+    download_pages(read_page_names(args.name_files), args.output_dir, args.base_url,
+                   workers=args.workers, rate=args.rate, retries=args.retries, max_age=args.max_age * 3600)
@@ -1,6 +1,6 @@
 import re
-import subprocess
 import html2text
+from download_pages import PageDownloader
 
 # Variants
 WOOD_VARIANTS = ['Oak', 'Spruce', 'Birch', 'Jungle', 'Acacia', 'Dark_Oak',
@@ -37,7 +37,7 @@ def get_html_content(local_path, url=None):
             with open(local_path, 'r', encoding='utf-8') as f:
                 return f.read()
         except FileNotFoundError:
-            subprocess.run(['wget', '-q', '-O', local_path, url], check=True)
+            PageDownloader(workers=1).fetch(url, local_path)
             with open(local_path, 'r', encoding='utf-8') as f:
                 return f.read()
     else:
@@ -1,51 +1,41 @@
 import pathlib
 import os
+import json
+from concurrent.futures import ProcessPoolExecutor
 from bs4 import BeautifulSoup
 from tqdm import tqdm
 import argparse
 import re
 import html2text
 from get_page_names import gen_name_list
-
-# UNWANTED_HEADING_2 = ['Achievements', 'Advancements', 'Contents', 'Data values',
-#                       'Entities', 'External links', 'Gallery', 'History', 'Issues',
-#                       'Navigation', 'Navigation menu', 'References', 'Sounds',
-#                       'Trivia', 'Video', 'Videos', 'See also']
-UNWANTED_HEADING_2 = ['Achievements', 'Advancements', 'Contents', 'Data values',
-                      'External links', 'Gallery', 'Issues', 'Navigation',
-                      'Navigation menu', 'References', 'Sounds', 'Video', 'Videos', 'See also']
+from markdown_cleanup import clean_markdown
 
 
 def convert_html_to_markdown(html_file):
     """
     Converts an HTML file to markdown using html2text.
     """
-    try:
-        with open(html_file, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-    except FileNotFoundError:
-        return f"Error: File '{html_file}' not found."
-    except Exception as e:
-        return f"Error: Could not read file '{html_file}'. {e}"
+    with open(html_file, 'r', encoding='utf-8') as f:
+        html_content = f.read()
 
-    try:
-        h = html2text.HTML2Text()
+    h = html2text.HTML2Text()
 
-        h.ignore_links = True
-        h.ignore_mailto_links = True
-        h.ignore_emphasis = True
-        h.ignore_images = True
-        h.escape_all = True
-        h.bypass_tables = True
+    h.ignore_links = True
+    h.ignore_mailto_links = True
+    h.ignore_emphasis = True
+    h.ignore_images = True
+    h.escape_all = True
+    h.bypass_tables = True
 
-        markdown_content = h.handle(html_content)
+    markdown_content = h.handle(html_content)
 
-        # delete "[edit | edit source]"
-        markdown_content = markdown_content.replace("[edit | edit source]", "")
+    # delete "[edit | edit source]"
+    markdown_content = markdown_content.replace("[edit | edit source]", "")
 
-        return markdown_content
-    except Exception as e:
-        return f"Error: Could not convert HTML to markdown. {e}"
+    return markdown_content
+
+
+TABLE_TAG = re.compile(r'<(/?)table\b[^>]*>', re.IGNORECASE)
 
 
 def html_table_to_markdown(html: str) -> str:
@@ -68,13 +58,30 @@ def html_table_to_markdown(html: str) -> str:
     if not table:
         return ""
 
-    rows = table.find_all('tr')
+    return table_element_to_markdown(table)
+
+
+def table_element_to_markdown(table) -> str:
+    """
+    Convert a parsed BeautifulSoup table element to markdown format.
+
+    Rows of tables nested inside a cell are not rows of this table; their text is kept in the cell.
+
+    Args:
+        table (bs4.element.Tag): The table element.
+
+    Returns:
+        str: The markdown formatted table.
+    """
+    rows = [row for row in table.find_all('tr') if row.find_parent('table') is table]
     markdown_table = []
 
     # Function to handle complex cell content (like lists)
     def process_cell_content(cell):
-        # If the cell contains <ul> or <ol> (unordered or ordered lists), process the list items
-        if cell.find(['ul', 'ol']):
+        # If the cell contains <ul> or <ol> (unordered or ordered lists), process the list items.
+        # Walking the descendants directly avoids building a bs4 filter for every cell.
+        names = [node.name for node in cell.descendants if node.name is not None]
+        if 'ul' in names or 'ol' in names:
             items = []
             for li in cell.find_all('li'):
                 items.append(li.get_text(strip=True))
@@ -86,7 +93,7 @@ def html_table_to_markdown(html: str) -> str:
     # Loop through each row in the table
     for row in rows:
         # Find all td or th elements in the row
-        cells = row.find_all(['td', 'th'])
+        cells = [child for child in row.children if child.name in ('td', 'th')]
         # Process each cell's content
         cell_text = [process_cell_content(cell) for cell in cells]
         markdown_table.append(cell_text)
@@ -108,120 +115,157 @@ def html_table_to_markdown(html: str) -> str:
     return "\n".join(markdown_lines)
 
 
-def parse_html_tables(markdown_content, include_md_table_tag=False):
-    while "<table>" in markdown_content:
-        start = markdown_content.index("<table>")
-        end = markdown_content.index("</table>")
-        # Add a check to ensure that start and end indices are valid
-        if start >= end:
-            break
-        table_text = markdown_content[start: end + len("</table>")]
-        md_table_text = html_table_to_markdown(table_text)
-        # md_table_text = describe_table(md_table_text)
-        if include_md_table_tag:
-            markdown_content = markdown_content[:start] + \
-                "<md_table>\n" + md_table_text + "\n</md_table>" + \
-                markdown_content[end + len("</table>"):]
-        else:
-            markdown_content = markdown_content[:start] + \
-                md_table_text + markdown_content[end + len("</table>"):]
+def find_table_spans(markdown_content):
+    """
+    Finds the outermost HTML tables in a document in a single scan.
 
-    return markdown_content
+    Opening tags may carry attributes (`<table class="wikitable">`) and tables may be
+    nested; a nested table is part of the span of its outermost table. A table that is
+    never closed ends the scan, and the rest of the document is left as it is.
 
+    Args:
+        markdown_content (str): The document.
 
-def remove_unwanted_heading_2(markdown_content):
+    Returns:
+        List[Tuple[int, int]]: The (start, end) offsets of each outermost table, in order.
     """
-    Removes unwanted heading 2 sections from a markdown string using regex.
+    spans = []
+    depth = 0
+    start = 0
+    for match in TABLE_TAG.finditer(markdown_content):
+        if not match.group(1):
+            if depth == 0:
+                start = match.start()
+            depth += 1
+        elif depth > 0:
+            depth -= 1
+            if depth == 0:
+                spans.append((start, match.end()))
+    return spans
+
+
+def parse_html_tables(markdown_content, include_md_table_tag=False, shared_parser=False):
     """
-    unwanted_headings = '|'.join(re.escape(heading)
-                                 for heading in UNWANTED_HEADING_2)
-    pattern = r'##\s+(' + unwanted_headings + r')\s*\n(.*?)(?=(?:\n##\s)|$)'
-    markdown_content = re.sub(pattern, '', markdown_content, flags=re.DOTALL)
-    return markdown_content
+    Replaces every HTML table in a document with a markdown table.
 
+    The tables are located in one scan and the output is assembled once, so the cost
+    grows linearly with the number of tables.
 
-def remove_json_blocks(markdown_content: str) -> str:
-    """
-    Remove JSON-like blocks from the markdown content.
+    Args:
+        markdown_content (str): The document.
+        include_md_table_tag (bool): Whether to wrap each markdown table in <md_table> tags.
+        shared_parser (bool): Whether to parse all the tables of the document with a single
+            BeautifulSoup parser instead of one parser per table.
 
-    This function assumes that any block starting with a line that (after stripping)
-    begins with "{" and continuing until the braces are balanced is unwanted.
+    Returns:
+        str: The document with markdown tables.
     """
-    lines = markdown_content.splitlines(keepends=True)
-    result = []
-    in_json_block = False
-    brace_count = 0
-
-    for line in lines:
-        # If we're not already inside a JSON block, check if the line starts one.
-        if not in_json_block:
-            if line.lstrip().startswith('{'):
-                in_json_block = True
-                brace_count = line.count('{') - line.count('}')
-                # Skip this line.
-                continue
-            else:
-                result.append(line)
+    spans = find_table_spans(markdown_content)
+    if not spans:
+        return markdown_content
+
+    tables = [markdown_content[start:end] for start, end in spans]
+    md_tables = None
+    if shared_parser:
+        soup = BeautifulSoup("".join(tables), 'html.parser')
+        elements = soup.find_all('table', recursive=False)
+        # Malformed markup can merge or split tables, then fall back to one parser per table
+        if len(elements) == len(tables):
+            md_tables = [table_element_to_markdown(element) for element in elements]
+    if md_tables is None:
+        md_tables = [html_table_to_markdown(table) for table in tables]
+
+    pieces = []
+    previous_end = 0
+    for (start, end), md_table_text in zip(spans, md_tables):
+        pieces.append(markdown_content[previous_end:start])
+        # md_table_text = describe_table(md_table_text)
+        if include_md_table_tag:
+            pieces.append("<md_table>\n" + md_table_text + "\n</md_table>")
         else:
-            # We're inside a JSON block, update the brace count.
-            brace_count += line.count('{') - line.count('}')
-            # If we've balanced all the braces, end the JSON block.
-            if brace_count <= 0:
-                in_json_block = False
-            # Skip all lines inside the JSON block.
-            continue
+            pieces.append(md_table_text)
+        previous_end = end
+    pieces.append(markdown_content[previous_end:])
 
-    return ''.join(result)
+    return "".join(pieces)
 
 
-def remove_junk_content(markdown_content: str) -> str:
+def convert_file(input_path, output_path):
     """
-    Remove the junk line 'Jump to navigation Jump to search' if present early in the content.
+    Converts an HTML file into a cleaned markdown file, written atomically.
+
+    Args:
+        input_path (str): The HTML file.
+        output_path (str): The markdown file to write.
     """
-    lines = markdown_content.splitlines()
+    md_content = convert_html_to_markdown(input_path)
+    md_content = parse_html_tables(md_content, shared_parser=True)
+    md_content = clean_markdown(md_content)
+
+    tmp_path = output_path + ".tmp"
     try:
-        # Find its position
-        index = lines.index("Jump to navigation Jump to search")
-        del lines[index]  # Remove it
-    except ValueError:
-        pass  # Do nothing if the line is not found
-    return "\n".join(lines)
+        with open(tmp_path, "w", encoding='utf-8') as f:
+            f.write(md_content)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
 
-def replace_weird_unicode(markdown_content: str) -> str:
-    replace_table = {
-        "×": "x",
-        chr(8204): ""
-    }
+def _convert_task(paths):
+    """Runs `convert_file` in a worker and returns the error message, if any."""
+    input_path, output_path = paths
+    try:
+        convert_file(input_path, output_path)
+        return None
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
 
-    for key, value in replace_table.items():
-        markdown_content = markdown_content.replace(key, value)
 
-    return markdown_content
+def main(input_dir, output_dir, workers=1):
+    """
+    Converts every HTML file in a directory to markdown.
 
+    Args:
+        input_dir (str): The directory of HTML files.
+        output_dir (str): The directory to write the markdown files to.
+        workers (int): The number of worker processes. 1 converts the files in this process.
 
-def main(input_dir, output_dir):
+    Returns:
+        Dict[str, str]: The files that failed to convert, mapped to their error.
+    """
     # Create output directory if it doesn't exist
     pathlib.Path(output_dir).mkdir(parents=True, exist_ok=True)
 
     # Get all HTML files in input directory
-    html_files = [f for f in os.listdir(input_dir) if f.endswith('.html')]
-
-    for html_file in tqdm(html_files, desc=f"Converting HTML files in {input_dir}"):
-        input_path = os.path.join(input_dir, html_file)
-        md_content = convert_html_to_markdown(input_path)
-        md_content = parse_html_tables(md_content)
-        md_content = remove_unwanted_heading_2(md_content)
-        md_content = remove_json_blocks(md_content)
-        md_content = remove_junk_content(md_content)
-        md_content = replace_weird_unicode(md_content)
-
-        # Create output path with .md extension
-        output_file = os.path.splitext(html_file)[0] + '.md'
-        output_path = os.path.join(output_dir, output_file)
-
-        with open(output_path, "w", encoding='utf-8') as f:
-            f.write(md_content)
+    html_files = sorted(f for f in os.listdir(input_dir) if f.endswith('.html'))
+    tasks = [(os.path.join(input_dir, html_file),
+              os.path.join(output_dir, os.path.splitext(html_file)[0] + '.md'))
+             for html_file in html_files]
+
+    desc = f"Converting HTML files in {input_dir}"
+    if workers > 1:
+        # map keeps the input order, so progress and results line up with html_files
+        chunksize = max(1, len(tasks) // (workers * 16))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            errors = list(tqdm(executor.map(_convert_task, tasks, chunksize=chunksize),
+                               total=len(tasks), desc=desc))
+    else:
+        errors = [_convert_task(task) for task in tqdm(tasks, desc=desc)]
+
+    failures = {html_file: error for html_file, error in zip(html_files, errors) if error is not None}
+    failure_file = os.path.join(output_dir, "conversion_failures.json")
+    if failures:
+        with open(failure_file, "w", encoding='utf-8') as f:
+            json.dump(failures, f, indent=4)
+        print(f"{len(failures)} of {len(html_files)} files failed to convert, see {failure_file}")
+        for html_file, error in list(failures.items())[:10]:
+            print(f"  {html_file}: {error}")
+    else:
+        if os.path.exists(failure_file):
+            os.remove(failure_file)
+        print(f"Converted {len(html_files)} files")
+    return failures
 
 
 if __name__ == "__main__":
@@ -231,6 +275,8 @@ if __name__ == "__main__":
                         help='Path to directory containing HTML files.')
     parser.add_argument('output_dir', type=str,
                         help='Path to directory to save Markdown files.')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes to convert files in parallel.')
     args = parser.parse_args()
 
-    main(args.input_dir, args.output_dir)
+    main(args.input_dir, args.output_dir, workers=args.workers)
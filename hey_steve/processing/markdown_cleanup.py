@@ -0,0 +1,284 @@
+"""Streaming markdown cleanup, fusing the cleanup steps of html_to_markdown into one pass.
+
+The document flows through a pipeline of stages as a stream of segments, each a run of
+complete lines. A stage is a generator from segments to segments that finds the lines it
+cares about with `str.find` or a precompiled pattern, rewrites only those, and passes
+everything in between through untouched, so adding a cleanup rule adds a stage rather
+than another split/join pass over the document:
+
+    clean_markdown(markdown_content)
+    clean_markdown(markdown_content, stages=[line_stage(my_rule), *DEFAULT_STAGES])
+
+The default stages produce exactly the output of the previous chain of cleanup
+functions of html_to_markdown, quirks included. That output is frozen in
+test/golden/markdown_cleanup_expected.md.
+"""
+
+import re
+from typing import Callable, Iterable, Iterator, List, Optional
+
+Stage = Callable[[Iterable[str]], Iterator[str]]
+
+UNWANTED_HEADING_2 = ['Achievements', 'Advancements', 'Contents', 'Data values',
+                      'External links', 'Gallery', 'Issues', 'Navigation',
+                      'Navigation menu', 'References', 'Sounds', 'Video', 'Videos', 'See also']
+JUNK_LINE = "Jump to navigation Jump to search"
+UNICODE_TABLE = str.maketrans({"×": "x", chr(8204): ""})
+SEGMENT_SIZE = 1 << 16
+
+# Every line break of str.splitlines()
+LINE_BREAKS = "\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+LINE_BREAK_PATTERN = re.compile(r"\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]")
+
+
+def iter_segments(text: str, size: int = SEGMENT_SIZE) -> Iterator[str]:
+    """Cuts a text into segments of about `size` characters, each ending with a '\\n' except possibly the last."""
+    start = 0
+    while start < len(text):
+        end = text.find("\n", start + size)
+        end = len(text) if end == -1 else end + 1
+        yield text[start:end]
+        start = end
+
+
+def line_stage(rule: Callable[[str], Optional[str]]) -> Stage:
+    """
+    Turns a per-line rule into a stage.
+
+    Args:
+        rule: Takes a line with its line break and returns its replacement, or None to drop it.
+
+    Returns:
+        The stage.
+    """
+    def stage(segments: Iterable[str]) -> Iterator[str]:
+        for segment in segments:
+            for line in segment.splitlines(keepends=True):
+                replacement = rule(line)
+                if replacement is not None:
+                    yield replacement
+    return stage
+
+
+def unwanted_sections_stage(headings: List[str] = UNWANTED_HEADING_2) -> Stage:
+    """
+    Builds a stage removing the sections under unwanted level 2 headings.
+
+    It reproduces the regex `##\\s+(headings)\\s*\\n(.*?)(?=(?:\\n##\\s)|$)` on '\\n' lines:
+    a section starts at a '##' anywhere in a line, followed by whitespace and a heading
+    that ends its line (the '##' may also end a line with the heading on a later one).
+    Blank lines after the heading are removed, as is the first non-blank line, then every
+    line up to one starting with '##' and whitespace. The line break of the last removed
+    line is kept, unless the section ends the document in blank lines.
+
+    Args:
+        headings: The headings whose sections are removed.
+
+    Returns:
+        The stage.
+    """
+    alternatives = '|'.join(re.escape(heading) for heading in headings)
+    # A heading line, or a line ending with '##' whose heading may follow on a later line
+    start_pattern = re.compile(r'##(?:[^\S\n]+(?P<heading>' + alternatives + r')[^\S\n]*|[^\S\n]*)\n')
+    heading_pattern = re.compile(r'(?:' + alternatives + r')[^\S\n]*\n')
+    section_pattern = re.compile(r'^##\s', re.MULTILINE)
+
+    def remove_unwanted_sections(segments: Iterable[str]) -> Iterator[str]:
+        state = "text"
+        prefix = ""  # what precedes the '##' on the heading line, which is kept
+        held: List[str] = []  # a line ending with '##' and the blank lines after it
+        last_newline = False
+        for segment in segments:
+            pos, end = 0, len(segment)
+            while pos < end:
+                if state == "text":
+                    match = start_pattern.search(segment, pos)
+                    if match is None:
+                        yield segment[pos:]
+                        break
+                    line_start = max(pos, segment.rfind("\n", pos, match.start()) + 1)
+                    if line_start > pos:
+                        yield segment[pos:line_start]
+                    prefix = segment[line_start:match.start()]
+                    pos = match.end()
+                    if match.group("heading") is not None:
+                        state = "heading"
+                    else:
+                        held = [segment[line_start:pos]]
+                        state = "pending"
+                elif state == "section":
+                    match = section_pattern.search(segment, pos)
+                    if match is None:
+                        last_newline = segment.endswith("\n")
+                        break
+                    yield prefix + "\n"
+                    pos = match.start()
+                    state = "text"
+                else:
+                    line_end = segment.find("\n", pos) + 1 or end
+                    line = segment[pos:line_end]
+                    if state == "pending":
+                        if line.isspace():
+                            held.append(line)
+                        elif heading_pattern.match(line, len(line) - len(line.lstrip())):
+                            state = "heading"
+                        else:
+                            # Not a heading after all, so this line is read again as text
+                            yield from held
+                            state = "text"
+                            continue
+                        pos = line_end
+                    else:  # blank lines after the heading, then the first non-blank line is removed
+                        pos = line_end
+                        if not (line.isspace() and line.endswith("\n")):
+                            last_newline = line.endswith("\n")
+                            state = "section"
+
+        if state == "pending":
+            yield from held
+        elif state == "heading" and prefix:
+            yield prefix
+        elif state == "section" and (prefix or last_newline):
+            yield prefix + ("\n" if last_newline else "")
+
+    return remove_unwanted_sections
+
+
+def _line_end(segment: str, pos: int) -> int:
+    match = LINE_BREAK_PATTERN.search(segment, pos)
+    return match.end() if match else len(segment)
+
+
+def remove_json_blocks(segments: Iterable[str]) -> Iterator[str]:
+    """
+    Removes JSON-like blocks, from a line starting with '{' until the braces are balanced.
+
+    As in the previous implementation, the line after the opening line is removed too,
+    even when the opening line is balanced on its own.
+    """
+    in_json_block = False
+    brace_count = 0
+    for segment in segments:
+        pos, end = 0, len(segment)
+        while pos < end:
+            if in_json_block:
+                line_end = _line_end(segment, pos)
+                line = segment[pos:line_end]
+                brace_count += line.count('{') - line.count('}')
+                if brace_count <= 0:
+                    in_json_block = False
+                pos = line_end
+                continue
+
+            # Find a '{' preceded only by whitespace on its line
+            search = pos
+            while (idx := segment.find("{", search)) != -1:
+                start = idx
+                while start > pos and segment[start - 1] not in LINE_BREAKS and segment[start - 1].isspace():
+                    start -= 1
+                if start == pos or segment[start - 1] in LINE_BREAKS:
+                    break
+                search = idx + 1
+            if idx == -1:
+                yield segment[pos:]
+                break
+
+            if start > pos:
+                yield segment[pos:start]
+            line_end = _line_end(segment, start)
+            line = segment[start:line_end]
+            in_json_block = True
+            brace_count = line.count('{') - line.count('}')
+            pos = line_end
+
+
+def join_lines(segments: Iterable[str]) -> Iterator[str]:
+    """
+    Rejoins the lines with '\n' as "\n".join(text.splitlines()) would.
+
+    Every line break becomes '\n' and the one ending the document is dropped. Later stages
+    only see '\n' line breaks, so removing a line or a character there never merges two breaks.
+    """
+    pending_break = False
+    carry_cr = False
+    for segment in segments:
+        if carry_cr and segment.startswith("\n"):
+            # '\r' and '\n' are one line break, already counted with the previous segment
+            segment = segment[1:]
+        carry_cr = False
+        if not segment:
+            continue
+        carry_cr = segment.endswith("\r")
+        text = "\n".join(segment.splitlines())
+        yield "\n" + text if pending_break else text
+        pending_break = segment[-1] in LINE_BREAKS
+
+
+def remove_junk_line(segments: Iterable[str]) -> Iterator[str]:
+    """
+    Removes the first 'Jump to navigation Jump to search' line.
+
+    It runs after `join_lines`, so lines are separated by '\\n' only and removing one never
+    merges the line breaks around it. The start of a line cut by a segment boundary is
+    carried over to the next segment.
+    """
+    segments = iter(segments)
+    junk = "\n" + JUNK_LINE + "\n"
+    head = ""  # the last line seen, with the '\n' before it, which may continue in the next segment
+    at_start = True  # whether head is the first line of the document
+    for segment in segments:
+        text = head + segment
+        if at_start and text.startswith(junk[1:]):
+            idx = 0
+        else:
+            idx = text.find(junk)
+            idx = -1 if idx == -1 else idx + 1
+        if idx != -1:
+            yield text[:idx] + text[idx + len(junk) - 1:]
+            yield from segments
+            return
+        cut = text.rfind("\n")
+        if cut == -1:
+            head = text
+            continue
+        yield text[:cut]
+        head = text[cut:]
+        at_start = False
+
+    if head == (JUNK_LINE if at_start else junk[:-1]):
+        return
+    yield head
+
+
+def replace_weird_unicode(segments: Iterable[str]) -> Iterator[str]:
+    """Replaces '×' with 'x' and drops zero-width non-joiners."""
+    for segment in segments:
+        if "×" in segment or chr(8204) in segment:
+            segment = segment.translate(UNICODE_TABLE)
+        yield segment
+
+
+DEFAULT_STAGES: List[Stage] = [
+    unwanted_sections_stage(),
+    remove_json_blocks,
+    join_lines,
+    remove_junk_line,
+    replace_weird_unicode,
+]
+
+
+def clean_markdown(markdown_content: str, stages: Optional[List[Stage]] = None) -> str:
+    """
+    Cleans a converted markdown document in a single streaming pass.
+
+    Args:
+        markdown_content: The markdown document.
+        stages: The cleanup stages to run in order. Defaults to DEFAULT_STAGES.
+
+    Returns:
+        The cleaned document. With the default stages its lines are joined by '\\n' with no trailing line break.
+    """
+    segments: Iterable[str] = iter_segments(markdown_content)
+    for stage in (DEFAULT_STAGES if stages is None else stages):
+        segments = stage(segments)
+    return "".join(segments)
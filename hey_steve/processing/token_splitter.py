@@ -0,0 +1,162 @@
+"""Token-budgeted text splitting with the tokenizer of the embedding model."""
+
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+SEPARATORS = ["\n\n", "\n", ". ", "? ", "! ", " "]
+
+
+class TokenBudgetSplitter:
+    """
+    Splits text into pieces of at most `target_tokens` tokens of the embedding model.
+
+    Sizes are measured with the tokenizer that embeds the chunks, so a piece never
+    exceeds the model's window and short pieces do not waste padding. All the sections
+    of a page are encoded in one batched call. A piece ends at the last separator in
+    the final quarter of its window, preferring paragraph and line breaks over
+    sentences and words, and the next piece starts `overlap_tokens` tokens earlier at a
+    word boundary. A header too long to leave room for `2 * overlap_tokens + 1` tokens of
+    text is cut at a token boundary, so no piece exceeds `target_tokens`.
+    """
+
+    def __init__(self, tokenizer: Any, target_tokens: int = 256, overlap_tokens: int = 32,
+                 separators: Sequence[str] = SEPARATORS):
+        """
+        Args:
+            tokenizer: A Hugging Face fast tokenizer, which returns offset mappings.
+            target_tokens (int): The largest number of tokens per piece, header included.
+            overlap_tokens (int): The number of tokens a piece shares with the previous one.
+            separators (Sequence[str]): The preferred split points, most preferred first.
+        """
+        if not 0 <= overlap_tokens < target_tokens // 2:
+            raise ValueError("overlap_tokens must be less than half of target_tokens")
+        self.tokenizer = tokenizer
+        self.target_tokens = target_tokens
+        self.overlap_tokens = overlap_tokens
+        self.separators = list(separators)
+
+    @classmethod
+    def from_pretrained(cls, model_name: str, **kwargs) -> "TokenBudgetSplitter":
+        """Builds a splitter with the tokenizer of a Hugging Face model."""
+        from transformers import AutoTokenizer
+        return cls(AutoTokenizer.from_pretrained(model_name), **kwargs)
+
+    def _encode(self, texts: List[str]) -> List[List[Tuple[int, int]]]:
+        """Returns the character span of every token of every text, in one batched call."""
+        if not texts:
+            return []
+        encoded = self.tokenizer(texts, add_special_tokens=False, return_offsets_mapping=True)
+        return [[tuple(span) for span in spans] for spans in encoded["offset_mapping"]]
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Counts the tokens of every text, in one batched call."""
+        return [len(spans) for spans in self._encode(texts)]
+
+    def split_sections(self, sections: List[Tuple[str, str]]) -> List[List[Dict[str, Any]]]:
+        """
+        Splits the sections of a page.
+
+        Args:
+            sections (List[Tuple[str, str]]): (header, content) pairs. The header is prepended
+                to every piece of its content and counts toward the budget.
+
+        Returns:
+            List[List[Dict[str, Any]]]: For every section, its pieces with the header to
+            prepend, cut if it was too long, their text without the header, the start and
+            end offsets of the text in the content, and the number of tokens of the header
+            and the text.
+        """
+        headers = sorted({header for header, _ in sections})
+        encoded = self._encode(headers + [content for _, content in sections])
+        max_header_tokens = self.target_tokens - (2 * self.overlap_tokens + 1)
+        fitted_headers = {}
+        for header, spans in zip(headers, encoded[:len(headers)]):
+            if len(spans) > max_header_tokens:
+                fitted_headers[header] = (header[:spans[max_header_tokens - 1][1]], max_header_tokens)
+            else:
+                fitted_headers[header] = (header, len(spans))
+
+        results = []
+        for (header, content), spans in zip(sections, encoded[len(headers):]):
+            fitted_header, header_tokens = fitted_headers[header]
+            results.append([
+                {"header": fitted_header, "text": content[start:end], "start": start, "end": end,
+                 "tokens": header_tokens + tokens}
+                for start, end, tokens in self._split(content, spans, self.target_tokens - header_tokens)])
+        return results
+
+    def _split(self, text: str, spans: List[Tuple[int, int]], budget: int) -> List[Tuple[int, int, int]]:
+        """Cuts a text into (start, end, tokens) pieces of at most `budget` tokens."""
+        n = len(spans)
+        if n <= budget:
+            return [(0, len(text), n)] if text.strip() else []
+
+        starts = [start for start, _ in spans]
+        pieces = []
+        first = 0
+        while first < n:
+            last = min(first + budget, n)
+            if last < n:
+                last = self._snap_end(text, starts, spans, first, last, budget)
+            start, end = spans[first][0], spans[last - 1][1]
+            if text[start:end].strip():
+                pieces.append((start, end, last - first))
+            if last >= n:
+                break
+            first = self._snap_start(text, spans, max(last - self.overlap_tokens, first + 1), last)
+        return pieces
+
+    def _snap_end(self, text: str, starts: List[int], spans: List[Tuple[int, int]],
+                  first: int, last: int, budget: int) -> int:
+        """Moves the end of a window back to the best separator in its last quarter."""
+        low = spans[max(first + 1, last - budget // 4)][0]
+        high = spans[last][0]
+        for separator in self.separators:
+            cut = text.rfind(separator, low, high)
+            if cut != -1:
+                # The first token starting after the separator opens the next piece
+                snapped = bisect_left(starts, cut + len(separator))
+                if first < snapped <= last:
+                    return snapped
+        return last
+
+    def _snap_start(self, text: str, spans: List[Tuple[int, int]], first: int, last: int) -> int:
+        """Moves the start of an overlap forward to the first token that starts a word."""
+        for index in range(first, last):
+            start = spans[index][0]
+            if start == 0 or text[start - 1].isspace() or text[start].isspace():
+                return index
+        return first
+
+
+def token_histogram(lengths: List[int], bin_size: int = 32, max_length: Optional[int] = None, width: int = 40) -> str:
+    """
+    Renders a histogram of chunk lengths in tokens.
+
+    Args:
+        lengths (List[int]): The token count of every chunk.
+        bin_size (int): The width of a bin in tokens.
+        max_length (Optional[int]): The budget, to report how full the chunks are on average.
+        width (int): The length of the longest bar.
+
+    Returns:
+        str: The histogram with the count, mean, median, 95th percentile and maximum.
+    """
+    if not lengths:
+        return "No chunks"
+    ordered = sorted(lengths)
+    bins: Dict[int, int] = {}
+    for length in ordered:
+        bins[length // bin_size] = bins.get(length // bin_size, 0) + 1
+    peak = max(bins.values())
+
+    lines = [f"{len(ordered)} chunks, mean {sum(ordered) / len(ordered):.1f}, "
+             f"median {ordered[len(ordered) // 2]}, p95 {ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]}, "
+             f"max {ordered[-1]} tokens"]
+    if max_length:
+        lines[0] += f", {sum(ordered) / (len(ordered) * max_length):.0%} of the {max_length} token budget used"
+    for index in range(min(bins), max(bins) + 1):
+        count = bins.get(index, 0)
+        bar = "#" * max(1 if count else 0, round(count / peak * width))
+        lines.append(f"{index * bin_size:>5}-{(index + 1) * bin_size - 1:<5} {count:>7} {bar}")
+    return "\n".join(lines)
@@ -1,7 +1,29 @@
 from .rag import SteveRAG
 from .reranker import Reranker
+from .embedding_cache import CachedEmbeddingFunction
+from .query_cache import QueryCache
+from .score_cache import ScoreCache
+from .reranker_service import RerankerService
+from .bm25 import BM25Index
+from .backends import SentenceTransformerEmbedding
+from .lazy import LazyHandle, StartupReport
+from .telemetry import Telemetry, InMemoryExporter, FileExporter, OpenTelemetryExporter, get_telemetry, set_telemetry
 
 __all__ = [
     "SteveRAG",
-    "Reranker"
+    "Reranker",
+    "CachedEmbeddingFunction",
+    "QueryCache",
+    "ScoreCache",
+    "RerankerService",
+    "BM25Index",
+    "SentenceTransformerEmbedding",
+    "LazyHandle",
+    "StartupReport",
+    "Telemetry",
+    "InMemoryExporter",
+    "FileExporter",
+    "OpenTelemetryExporter",
+    "get_telemetry",
+    "set_telemetry"
 ]
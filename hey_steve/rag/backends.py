@@ -0,0 +1,173 @@
+"""Inference backends for the embedding model and the reranker.
+
+- "torch": full-precision PyTorch, the reference.
+- "torch-int8": PyTorch with every `nn.Linear` dynamically quantized to int8. Weights are
+  stored in int8 and activations are quantized on the fly, which speeds up CPU inference
+  several times at a small cost in quality.
+- "onnx": ONNX Runtime on the CPU. The model is exported to ONNX on first load, which
+  requires `pip install optimum[onnxruntime]`.
+
+Quantized and exported models score slightly differently from the reference, so check a
+backend with the retrieval benchmark before deploying it:
+
+    python -m hey_steve.rag.benchmark --output fp32.json
+    python -m hey_steve.rag.benchmark --embedding-backend torch-int8 --reranker-backend torch-int8 \\
+        --compare fp32.json --max-regression 0.02
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+BACKENDS = ("torch", "torch-int8", "onnx")
+
+
+def check_backend(backend: str) -> None:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+
+
+def quantize_dynamic_int8(model: Any) -> Any:
+    """Quantizes the `nn.Linear` layers of a full-precision PyTorch model to int8, in place."""
+    import torch
+
+    model.float()
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+class SentenceTransformerEmbedding(EmbeddingFunction[Documents]):
+    """
+    A Chroma embedding function running a SentenceTransformer model on a selectable backend.
+
+    Unlike Chroma's SentenceTransformerEmbeddingFunction, the backend is part of
+    `model_name`, so a CachedEmbeddingFunction keeps the embeddings of every backend apart.
+    """
+
+    def __init__(self,
+                 model_name: str = "nomic-ai/nomic-embed-text-v2-moe",
+                 backend: str = "torch",
+                 device: str = "cpu",
+                 normalize_embeddings: bool = False,
+                 **kwargs: Any):
+        """
+        Args:
+            model_name (str): The Hugging Face model.
+            backend (str): One of BACKENDS.
+            device (str): The device the model runs on. Quantized and ONNX backends run on the CPU.
+            normalize_embeddings (bool): Whether to normalize the embeddings to unit length.
+            **kwargs: Passed on to SentenceTransformer, e.g. trust_remote_code=True.
+        """
+        from sentence_transformers import SentenceTransformer
+
+        check_backend(backend)
+        if backend == "onnx":
+            self._model = SentenceTransformer(model_name, device=device, backend="onnx", **kwargs)
+        else:
+            self._model = SentenceTransformer(model_name, device=device, **kwargs)
+            if backend == "torch-int8":
+                quantize_dynamic_int8(self._model)
+        self.backend = backend
+        self.model_name = model_name if backend == "torch" else f"{model_name}@{backend}"
+        self._normalize_embeddings = normalize_embeddings
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return list(self._model.encode(
+            list(input), convert_to_numpy=True, normalize_embeddings=self._normalize_embeddings))
+
+
+class OnnxCrossEncoder:
+    """A cross-encoder on ONNX Runtime with the `predict` interface of sentence-transformers' CrossEncoder."""
+
+    def __init__(self, model_name: str, max_length: Optional[int] = None, provider: str = "CPUExecutionProvider"):
+        """
+        Args:
+            model_name (str): The Hugging Face model. It is exported to ONNX on first load.
+            max_length (Optional[int]): The largest number of tokens per pair. Defaults to the model limit.
+            provider (str): The ONNX Runtime execution provider.
+        """
+        try:
+            from optimum.onnxruntime import ORTModelForSequenceClassification
+        except ImportError as e:
+            raise ImportError("The onnx backend requires `pip install optimum[onnxruntime]`") from e
+        from transformers import AutoTokenizer
+
+        self.model = ORTModelForSequenceClassification.from_pretrained(model_name, export=True, provider=provider)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.max_length = max_length
+        self.num_labels = self.model.config.num_labels
+
+    def predict(self, sentences: List[List[str]], batch_size: int = 32, **kwargs: Any) -> np.ndarray:
+        """Scores (query, document) pairs, applying a sigmoid to single-label models like CrossEncoder does."""
+        scores = []
+        for start in range(0, len(sentences), batch_size):
+            batch = sentences[start:start + batch_size]
+            features = self.tokenizer([pair[0] for pair in batch], [pair[1] for pair in batch],
+                                      padding=True, truncation="longest_first",
+                                      max_length=self.max_length, return_tensors="np")
+            scores.append(self.score_features(features))
+        if not scores:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate(scores)
+
+    def score_features(self, features: Dict[str, np.ndarray]) -> np.ndarray:
+        """Scores one padded batch of tokenized pairs."""
+        logits = self.model(**features).logits
+        return 1 / (1 + np.exp(-logits[:, 0])) if self.num_labels == 1 else logits
+
+
+def score_features(model: Any, features: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Scores one padded batch of pairs already tokenized with `model.tokenizer`.
+
+    This is what `predict` does for each of its batches, without tokenizing the pairs again.
+
+    Args:
+        model: A model returned by `load_cross_encoder`.
+        features (Dict[str, np.ndarray]): The padded batch, e.g. from `model.tokenizer.pad`.
+
+    Returns:
+        np.ndarray: The score of every pair, the same as `model.predict` would return.
+    """
+    if hasattr(model, "score_features"):
+        return model.score_features(features)
+
+    import torch
+
+    # The forward pass of CrossEncoder.predict
+    model.model.eval()
+    with torch.inference_mode():
+        inputs = {key: torch.as_tensor(value, device=model.model.device) for key, value in features.items()}
+        # sentence-transformers 4 renamed default_activation_function to activation_fn
+        activation = getattr(model, "activation_fn", None) or model.default_activation_function
+        logits = activation(model.model(**inputs, return_dict=True).logits)
+    scores = logits.float().cpu().numpy()
+    return scores[:, 0] if model.config.num_labels == 1 else scores
+
+
+def load_cross_encoder(model_name: str, backend: str = "torch", max_length: Optional[int] = None,
+                       automodel_args: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    Loads a cross-encoder on a backend.
+
+    Args:
+        model_name (str): The Hugging Face model.
+        backend (str): One of BACKENDS.
+        max_length (Optional[int]): The largest number of tokens per pair. Defaults to the model limit.
+        automodel_args (Optional[Dict[str, Any]]): Passed on to the PyTorch model. Ignored by the int8
+            and ONNX backends, which need full-precision weights.
+
+    Returns:
+        A model with CrossEncoder's `predict(pairs)` method and `tokenizer`, see also `score_features`.
+    """
+    check_backend(backend)
+    if backend == "onnx":
+        return OnnxCrossEncoder(model_name, max_length=max_length)
+
+    from sentence_transformers import CrossEncoder
+
+    if backend == "torch-int8":
+        model = CrossEncoder(model_name, max_length=max_length, device="cpu")
+        quantize_dynamic_int8(model.model)
+        return model
+    return CrossEncoder(model_name, max_length=max_length, automodel_args=automodel_args)
@@ -0,0 +1,85 @@
+import asyncio
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Hashable, List, Set, Tuple
+
+
+class AsyncMicroBatcher:
+    """
+    Coalesces concurrent async requests into micro-batches that run on an executor.
+
+    Requests are grouped by a hashable key (e.g. `n_results`), because one batch call
+    can only serve requests that share it. A group is flushed as soon as it holds
+    `max_batch_size` requests, or `max_wait` seconds after its first request arrived,
+    whichever comes first. The blocking batch function runs on the executor, so the
+    event loop stays free while models run.
+    """
+
+    def __init__(self,
+                 batch_fn: Callable[[Hashable, List[Any]], List[Any]],
+                 executor: Executor,
+                 max_batch_size: int = 16,
+                 max_wait: float = 0.005):
+        """
+        Initializes the batcher.
+
+        Args:
+            batch_fn (Callable[[Hashable, List[Any]], List[Any]]): A blocking function taking a group key and a list of items, returning one result per item, in order.
+            executor (Executor): The executor batch calls run on. Its worker count bounds the number of concurrent batches.
+            max_batch_size (int): The largest number of requests per batch.
+            max_wait (float): The longest time in seconds a request waits for its batch to fill up.
+        """
+        self.batch_fn = batch_fn
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending: Dict[Hashable, List[Tuple[Any, asyncio.Future]]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        # The event loop only keeps weak references to tasks, so running flushes are kept here
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, group: Hashable, item: Any) -> Any:
+        """
+        Adds a request to its group's next batch and waits for its result.
+
+        Args:
+            group (Hashable): The group key passed to the batch function.
+            item (Any): The request item.
+
+        Returns:
+            Any: The batch function's result for this item.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(group, []).append((item, future))
+
+        if len(self._pending[group]) >= self.max_batch_size:
+            self._flush(group)
+        elif group not in self._timers:
+            self._timers[group] = loop.call_later(self.max_wait, self._flush, group)
+
+        return await future
+
+    def _flush(self, group: Hashable) -> None:
+        timer = self._timers.pop(group, None)
+        if timer is not None:
+            timer.cancel()
+        requests = self._pending.pop(group, [])
+        if requests:
+            task = asyncio.get_running_loop().create_task(self._run(group, requests))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, group: Hashable, requests: List[Tuple[Any, asyncio.Future]]) -> None:
+        loop = asyncio.get_running_loop()
+        items = [item for item, _ in requests]
+        try:
+            results = await loop.run_in_executor(self.executor, self.batch_fn, group, items)
+        except Exception as e:
+            for _, future in requests:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(requests, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,460 @@
+"""Retrieval benchmarks on the chunk/question pairs.
+
+Every question generated by `fine_tuning/llm_generate_quesitons.py` has the chunk it was
+generated from as its only relevant document, so recall@k is the fraction of questions
+whose source chunk is among the top k results, and MRR is the mean reciprocal rank of
+that chunk.
+
+The retrieval suite measures recall@k, MRR, latency percentiles and throughput of
+`SteveRAG.query` and `query_with_reranking`, and breaks the latency down into the embed,
+vector search, BM25 and rerank stages. Its JSON output records the commit and settings
+of the run, so two runs can be compared with `--compare`:
+
+    python -m hey_steve.rag.benchmark --output results.json
+    python -m hey_steve.rag.benchmark --compare results.json
+
+With `--max-regression` the comparison becomes an accuracy check, e.g. of a quantized
+backend against the full-precision models. The run fails if recall@k or MRR dropped
+by more than the given amount:
+
+    python -m hey_steve.rag.benchmark --embedding-backend torch-int8 --reranker-backend torch-int8 \
+        --compare results.json --max-regression 0.02
+
+The pool suite measures reranking latency versus recall@k for several candidate pools:
+
+    python -m hey_steve.rag.benchmark --suite pools --pools 5 10 15 25 50 --k 5
+"""
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .rag import DOCUMENT_PREFIX, QUERY_PREFIX, SteveRAG
+
+QUESTION_FILE = "data/chunk_question_pairs/chunk_question_pairs.json"
+RESULTS_VERSION = 1
+
+
+def load_questions(question_file: str = QUESTION_FILE,
+                   num_questions: int = 500,
+                   seed: int = 0) -> List[Tuple[str, str]]:
+    """
+    Loads a reproducible sample of (question, source chunk) pairs.
+
+    Args:
+        question_file: The JSON file mapping each chunk to its generated questions.
+        num_questions: The number of pairs to sample. Zero or a negative number keeps all of them.
+        seed: The random seed of the sample.
+
+    Returns:
+        A list of (question, chunk text) pairs.
+    """
+    with open(question_file, "r") as f:
+        question_pairs: Dict[str, Dict[str, str]] = json.load(f)
+
+    pairs = [(question, chunk)
+             for chunk, questions in question_pairs.items()
+             for question in questions.values()]
+    if 0 < num_questions < len(pairs):
+        pairs = random.Random(seed).sample(pairs, num_questions)
+    return pairs
+
+
+def source_rank(docs: List[Dict[str, Any]], chunk: str) -> Optional[int]:
+    """Returns the 1-based rank of the source chunk among the results, or None if it is missing."""
+    for rank, doc in enumerate(docs, start=1):
+        if doc["text"] == DOCUMENT_PREFIX + chunk:
+            return rank
+    return None
+
+
+def retrieval_metrics(ranks: List[Optional[int]], ks: Sequence[int]) -> Dict[str, float]:
+    """
+    Computes recall@k for every k and the mean reciprocal rank.
+
+    Args:
+        ranks: The rank of the source chunk of every question, None when it was not retrieved.
+        ks: The cutoffs to compute recall at.
+
+    Returns:
+        recall@k for every k, and mrr over the retrieved results.
+    """
+    metrics = {f"recall@{k}": sum(rank is not None and rank <= k for rank in ranks) / len(ranks)
+               for k in ks}
+    metrics["mrr"] = sum(1 / rank for rank in ranks if rank is not None) / len(ranks)
+    return metrics
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    """Summarizes latencies in milliseconds by their mean, p50, p95 and p99."""
+    return {
+        "mean_ms": float(np.mean(latencies)),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99))
+    }
+
+
+def benchmark_method(search: Callable[[List[str]], List[List[Dict[str, Any]]]],
+                     questions: List[Tuple[str, str]],
+                     ks: Sequence[int],
+                     batch_size: int = 1,
+                     warmup: int = 0) -> Dict[str, Any]:
+    """
+    Measures the quality, latency and throughput of a batched search function.
+
+    Args:
+        search: Maps a batch of questions to the results of every question.
+        questions: The (question, chunk text) pairs.
+        ks: The cutoffs to compute recall at.
+        batch_size: The number of questions sent per call.
+        warmup: The number of questions searched before timing starts, so model loading
+            and first-call overheads are not measured.
+
+    Returns:
+        The retrieval metrics, the latency summary per call, the throughput in questions per
+        second and the number of questions.
+    """
+    if warmup:
+        search([question for question, _ in questions[:warmup]])
+
+    ranks = []
+    latencies = []
+    started = time.perf_counter()
+    for start in range(0, len(questions), batch_size):
+        batch = questions[start:start + batch_size]
+        call_started = time.perf_counter()
+        results = search([question for question, _ in batch])
+        latencies.append((time.perf_counter() - call_started) * 1000)
+        ranks.extend(source_rank(docs, chunk) for (_, chunk), docs in zip(batch, results))
+    elapsed = time.perf_counter() - started
+
+    return {
+        **retrieval_metrics(ranks, ks),
+        "latency": latency_summary(latencies),
+        "throughput_qps": len(questions) / elapsed,
+        "num_questions": len(questions)
+    }
+
+
+def benchmark_stages(steve_rag: SteveRAG,
+                     questions: List[Tuple[str, str]],
+                     candidate_pool: int = 15,
+                     warmup: int = 0) -> Dict[str, Dict[str, float]]:
+    """
+    Measures the latency of every stage of `query_with_reranking`, one question at a time.
+
+    The stages are replayed with the components of the RAG in the order the query runs them:
+    the query is embedded with its embedding function, searched in its collection with
+    the embedding, searched in its BM25 index if it has one, and the dense candidates are
+    scored by its reranker if it has one.
+
+    Args:
+        steve_rag: The RAG to benchmark.
+        questions: The (question, chunk text) pairs.
+        candidate_pool: The number of candidates retrieved and reranked per question.
+        warmup: The number of questions run before timing starts.
+
+    Returns:
+        The latency summary of every stage that ran.
+    """
+    # query_many_hybrid retrieves twice the pool from each retriever before fusion
+    depth = 2 * candidate_pool if steve_rag.bm25_index is not None else candidate_pool
+    stages: Dict[str, List[float]] = {"embed": [], "vector_search": []}
+    if steve_rag.bm25_index is not None:
+        stages["bm25_search"] = []
+    if steve_rag.reranker is not None:
+        stages["rerank"] = []
+
+    for index, (question, _) in enumerate(questions[:warmup] + questions):
+        timings = {}
+
+        started = time.perf_counter()
+        embeddings = steve_rag.embedding_fn([QUERY_PREFIX + question])
+        timings["embed"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        results = steve_rag.collection.query(query_embeddings=embeddings, n_results=depth)
+        timings["vector_search"] = time.perf_counter() - started
+
+        if steve_rag.bm25_index is not None:
+            started = time.perf_counter()
+            steve_rag.bm25_index.search(question, depth)
+            timings["bm25_search"] = time.perf_counter() - started
+
+        if steve_rag.reranker is not None:
+            candidates = [{"text": text} for text in results["documents"][0][:candidate_pool]]
+            started = time.perf_counter()
+            steve_rag.reranker.rerank_many([question], [candidates])
+            timings["rerank"] = time.perf_counter() - started
+
+        if index >= warmup:
+            for stage, seconds in timings.items():
+                stages[stage].append(seconds * 1000)
+
+    return {stage: latency_summary(latencies) for stage, latencies in stages.items()}
+
+
+def benchmark_retrieval(steve_rag: SteveRAG,
+                        questions: List[Tuple[str, str]],
+                        ks: Sequence[int] = (1, 5, 10),
+                        candidate_pool: int = 15,
+                        batch_size: int = 1,
+                        warmup: int = 5) -> Dict[str, Any]:
+    """
+    Runs the retrieval suite: `query`, `query_with_reranking` and the stage breakdown.
+
+    Args:
+        steve_rag: The RAG to benchmark. It should have no query cache, or repeated runs
+            measure the cache.
+        questions: The (question, chunk text) pairs.
+        ks: The cutoffs to compute recall at. Both queries return max(ks) results.
+        candidate_pool: The number of candidates retrieved for reranking.
+        batch_size: The number of questions sent per call. 1 times `query` and
+            `query_with_reranking`, larger batches time `query_many` and `query_many_with_reranking`.
+        warmup: The number of questions run before timing each part.
+
+    Returns:
+        The results of every method, the stage latencies and the reranker padding.
+    """
+    n_results = max(ks)
+    methods = {
+        "query": lambda batch: steve_rag.query_many(batch, n_results=n_results)
+    }
+    if steve_rag.reranker is not None:
+        methods["query_with_reranking"] = lambda batch: steve_rag.query_many_with_reranking(
+            batch, n_results=n_results, candidate_pool=candidate_pool)
+
+    results: Dict[str, Any] = {}
+    for name, search in methods.items():
+        results[name] = benchmark_method(search, questions, ks, batch_size=batch_size, warmup=warmup)
+        print(format_method(name, results[name]))
+    results["stages"] = benchmark_stages(steve_rag, questions, candidate_pool, warmup=warmup)
+    for stage, latency in results["stages"].items():
+        print(f"  {stage:<22} {format_latency(latency)}")
+    if steve_rag.reranker is not None:
+        results["reranker_padding"] = steve_rag.reranker.padding_stats()
+        print(f"  reranker padding ratio {results['reranker_padding']['padding_ratio']:.3f}")
+    return results
+
+
+def format_latency(latency: Dict[str, float]) -> str:
+    return " ".join(f"{key[:-3]}={value:.1f}ms" for key, value in latency.items())
+
+
+def format_method(name: str, result: Dict[str, Any]) -> str:
+    metrics = " ".join(f"{key}={value:.3f}" for key, value in result.items()
+                       if key.startswith("recall@") or key == "mrr")
+    return (f"{name:<24} {metrics} {format_latency(result['latency'])} "
+            f"throughput={result['throughput_qps']:.1f}q/s")
+
+
+def benchmark_candidate_pool(steve_rag: SteveRAG,
+                             questions: List[Tuple[str, str]],
+                             pools: List[int],
+                             k: int = 5,
+                             batch_size: int = 1) -> List[Dict[str, Any]]:
+    """
+    Measures latency and recall@k of `query_many_with_reranking` for each pool size, in full and adaptive mode.
+
+    Args:
+        steve_rag: The RAG to benchmark. It must have a reranker and no query cache.
+        questions: The (question, chunk text) pairs.
+        pools: The candidate pool sizes to try.
+        k: The number of reranked results recall is measured on.
+        batch_size: The number of questions sent per call.
+
+    Returns:
+        One row per (pool, mode) with recall@k and mean/p95 latency per question in milliseconds.
+    """
+    rows = []
+    for pool in pools:
+        for adaptive in (False, True):
+            hits = 0
+            latencies = []
+            for start in range(0, len(questions), batch_size):
+                batch = questions[start:start + batch_size]
+                started = time.perf_counter()
+                results = steve_rag.query_many_with_reranking(
+                    [question for question, _ in batch],
+                    n_results=k, candidate_pool=pool, adaptive=adaptive)
+                latencies.append((time.perf_counter() - started) * 1000 / len(batch))
+                for (_, chunk), docs in zip(batch, results):
+                    hits += source_rank(docs, chunk) is not None
+
+            rows.append({
+                "pool": pool,
+                "adaptive": adaptive,
+                f"recall@{k}": hits / len(questions),
+                "mean_ms": float(np.mean(latencies)),
+                "p95_ms": float(np.percentile(latencies, 95))
+            })
+            print(f"pool={pool:<4} adaptive={str(adaptive):<5} recall@{k}={rows[-1][f'recall@{k}']:.3f} "
+                  f"mean={rows[-1]['mean_ms']:.1f}ms p95={rows[-1]['p95_ms']:.1f}ms")
+    return rows
+
+
+def git_commit() -> Optional[str]:
+    """Returns the current commit, marked dirty if the tree has changes, or None outside a git checkout."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+
+def run_metadata(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Describes a run, so results from different commits and machines can be told apart."""
+    return {
+        "version": RESULTS_VERSION,
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "settings": settings
+    }
+
+
+def flatten_metrics(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """Flattens nested results into {"query.latency.p95_ms": value} pairs."""
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten_metrics(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[prefix + key] = float(value)
+    return flat
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Compares the metrics of two retrieval suite runs.
+
+    Args:
+        baseline: The earlier results, as written by `--output`.
+        current: The new results.
+
+    Returns:
+        One row per metric found in both runs with the baseline value, the current value
+        and the relative change.
+    """
+    before = flatten_metrics(baseline["results"])
+    after = flatten_metrics(current["results"])
+    rows = []
+    for name in before.keys() & after.keys():
+        change = (after[name] - before[name]) / before[name] if before[name] else None
+        rows.append({"metric": name, "baseline": before[name], "current": after[name], "change": change})
+    rows.sort(key=lambda row: row["metric"])
+
+    print(f"Baseline {baseline['meta'].get('commit')} vs current {current['meta'].get('commit')}")
+    for row in rows:
+        change = f"{row['change']:+.1%}" if row["change"] is not None else "n/a"
+        print(f"  {row['metric']:<40} {row['baseline']:>10.3f} {row['current']:>10.3f} {change:>8}")
+    return rows
+
+
+def quality_regressions(rows: List[Dict[str, Any]], max_drop: float) -> List[Dict[str, Any]]:
+    """
+    Finds the recall@k and MRR metrics that dropped by more than `max_drop`.
+
+    Args:
+        rows: The comparison rows of `compare_results`.
+        max_drop: The largest acceptable drop, in absolute terms, e.g. 0.02 for two points of recall.
+
+    Returns:
+        The rows of the metrics that regressed.
+    """
+    return [row for row in rows
+            if row["metric"].rsplit(".", 1)[-1].startswith(("recall@", "mrr"))
+            and row["baseline"] - row["current"] > max_drop]
+
+
+def main() -> None:
+    from .backends import BACKENDS, SentenceTransformerEmbedding
+    from .rag import EMBEDDING_MODEL
+    from .reranker import RERANKER_MAX_LENGTH, Reranker
+
+    parser = argparse.ArgumentParser(
+        description="Benchmark retrieval quality and latency on the chunk/question pairs.")
+    parser.add_argument("--suite", type=str, choices=["retrieval", "pools"], default="retrieval",
+                        help="retrieval measures query and query_with_reranking, pools sweeps the candidate pool.")
+    parser.add_argument("--collection", type=str, default="mc_rag_custom")
+    parser.add_argument("--bm25-index", type=str, default=None,
+                        help="Optional BM25 index to fuse with dense retrieval.")
+    parser.add_argument("--embedding-backend", type=str, choices=BACKENDS, default="torch")
+    parser.add_argument("--reranker-backend", type=str, choices=BACKENDS, default="torch")
+    parser.add_argument("--reranker-max-length", type=int, default=RERANKER_MAX_LENGTH,
+                        help="The largest number of tokens per reranked pair.")
+    parser.add_argument("--embedding-cache", type=str, default=None,
+                        help="Optional embedding cache directory. Cached query embeddings hide the embed stage.")
+    parser.add_argument("--questions", type=str, default=QUESTION_FILE)
+    parser.add_argument("--num-questions", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ks", type=int, nargs="+", default=[1, 5, 10],
+                        help="Cutoffs to compute recall at in the retrieval suite.")
+    parser.add_argument("--candidate-pool", type=int, default=15)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--pools", type=int, nargs="+", default=[5, 10, 15, 25, 50])
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--output", type=str, default=None,
+                        help="Optional path to write the results as JSON.")
+    parser.add_argument("--compare", type=str, default=None,
+                        help="Optional results JSON of an earlier retrieval run to compare against.")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="With --compare, fail if recall@k or MRR dropped by more than this amount.")
+    args = parser.parse_args()
+    if args.max_regression is not None and not args.compare:
+        parser.error("--max-regression requires --compare")
+
+    steve_rag = SteveRAG(
+        collection_name=args.collection,
+        embedding_function=SentenceTransformerEmbedding(
+            EMBEDDING_MODEL, backend=args.embedding_backend, trust_remote_code=True),
+        reranker=Reranker(backend=args.reranker_backend, max_length=args.reranker_max_length),
+        embedding_cache_dir=args.embedding_cache,
+        bm25_index_path=args.bm25_index,
+    )
+    questions = load_questions(args.questions, args.num_questions, args.seed)
+
+    if args.suite == "pools":
+        output: Any = benchmark_candidate_pool(
+            steve_rag, questions, args.pools, k=args.k, batch_size=args.batch_size)
+    else:
+        settings = {key: getattr(args, key) for key in (
+            "collection", "embedding_backend", "reranker_backend", "reranker_max_length", "bm25_index", "embedding_cache", "questions", "num_questions", "seed",
+            "ks", "candidate_pool", "batch_size", "warmup")}
+        settings["collection_count"] = steve_rag.collection.count()
+        output = {"meta": run_metadata(settings),
+                  "results": benchmark_retrieval(
+                      steve_rag, questions, ks=args.ks, candidate_pool=args.candidate_pool,
+                      batch_size=args.batch_size, warmup=args.warmup)}
+        if args.compare:
+            with open(args.compare, "r") as f:
+                rows = compare_results(json.load(f), output)
+            if args.max_regression is not None:
+                output["regressions"] = quality_regressions(rows, args.max_regression)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=4)
+
+    if isinstance(output, dict) and output.get("regressions"):
+        for row in output["regressions"]:
+            print(f"REGRESSION: {row['metric']} dropped from {row['baseline']:.3f} to {row['current']:.3f}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+# Words, numbers and snake_case identifiers such as netherite_upgrade_smithing_template
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:_[a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercases and tokenizes text for BM25.
+
+    Identifiers joined by underscores are kept whole and also split into their parts,
+    so "Dark_Oak_Fence_Gate" matches both the identifier and the words "dark oak fence gate".
+
+    Args:
+        text: The text to tokenize.
+
+    Returns:
+        The list of tokens.
+    """
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        if "_" in token:
+            tokens.extend(token.split("_"))
+    return tokens
+
+
+class BM25Index:
+    """
+    A compact in-process BM25 inverted index with array-backed postings.
+
+    The postings of term t are `post_docs[offsets[t]:offsets[t + 1]]` (document numbers)
+    and `post_tfs[offsets[t]:offsets[t + 1]]` (term frequencies). Document numbers index
+    into `doc_ids`, which holds the Chroma document IDs, so lexical and dense results can
+    be fused by ID. The whole index is saved as a single `.npz` file.
+    """
+
+    def __init__(self,
+                 doc_ids: List[str],
+                 vocab: Dict[str, int],
+                 doc_len: np.ndarray,
+                 offsets: np.ndarray,
+                 post_docs: np.ndarray,
+                 post_tfs: np.ndarray,
+                 k1: float = 1.5,
+                 b: float = 0.75):
+        self.doc_ids = doc_ids
+        self.vocab = vocab
+        self.doc_len = doc_len
+        self.offsets = offsets
+        self.post_docs = post_docs
+        self.post_tfs = post_tfs
+        self.k1 = k1
+        self.b = b
+        self.avg_doc_len = float(doc_len.mean()) if len(doc_len) else 0.0
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    @classmethod
+    def build(cls, documents: Iterable[Tuple[str, str]], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        """
+        Builds an index from (document ID, text) pairs.
+
+        Args:
+            documents: The (document ID, text) pairs to index.
+            k1: The BM25 term frequency saturation parameter.
+            b: The BM25 length normalization parameter.
+
+        Returns:
+            The built index.
+        """
+        doc_ids: List[str] = []
+        doc_len: List[int] = []
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc_id, text in documents:
+            counts = Counter(tokenize(text))
+            doc_number = len(doc_ids)
+            doc_ids.append(doc_id)
+            doc_len.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc_number, tf))
+
+        terms = sorted(postings)
+        vocab = {term: i for i, term in enumerate(terms)}
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[term]) for term in terms])
+        post_docs = np.empty(offsets[-1], dtype=np.int32)
+        post_tfs = np.empty(offsets[-1], dtype=np.int32)
+        for i, term in enumerate(terms):
+            entries = np.asarray(postings[term], dtype=np.int32)
+            post_docs[offsets[i]:offsets[i + 1]] = entries[:, 0]
+            post_tfs[offsets[i]:offsets[i + 1]] = entries[:, 1]
+
+        return cls(doc_ids, vocab, np.asarray(doc_len, dtype=np.int32),
+                   offsets, post_docs, post_tfs, k1=k1, b=b)
+
+    def save(self, path: str) -> None:
+        """Saves the index to a `.npz` file."""
+        terms = sorted(self.vocab, key=self.vocab.get)
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                doc_ids=np.asarray(self.doc_ids, dtype=str),
+                terms=np.asarray(terms, dtype=str),
+                doc_len=self.doc_len,
+                offsets=self.offsets,
+                post_docs=self.post_docs,
+                post_tfs=self.post_tfs,
+                params=np.asarray([self.k1, self.b])
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Loads an index saved with `save`."""
+        with np.load(path) as data:
+            k1, b = data["params"].tolist()
+            return cls(
+                data["doc_ids"].tolist(),
+                {term: i for i, term in enumerate(data["terms"].tolist())},
+                data["doc_len"],
+                data["offsets"],
+                data["post_docs"],
+                data["post_tfs"],
+                k1=k1, b=b
+            )
+
+    def search(self, query_text: str, n_results: int = 10) -> List[Tuple[str, float]]:
+        """
+        Scores every document containing a query term and returns the best ones.
+
+        Args:
+            query_text: The query text.
+            n_results: The number of results to return.
+
+        Returns:
+            A list of (document ID, BM25 score) pairs, best first.
+        """
+        num_docs = len(self.doc_ids)
+        if num_docs == 0 or self.avg_doc_len == 0:
+            return []
+
+        scores = np.zeros(num_docs, dtype=np.float32)
+        length_norm = self.k1 * (1 - self.b + self.b * self.doc_len / self.avg_doc_len)
+        for term, query_tf in Counter(tokenize(query_text)).items():
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.post_docs[start:end]
+            tfs = self.post_tfs[start:end]
+            idf = np.log(1 + (num_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += query_tf * idf * tfs * (self.k1 + 1) / (tfs + length_norm[docs])
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > n_results:
+            matched = matched[np.argpartition(-scores[matched], n_results - 1)[:n_results]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(self.doc_ids[i], float(scores[i])) for i in matched]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fuses several rankings of document IDs with reciprocal rank fusion.
+
+    Args:
+        rankings: The rankings to fuse, each a list of document IDs, best first.
+        k: The RRF constant. Larger values flatten the contribution of top ranks.
+
+    Returns:
+        A list of (document ID, fused score) pairs, best first.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda x: x[1], reverse=True)
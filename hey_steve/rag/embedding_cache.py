@@ -0,0 +1,213 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+
+class CachedEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Wraps an embedding function with a persistent, content-addressed embedding cache.
+
+    Embeddings are keyed on (model name, task prefix, text hash). They are stored as
+    float32 rows appended to a memory-mapped `vectors.f32` file, and `index.txt` holds
+    one key per line, where line i is the key of row i. Only texts whose key is not in
+    the index are passed to the wrapped embedding function.
+
+    Several processes can share a cache directory. Appends hold an exclusive `fcntl`
+    lock on the directory's lock file and first read the rows other processes appended,
+    so row numbers always come from the files on disk.
+    """
+
+    def __init__(self,
+                 embedding_function: EmbeddingFunction,
+                 cache_dir: str = "data/embedding_cache",
+                 model_name: Optional[str] = None,
+                 prefixes: Sequence[str] = ()):
+        """
+        Initializes the cache and loads any embeddings stored by earlier runs.
+
+        Args:
+            embedding_function (EmbeddingFunction): The embedding function to wrap.
+            cache_dir (str): The root directory of the cache. Each model gets its own subdirectory.
+            model_name (Optional[str]): The name of the embedding model. Defaults to a name derived from the embedding function.
+            prefixes (Sequence[str]): Task prefixes (e.g. "search_query: ") that are split off the text and kept as a separate part of the key.
+        """
+        self.embedding_function = embedding_function
+        self.model_name = model_name or _default_model_name(embedding_function)
+        self.prefixes = tuple(prefixes)
+        self.cache_dir = os.path.join(
+            cache_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", self.model_name))
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._index: Dict[str, int] = {}
+        # Rows and bytes of index.txt read so far, so later reads only parse new lines
+        self._rows = 0
+        self._index_offset = 0
+        self._dim: Optional[int] = None
+        self._vectors: Optional[np.memmap] = None
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._vectors_path = os.path.join(self.cache_dir, "vectors.f32")
+        self._index_path = os.path.join(self.cache_dir, "index.txt")
+        self._meta_path = os.path.join(self.cache_dir, "meta.json")
+        self._lock_path = os.path.join(self.cache_dir, "lock")
+        with self._lock, self._file_lock():
+            self._load()
+
+    def __call__(self, input: Documents) -> Embeddings:
+        keys = [self._key(text) for text in input]
+
+        with self._lock:
+            missing: Dict[str, str] = {}
+            for key, text in zip(keys, input):
+                if key not in self._index and key not in missing:
+                    missing[key] = text
+
+        # The model runs without the lock, so concurrent callers embed in parallel
+        if missing:
+            self._append(list(missing), self.embedding_function(list(missing.values())))
+
+        with self._lock:
+            self.misses += len(missing)
+            self.hits += len(keys) - len(missing)
+            return [np.array(self._vectors[self._index[key]]) for key in keys]
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def stats(self) -> Dict[str, float]:
+        """Returns the number of cached embeddings and the hit/miss counters since startup."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._index),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def _key(self, text: str) -> str:
+        prefix = ""
+        for candidate in self.prefixes:
+            if text.startswith(candidate):
+                prefix = candidate
+                text = text[len(candidate):]
+                break
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return hashlib.sha256(
+            f"{self.model_name}\0{prefix}\0{text_hash}".encode("utf-8")).hexdigest()
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Holds the exclusive lock of the cache directory, shared with other processes."""
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _load(self) -> None:
+        """Loads the index and maps the vectors, dropping rows left by an interrupted write. Needs both locks."""
+        if not os.path.exists(self._meta_path):
+            return
+        with open(self._meta_path, "r") as f:
+            meta = json.load(f)
+        if meta["model"] != self.model_name:
+            raise ValueError(
+                f"Embedding cache at {self.cache_dir} belongs to model {meta['model']}, not {self.model_name}")
+        self._dim = meta["dim"]
+
+        content = b""
+        if os.path.exists(self._index_path):
+            with open(self._index_path, "rb") as f:
+                content = f.read()
+        # A key without its newline was cut off by an interrupted write
+        keys = content[:content.rfind(b"\n") + 1].decode("utf-8").split()
+        row_bytes = self._dim * np.dtype(np.float32).itemsize
+        num_rows = os.path.getsize(self._vectors_path) // row_bytes \
+            if os.path.exists(self._vectors_path) else 0
+
+        # Vectors are written before keys, so a crash leaves at most extra rows
+        num_rows = min(num_rows, len(keys))
+        keys = keys[:num_rows]
+        index_bytes = sum(len(key) + 1 for key in keys)
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(num_rows * row_bytes)
+        with open(self._index_path, "ab") as f:
+            f.truncate(index_bytes)
+
+        self._index = {key: row for row, key in enumerate(keys)}
+        self._rows = num_rows
+        self._index_offset = index_bytes
+        self._map_vectors()
+
+    def _read_new_rows(self) -> None:
+        """Indexes the rows other processes appended since the last read. Needs both locks."""
+        if self._dim is None:
+            self._load()
+            return
+        if not os.path.exists(self._index_path):
+            return
+        with open(self._index_path, "rb") as f:
+            f.seek(self._index_offset)
+            content = f.read()
+        for key in content.decode("utf-8").split():
+            self._index[key] = self._rows
+            self._rows += 1
+        self._index_offset += len(content)
+
+    def _append(self, keys: List[str], embeddings: Embeddings) -> None:
+        """Appends the embeddings of keys no process has stored yet."""
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        with self._lock, self._file_lock():
+            self._read_new_rows()
+            new = [i for i, key in enumerate(keys) if key not in self._index]
+            if self._dim is None:
+                self._dim = vectors.shape[1]
+                with open(self._meta_path, "w") as f:
+                    json.dump({"model": self.model_name, "dim": self._dim}, f)
+
+            if new:
+                lines = "".join(keys[i] + "\n" for i in new).encode("utf-8")
+                with open(self._vectors_path, "ab") as f:
+                    f.write(vectors[new].tobytes())
+                with open(self._index_path, "ab") as f:
+                    f.write(lines)
+                for i in new:
+                    self._index[keys[i]] = self._rows
+                    self._rows += 1
+                self._index_offset += len(lines)
+            self._map_vectors()
+
+    def _map_vectors(self) -> None:
+        if not self._rows:
+            self._vectors = None
+            return
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r",
+                                  shape=(self._rows, self._dim))
+
+
+def _default_model_name(embedding_function: EmbeddingFunction) -> str:
+    """Returns the model name of an embedding function, falling back to its class name."""
+    for attribute in ("model_name", "_model_name"):
+        name = getattr(embedding_function, attribute, None)
+        if isinstance(name, str):
+            return name
+    model = getattr(embedding_function, "_model", None)
+    # SentenceTransformerEmbeddingFunction shares loaded models in a dict keyed by model name
+    for name, candidate in getattr(type(embedding_function), "models", {}).items():
+        if model is not None and candidate is model:
+            return name
+    base_model = getattr(getattr(model, "model_card_data", None), "base_model", None)
+    if isinstance(base_model, str):
+        return base_model
+    return type(embedding_function).__name__
@@ -0,0 +1,199 @@
+"""Background initialization of models and data, with readiness states and a startup report.
+
+Servers build their heavy components in `LazyHandle`s instead of at import time, so they
+can start answering at once: requests that do not need a component never wait for it,
+and requests that do wait for that component only.
+
+    report = StartupReport()
+    steve_rag = LazyHandle("steve_rag", build_rag, warm_up=SteveRAG.warm_up, report=report).start()
+    ...
+    rag = await steve_rag.aget(timeout=30)
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Generic, Iterator, List, Optional, Sequence, TextIO, Tuple, TypeVar
+
+T = TypeVar("T")
+
+PENDING = "pending"
+LOADING = "loading"
+WARMING_UP = "warming_up"
+READY = "ready"
+FAILED = "failed"
+
+
+class StartupReport:
+    """Collects how long every component took to load and warm up, relative to process start."""
+
+    def __init__(self, stream: Optional[TextIO] = None):
+        """
+        Args:
+            stream (Optional[TextIO]): Where `print` writes the report. Defaults to stderr, as
+                stdout is the transport of stdio MCP servers.
+        """
+        self.stream = stream if stream is not None else sys.stderr
+        self.started = time.perf_counter()
+        self._rows: List[Tuple[str, str, float]] = []
+        self._events: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, phase: str, seconds: float) -> None:
+        """Records the duration of a phase of a component, e.g. ("steve_rag", "load")."""
+        with self._lock:
+            self._rows.append((name, phase, seconds))
+
+    @contextmanager
+    def stage(self, name: str, phase: str = "load") -> Iterator[None]:
+        """Times the block as a phase of a component."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, phase, time.perf_counter() - started)
+
+    def mark(self, event: str) -> None:
+        """Records the time since startup at which an event happened, e.g. "server_ready"."""
+        with self._lock:
+            self._events[event] = time.perf_counter() - self.started
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Returns the phase durations of every component and the event times, in seconds."""
+        with self._lock:
+            components: Dict[str, Dict[str, float]] = {}
+            for name, phase, seconds in self._rows:
+                components.setdefault(name, {})[phase] = seconds
+            return {"components": components, "events": dict(self._events),
+                    "elapsed": time.perf_counter() - self.started}
+
+    def render(self) -> str:
+        """Renders the report as one line per component and event."""
+        report = self.as_dict()
+        lines = [f"Startup report, {report['elapsed']:.2f}s since start"]
+        for name, phases in report["components"].items():
+            total = sum(seconds for phase, seconds in phases.items() if "." not in phase)
+            details = ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in phases.items())
+            lines.append(f"  {name:<16} {total:>7.2f}s  ({details})")
+        for event, seconds in report["events"].items():
+            lines.append(f"  {event:<16} at {seconds:.2f}s")
+        return "\n".join(lines)
+
+    def print(self) -> None:
+        print(self.render(), file=self.stream, flush=True)
+
+    def print_when_ready(self, handles: Sequence["LazyHandle"]) -> None:
+        """Prints the report from a background thread once every handle has finished loading, failed or not."""
+        def wait_and_print():
+            for handle in handles:
+                handle.wait()
+            self.mark("all_ready")
+            self.print()
+
+        threading.Thread(target=wait_and_print, name="startup-report", daemon=True).start()
+
+
+class LazyHandle(Generic[T]):
+    """
+    A component built on a background thread, with an explicit readiness state.
+
+    The state goes from "pending" to "loading", then "warming_up" if there is a warm-up,
+    and ends in "ready" or "failed". `get` and `aget` start loading if `start` was not
+    called, wait for it and return the component, or raise the error it failed with.
+    """
+
+    def __init__(self,
+                 name: str,
+                 factory: Callable[[], T],
+                 warm_up: Optional[Callable[[T], Optional[Dict[str, float]]]] = None,
+                 report: Optional[StartupReport] = None):
+        """
+        Args:
+            name (str): The name of the component in the report and in errors.
+            factory (Callable[[], T]): Builds the component.
+            warm_up (Optional[Callable[[T], Optional[Dict[str, float]]]]): Runs once the component is
+                built, before it is handed out. If it returns seconds per stage, they are reported too.
+            report (Optional[StartupReport]): The report the load and warm-up times are recorded in.
+        """
+        self.name = name
+        self.factory = factory
+        self.warm_up = warm_up
+        self.report = report
+        self.state = PENDING
+        self.error: Optional[BaseException] = None
+        self._future: Future = Future()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> "LazyHandle[T]":
+        """Starts loading on a background thread, unless it already started."""
+        with self._lock:
+            if self._thread is None:
+                # A running future cannot be cancelled, so a waiter that times out cannot cancel the load
+                self._future.set_running_or_notify_cancel()
+                self.state = LOADING
+                self._thread = threading.Thread(target=self._load, name=f"load-{self.name}", daemon=True)
+                self._thread.start()
+        return self
+
+    def _load(self) -> None:
+        try:
+            started = time.perf_counter()
+            value = self.factory()
+            self._record("load", time.perf_counter() - started)
+
+            if self.warm_up is not None:
+                self.state = WARMING_UP
+                started = time.perf_counter()
+                stages = self.warm_up(value)
+                self._record("warm_up", time.perf_counter() - started)
+                for stage, seconds in (stages or {}).items():
+                    self._record(f"warm_up.{stage}", seconds)
+        except BaseException as e:
+            self.state = FAILED
+            self.error = e
+            self._future.set_exception(e)
+        else:
+            self.state = READY
+            self._future.set_result(value)
+
+    def _record(self, phase: str, seconds: float) -> None:
+        if self.report is not None:
+            self.report.record(self.name, phase, seconds)
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Waits until loading has finished, successfully or not. Returns whether it has."""
+        self.start()
+        try:
+            self._future.exception(timeout)
+        except TimeoutError:
+            return False
+        return True
+
+    def get(self, timeout: Optional[float] = None) -> T:
+        """
+        Returns the component, waiting for it to load.
+
+        Args:
+            timeout (Optional[float]): The longest wait in seconds. None waits as long as loading takes.
+
+        Raises:
+            TimeoutError: If the component is not ready within the timeout.
+        """
+        self.start()
+        return self._future.result(timeout)
+
+    async def aget(self, timeout: Optional[float] = None) -> T:
+        """Returns the component, waiting for it to load without blocking the event loop. See `get`."""
+        self.start()
+        return await asyncio.wait_for(asyncio.wrap_future(self._future), timeout)
+
+    def __repr__(self) -> str:
+        return f"LazyHandle({self.name!r}, state={self.state!r})"
@@ -0,0 +1,91 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+class QueryCache:
+    """
+    A thread-safe LRU cache of query results with a time-to-live.
+
+    Keys are built from the normalized query text, so queries that differ only in
+    case, whitespace or trailing punctuation share an entry.
+    """
+
+    def __init__(self, max_size: int = 256, ttl: Optional[float] = 600.0):
+        """
+        Initializes an empty cache.
+
+        Args:
+            max_size (int): The maximum number of entries. The least recently used entry is evicted first.
+            ttl (Optional[float]): The number of seconds an entry stays valid. None means entries never expire.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[Hashable, Tuple[float, List[Dict[str, Any]]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize_query(query_text: str) -> str:
+        """Lowercases the query, collapses whitespace and strips surrounding punctuation."""
+        query_text = re.sub(r"\s+", " ", query_text.casefold())
+        return query_text.strip(" ?!.,;:")
+
+    def make_key(self, kind: str, query_text: str, n_results: int, version: int) -> Hashable:
+        """
+        Builds a cache key.
+
+        Args:
+            kind (str): The kind of query, e.g. "query" or "rerank".
+            query_text (str): The raw query text.
+            n_results (int): The number of results requested.
+            version (int): The collection version the results were computed against.
+
+        Returns:
+            Hashable: The cache key.
+        """
+        return (kind, self.normalize_query(query_text), n_results, version)
+
+    def get(self, key: Hashable) -> Optional[List[Dict[str, Any]]]:
+        """Returns a copy of the cached results for the key, or None on a miss or expired entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return [dict(result) for result in entry[1]]
+
+    def put(self, key: Hashable, results: List[Dict[str, Any]]) -> None:
+        """Stores a copy of the results, evicting the least recently used entries if the cache is full."""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), [dict(result) for result in results])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Removes every entry. The hit/miss counters are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Returns the size of the cache and its hit, miss and eviction counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
@@ -1,9 +1,31 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import chromadb
 from chromadb.utils.embedding_functions import EmbeddingFunction, DefaultEmbeddingFunction
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple, Callable
 from .reranker import Reranker
+from .embedding_cache import CachedEmbeddingFunction
+from .query_cache import QueryCache
+from .batching import AsyncMicroBatcher
+from .bm25 import BM25Index, reciprocal_rank_fusion
+from .backends import SentenceTransformerEmbedding
+from .telemetry import SIZE_BUCKETS, Telemetry, get_telemetry
+from ..processing.chunk_store import ChunkStore
 from tqdm import tqdm
 
+EMBEDDING_MODEL = "nomic-ai/nomic-embed-text-v2-moe"
+# Task prefixes expected by nomic-embed-text-v2-moe
+DOCUMENT_PREFIX = "search_document: "
+QUERY_PREFIX = "search_query: "
+
+MANIFEST_VERSION = 2
+
 
 class SteveRAG:
     """
@@ -14,7 +36,17 @@ class SteveRAG:
     def __init__(self,
                  collection_name: str = "mc_rag",
                  embedding_function: Optional[EmbeddingFunction] = None,
-                 reranker: Reranker = None):
+                 reranker: Reranker = None,
+                 persist_directory: str = "./chroma",
+                 manifest_path: Optional[str] = None,
+                 embedding_cache_dir: Optional[str] = None,
+                 query_cache: Optional[QueryCache] = None,
+                 async_workers: int = 2,
+                 async_max_batch_size: int = 16,
+                 async_batch_wait: float = 0.005,
+                 bm25_index_path: Optional[str] = None,
+                 telemetry: Optional[Telemetry] = None,
+                 embedding_backend: Optional[str] = None):
         """
         Initializes the SteveRAG with ChromaDB client, and embedding function.
 
@@ -22,39 +54,151 @@ class SteveRAG:
             collection_name (str): The name of the ChromaDB collection.
             embedding_function (Optional[EmbeddingFunction]):  The embedding function to use. Defaults to None, in which case DefaultEmbeddingFunciton is used with default model.
             reranker (Reranker, optional): A reranker object for reranking the results. Defaults to None.
+            persist_directory (str): The directory ChromaDB persists the collection in.
+            manifest_path (Optional[str]): The path of the reindexing manifest, which records the content hash and chunk IDs of every ingested source, per chunks directory. Defaults to `<collection_name>_manifest.json` inside `persist_directory`.
+            embedding_cache_dir (Optional[str]): If given, the embedding function is wrapped in a persistent CachedEmbeddingFunction stored in this directory, so texts embedded before are not embedded again. Defaults to None.
+            query_cache (Optional[QueryCache]): A cache for the results of `query` and `query_with_reranking`. It is cleared whenever the collection changes. Defaults to None.
+            async_workers (int): The number of threads the async query path runs model inference on.
+            async_max_batch_size (int): The largest number of concurrent async queries coalesced into one batch.
+            async_batch_wait (float): The longest time in seconds an async query waits for its batch to fill up.
+            bm25_index_path (Optional[str]): If given, a BM25 index of the collection is kept at this path, rebuilt by `load_chunks_into_rag`, and fused with dense results to form the reranking candidates. Defaults to None.
+            telemetry (Optional[Telemetry]): Where spans and metrics of queries and writes are recorded. Defaults to the shared telemetry, which is off unless `set_telemetry` enabled it.
+            embedding_backend (Optional[str]): If given instead of `embedding_function`, EMBEDDING_MODEL is loaded on this backend: "torch", "torch-int8" or "onnx", see hey_steve/rag/backends.py. Defaults to None.
         """
 
         self.reranker = reranker
-        self.client = chromadb.PersistentClient()
-        if embedding_function is None:
+        self.query_cache = query_cache
+        self.telemetry = telemetry if telemetry is not None else get_telemetry()
+        # Bumped on every write so cached results never outlive the data they came from
+        self.collection_version = 0
+        self.client = chromadb.PersistentClient(path=persist_directory)
+        if embedding_function is not None and embedding_backend is not None:
+            raise ValueError("Pass either embedding_function or embedding_backend, not both")
+        if embedding_backend is not None:
+            self.embedding_fn = SentenceTransformerEmbedding(
+                EMBEDDING_MODEL, backend=embedding_backend, trust_remote_code=True)
+        elif embedding_function is None:
             self.embedding_fn = DefaultEmbeddingFunction()
         else:
             self.embedding_fn = embedding_function
+        if embedding_cache_dir is not None and not isinstance(self.embedding_fn, CachedEmbeddingFunction):
+            self.embedding_fn = CachedEmbeddingFunction(
+                self.embedding_fn,
+                cache_dir=embedding_cache_dir,
+                prefixes=(DOCUMENT_PREFIX, QUERY_PREFIX)
+            )
 
         self.collection = self.client.get_or_create_collection(
             name=collection_name,
             embedding_function=self.embedding_fn
         )
-        self._id_counter = self.collection.count()
+        self.manifest_path = manifest_path or os.path.join(
+            persist_directory, f"{collection_name}_manifest.json")
+
+        self.bm25_index_path = bm25_index_path
+        self.bm25_index: Optional[BM25Index] = None
+        if bm25_index_path is not None and os.path.exists(bm25_index_path):
+            self.bm25_index = BM25Index.load(bm25_index_path)
+
+        if query_cache is not None:
+            self.telemetry.gauge("steve_rag_query_cache_entries",
+                                 lambda: query_cache.stats()["size"], collection=collection_name)
+        if isinstance(self.embedding_fn, CachedEmbeddingFunction):
+            for key in ("hits", "misses", "hit_rate"):
+                self.telemetry.gauge(f"steve_rag_embedding_cache_{key}",
+                                     lambda key=key: self.embedding_fn.stats()[key],
+                                     collection=collection_name)
+
+        # Serializes writers; readers only rely on the thread-safe caches and client
+        self._write_lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=async_workers, thread_name_prefix="steve-rag")
+        self._query_batcher = AsyncMicroBatcher(
+            lambda n_results, query_texts: self.query_many(query_texts, n_results),
+            self._executor, async_max_batch_size, async_batch_wait)
+        self._rerank_batcher = AsyncMicroBatcher(
+            lambda options, query_texts: self.query_many_with_reranking(query_texts, *options),
+            self._executor, async_max_batch_size, async_batch_wait)
 
     def add_documents(self, documents: List[Dict[str, Any]]) -> None:
         """Add documents to the collection
 
+        Document IDs are derived from the document source and text, so documents that
+        are already in the collection are skipped instead of being duplicated.
+
         Args:
             documents: List of document dictionaries containing 'text' and optional 'metadata'
         """
-        start_id = self._id_counter
-        ids = [str(start_id + i) for i in range(len(documents))]
-        self._id_counter += len(documents)
-        texts = ["search_document: " + doc["text"]
-                 for doc in documents]  # using nomic-embed-text-v2-moe
-        metadatas = [doc.get("metadata", {}) for doc in documents]
-
-        self.collection.add(
-            ids=ids,
-            documents=texts,
-            metadatas=metadatas
-        )
+        unique_documents = {}
+        for doc in documents:
+            metadata = doc.get("metadata", {})
+            doc_id = make_chunk_id(metadata.get("source", ""), doc["text"])
+            unique_documents.setdefault(doc_id, (doc["text"], metadata))
+
+        with self.telemetry.span("steve_rag.add_documents", documents=len(documents),
+                                 unique=len(unique_documents)) as span, self._write_lock:
+            new_ids = self._filter_existing_ids(list(unique_documents))
+            span.set(new=len(new_ids))
+            self.telemetry.count("steve_rag_documents_added_total", len(new_ids))
+            self.telemetry.count("steve_rag_documents_skipped_total", len(unique_documents) - len(new_ids))
+            if not new_ids:
+                return
+
+            texts = [DOCUMENT_PREFIX + unique_documents[doc_id][0]
+                     for doc_id in new_ids]  # using nomic-embed-text-v2-moe
+            metadatas = [unique_documents[doc_id][1] for doc_id in new_ids]
+
+            self._write_batches(new_ids, texts, metadatas)
+
+    def _filter_existing_ids(self, ids: List[str]) -> List[str]:
+        """Returns the IDs, in order, that are not in the collection yet."""
+        existing = set()
+        max_batch_size = self.client.get_max_batch_size()
+        for start in range(0, len(ids), max_batch_size):
+            existing.update(self.collection.get(
+                ids=ids[start:start + max_batch_size], include=[])["ids"])
+        return [doc_id for doc_id in ids if doc_id not in existing]
+
+    def _delete_batches(self, ids: List[str]) -> None:
+        """Deletes documents from the collection in batches no larger than Chroma's max batch size."""
+        max_batch_size = self.client.get_max_batch_size()
+        for start in range(0, len(ids), max_batch_size):
+            self.collection.delete(ids=ids[start:start + max_batch_size])
+        if ids:
+            self._invalidate_query_cache()
+
+    def _write_batches(self,
+                       ids: List[str],
+                       texts: List[str],
+                       metadatas: List[Dict[str, Any]],
+                       embeddings: Optional[List[Any]] = None) -> None:
+        """Writes documents to the collection in batches no larger than Chroma's max batch size.
+
+        Args:
+            ids: Document IDs.
+            texts: Document texts, already prefixed.
+            metadatas: Document metadata.
+            embeddings: Precomputed embeddings. If None, Chroma embeds the texts itself.
+        """
+        max_batch_size = self.client.get_max_batch_size()
+        for start in range(0, len(ids), max_batch_size):
+            end = start + max_batch_size
+            with self.telemetry.span("steve_rag.collection_add", batch_size=len(ids[start:end]),
+                                     embedded=embeddings is None):
+                self.collection.add(
+                    ids=ids[start:end],
+                    documents=texts[start:end],
+                    metadatas=metadatas[start:end],
+                    embeddings=embeddings[start:end] if embeddings is not None else None
+                )
+        if ids:
+            self._invalidate_query_cache()
+
+    def _invalidate_query_cache(self) -> None:
+        with self._write_lock:
+            self.collection_version += 1
+        if self.query_cache is not None:
+            self.query_cache.clear()
 
     def query(self, query_text: str, n_results: int = 5) -> List[Dict[str, Any]]:
         """
@@ -67,60 +211,624 @@ class SteveRAG:
         Returns:
             List[Dict[str, Any]]: A list of dictionaries containing the retrieved documents and their metadata.
         """
-        results = self.collection.query(
+        return self.query_many([query_text], n_results=n_results)[0]
+
+    def query_many(self, query_texts: List[str], n_results: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        Query the collection with several queries at once.
+
+        All queries that are not served by the query cache are embedded in one call to the
+        embedding function and searched with a single vectorized Chroma query.
+
+        Args:
+            query_texts (List[str]): The query texts.
+            n_results (int): The number of results to return per query.
+
+        Returns:
+            List[List[Dict[str, Any]]]: For each query, in order, a list of dictionaries containing the retrieved documents and their metadata.
+        """
+        with self.telemetry.span("steve_rag.query", batch_size=len(query_texts), n_results=n_results) as span:
+            all_results: List[Optional[List[Dict[str, Any]]]] = [None] * len(query_texts)
+            cache_keys = self._lookup_cached("query", query_texts, n_results, all_results)
+            self._record_queries("query", span, all_results)
+
+            # Identical queries are only searched once
+            missing = list(dict.fromkeys(
+                query_text for query_text, results in zip(query_texts, all_results) if results is None))
+            if missing:
+                self._fill_missing(self._search_dense(missing, n_results),
+                                   query_texts, all_results, cache_keys)
+
+        return all_results
+
+    def _search_dense(self, query_texts: List[str], n_results: int) -> Dict[str, List[Dict[str, Any]]]:
+        """Embeds distinct queries in one call and searches them in one Chroma query, bypassing the query cache."""
+        # Embedding outside of Chroma lets the embed and search stages be timed apart
+        with self.telemetry.span("steve_rag.embed", batch_size=len(query_texts)):
             # using nomic-embed-text-v2-moe
-            query_texts=["search_query: " + query_text],
-            n_results=n_results
-        )
+            embeddings = self.embedding_fn(
+                [QUERY_PREFIX + query_text for query_text in query_texts])
+        with self.telemetry.span("steve_rag.vector_search", batch_size=len(query_texts), n_results=n_results):
+            results = self.collection.query(
+                query_embeddings=embeddings,
+                n_results=n_results
+            )
+        return self._parse_results(query_texts, results)
+
+    @staticmethod
+    def _parse_results(query_texts: List[str], results: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+        """Maps every query to its documents from the columns of a Chroma query result."""
+        return {
+            query_text: [
+                {
+                    "id": results["ids"][q][i],
+                    "text": results["documents"][q][i],
+                    "metadata": results["metadatas"][q][i],
+                    "distance": results["distances"][q][i]
+                }
+                for i in range(len(results["documents"][q]))
+            ]
+            for q, query_text in enumerate(query_texts)
+        }
+
+    def query_hybrid(self, query_text: str, n_results: int = 5, depth: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Query the collection with both dense and BM25 retrieval and fuse the rankings.
+
+        Args:
+            query_text (str): The query text.
+            n_results (int): The number of results to return.
+            depth (Optional[int]): The number of results each retriever contributes before fusion. Defaults to twice `n_results`.
+
+        Returns:
+            List[Dict[str, Any]]: A list of dictionaries containing the retrieved documents, their metadata and their fused score.
+        """
+        return self.query_many_hybrid([query_text], n_results=n_results, depth=depth)[0]
+
+    def query_many_hybrid(self,
+                          query_texts: List[str],
+                          n_results: int = 5,
+                          depth: Optional[int] = None,
+                          rrf_k: int = 60) -> List[List[Dict[str, Any]]]:
+        """
+        Query the collection with dense and BM25 retrieval for several queries and fuse each pair of rankings.
+
+        Dense results come from one embedding call and one Chroma query. They are
+        intermediate candidates, so they bypass the query cache. Each query's dense and lexical rankings
+        are fused with reciprocal rank fusion, and documents that only the BM25 index found
+        are fetched from Chroma in one `get` call. Without a BM25 index this is `query_many`.
+
+        Args:
+            query_texts (List[str]): The query texts.
+            n_results (int): The number of results to return per query.
+            depth (Optional[int]): The number of results each retriever contributes before fusion. Defaults to twice `n_results`.
+            rrf_k (int): The reciprocal rank fusion constant.
+
+        Returns:
+            List[List[Dict[str, Any]]]: For each query, in order, a list of dictionaries containing the retrieved documents, their metadata and their fused score. Documents only found by BM25 have a distance of None.
+        """
+        if self.bm25_index is None:
+            return self.query_many(query_texts, n_results=n_results)
+        if not query_texts:
+            return []
 
+        depth = max(depth or 2 * n_results, n_results)
+        dense_by_query = self._search_dense(list(dict.fromkeys(query_texts)), depth)
+        dense = [dense_by_query[query_text] for query_text in query_texts]
+        with self.telemetry.span("steve_rag.bm25_search", batch_size=len(query_texts), depth=depth):
+            lexical = [[doc_id for doc_id, _ in self.bm25_index.search(query_text, depth)]
+                       for query_text in query_texts]
+        fused = [
+            reciprocal_rank_fusion(
+                [[doc["id"] for doc in dense_results], lexical_ids], k=rrf_k)[:n_results]
+            for dense_results, lexical_ids in zip(dense, lexical)
+        ]
+
+        documents = {doc["id"]: doc for dense_results in dense for doc in dense_results}
+        lexical_only = list({doc_id for ranking in fused for doc_id, _ in ranking
+                             if doc_id not in documents})
+        if lexical_only:
+            with self.telemetry.span("steve_rag.fetch_lexical", documents=len(lexical_only)):
+                fetched = self.collection.get(
+                    ids=lexical_only, include=["documents", "metadatas"])
+            for doc_id, text, metadata in zip(fetched["ids"], fetched["documents"], fetched["metadatas"]):
+                documents[doc_id] = {"id": doc_id, "text": text,
+                                     "metadata": metadata, "distance": None}
+
+        # An ID can be missing from Chroma if the index is older than the collection
         return [
-            {
-                "text": results["documents"][0][i],
-                "metadata": results["metadatas"][0][i],
-                "distance": results["distances"][0][i]
-            }
-            for i in range(len(results["documents"][0]))
+            [dict(documents[doc_id], rrf_score=score)
+             for doc_id, score in ranking if doc_id in documents]
+            for ranking in fused
         ]
 
-    def query_with_reranking(self, query_text: str, n_results: int = 5) -> List[Dict[str, Any]]:
+    def query_with_reranking(self,
+                             query_text: str,
+                             n_results: int = 5,
+                             candidate_pool: int = 15,
+                             adaptive: bool = False) -> List[Dict[str, Any]]:
         """
         Query the collection, rerank the results, and return the top documents.
 
         Args:
             query_text (str): The query text.
             n_results (int): The number of results to return after reranking.
+            candidate_pool (int): The number of candidates retrieved for reranking. It is raised to `n_results` if smaller.
+            adaptive (bool): If True, candidates are scored in distance order in small batches and scoring stops once the remaining candidates are unlikely to enter the top `n_results`.
 
         Returns:
             List[Dict[str, Any]]: A list of dictionaries containing the top reranked documents and their metadata.
         """
-        # Initial retrieval of more documents
-        results = self.query(query_text, n_results=15)
-        if self.reranker:
-            # Rerank the results using the provided reranker
-            reranked_results = self.reranker.rerank(query_text, results)
-            top_results = reranked_results[:n_results]
-        else:
-            # If no reranker is provided, return the top n_results from the initial retrieval
-            top_results = results[:n_results]
+        return self.query_many_with_reranking(
+            [query_text], n_results=n_results, candidate_pool=candidate_pool, adaptive=adaptive)[0]
 
-        return top_results
+    def query_many_with_reranking(self,
+                                  query_texts: List[str],
+                                  n_results: int = 5,
+                                  candidate_pool: int = 15,
+                                  adaptive: bool = False) -> List[List[Dict[str, Any]]]:
+        """
+        Query the collection with several queries at once, rerank the results, and return the top documents.
 
-    def load_chunks_into_rag(self, chunks_dir: str = "data/chunks") -> None:
-        """Loads JSON chunks from files in the specified directory into the RAG.
+        Candidates for all queries are retrieved with `query_many_hybrid`, and every (query, candidate)
+        pair is scored by the reranker in one batch. In adaptive mode every scoring round is
+        one batch across all queries that have not stopped yet.
 
         Args:
-            chunks_dir (str): The directory containing the JSON chunk files.
+            query_texts (List[str]): The query texts.
+            n_results (int): The number of results to return per query after reranking.
+            candidate_pool (int): The number of candidates retrieved per query for reranking. It is raised to `n_results` if smaller.
+            adaptive (bool): If True, stop scoring a query's candidates early once the rest are unlikely to enter its top `n_results`.
+
+        Returns:
+            List[List[Dict[str, Any]]]: For each query, in order, a list of dictionaries containing the top reranked documents and their metadata.
         """
-        import os
-        import json
+        candidate_pool = max(candidate_pool, n_results)
+        with self.telemetry.span("steve_rag.query_with_reranking", batch_size=len(query_texts),
+                                 n_results=n_results, candidate_pool=candidate_pool, adaptive=adaptive) as span:
+            all_results: List[Optional[List[Dict[str, Any]]]] = [None] * len(query_texts)
+            cache_keys = self._lookup_cached(
+                f"rerank:{candidate_pool}:{adaptive}", query_texts, n_results, all_results)
+            self._record_queries("rerank", span, all_results)
+
+            missing = list(dict.fromkeys(
+                query_text for query_text, results in zip(query_texts, all_results) if results is None))
+            if missing:
+                # Initial retrieval of more documents, fused with BM25 results when there is an index
+                candidates = self.query_many_hybrid(missing, n_results=candidate_pool)
+                if self.telemetry.enabled:
+                    span.set(candidates=sum(map(len, candidates)))
+                    for docs in candidates:
+                        self.telemetry.observe("steve_rag_rerank_candidates", len(docs), buckets=SIZE_BUCKETS)
+                if self.reranker and adaptive:
+                    candidates = self.reranker.rerank_many_adaptive(
+                        missing, candidates, k=n_results)
+                elif self.reranker:
+                    # Rerank the results using the provided reranker
+                    candidates = self.reranker.rerank_many(missing, candidates)
+                # If no reranker is provided, return the top n_results from the initial retrieval
+                fetched = {
+                    query_text: results[:n_results]
+                    for query_text, results in zip(missing, candidates)
+                }
+                self._fill_missing(fetched, query_texts, all_results, cache_keys)
+
+        return all_results
+
+    async def aquery(self, query_text: str, n_results: int = 5) -> List[Dict[str, Any]]:
+        """
+        Asynchronously query the collection and return relevant documents.
+
+        Concurrent calls are coalesced into one `query_many` batch that runs on a bounded
+        thread pool, so model inference never blocks the event loop.
+
+        Args:
+            query_text (str): The query text.
+            n_results (int): The number of results to return.
+
+        Returns:
+            List[Dict[str, Any]]: A list of dictionaries containing the retrieved documents and their metadata.
+        """
+        return await self._query_batcher.submit(n_results, query_text)
+
+    async def aquery_with_reranking(self,
+                                    query_text: str,
+                                    n_results: int = 5,
+                                    candidate_pool: int = 15,
+                                    adaptive: bool = False) -> List[Dict[str, Any]]:
+        """
+        Asynchronously query the collection, rerank the results, and return the top documents.
+
+        Concurrent calls with the same options are coalesced into one `query_many_with_reranking`
+        batch, so the embedder and the reranker each see a single batch for all of them.
+
+        Args:
+            query_text (str): The query text.
+            n_results (int): The number of results to return after reranking.
+            candidate_pool (int): The number of candidates retrieved for reranking.
+            adaptive (bool): Whether to stop scoring candidates early, see `query_with_reranking`.
+
+        Returns:
+            List[Dict[str, Any]]: A list of dictionaries containing the top reranked documents and their metadata.
+        """
+        return await self._rerank_batcher.submit((n_results, candidate_pool, adaptive), query_text)
+
+    def warm_up(self, batch_size: int = 4, n_results: int = 5) -> Dict[str, float]:
+        """
+        Runs a dummy batch through every stage of a reranked query.
+
+        The first call to each model pays for lazy initialization such as kernel selection
+        and buffer allocation, and the first Chroma query loads the HNSW index into memory.
+        Warming up moves that cost to startup. The embedding and query caches are bypassed,
+        so the models run even if the dummy queries were cached, and nothing is cached.
+
+        Args:
+            batch_size (int): The number of dummy queries.
+            n_results (int): The number of documents retrieved and reranked per dummy query.
+
+        Returns:
+            Dict[str, float]: The seconds spent in every stage that ran.
+        """
+        query_texts = [f"warm up query {i}" for i in range(batch_size)]
+        embedding_fn = self.embedding_fn
+        if isinstance(embedding_fn, CachedEmbeddingFunction):
+            embedding_fn = embedding_fn.embedding_function
+        timings = {}
+
+        started = time.perf_counter()
+        embeddings = embedding_fn([QUERY_PREFIX + query_text for query_text in query_texts])
+        timings["embed"] = time.perf_counter() - started
+
+        documents = []
+        count = self.collection.count()
+        if count:
+            started = time.perf_counter()
+            results = self.collection.query(query_embeddings=embeddings, n_results=min(n_results, count))
+            timings["vector_search"] = time.perf_counter() - started
+            documents = results["documents"]
+
+        if self.bm25_index is not None:
+            started = time.perf_counter()
+            for query_text in query_texts:
+                self.bm25_index.search(query_text, n_results)
+            timings["bm25_search"] = time.perf_counter() - started
+
+        pairs = [[query_text, text] for query_text, texts in zip(query_texts, documents) for text in texts]
+        if self.reranker is not None and pairs:
+            started = time.perf_counter()
+            self.reranker.calculate_scores(pairs)
+            timings["rerank"] = time.perf_counter() - started
+        return timings
+
+    def close(self) -> None:
+        """Shuts down the thread pool used by the async query path."""
+        self._executor.shutdown(wait=True)
+
+    def _record_queries(self, kind: str, span: Any, all_results: List[Optional[List[Dict[str, Any]]]]) -> None:
+        """Records the batch size of a query call and how many of its queries the query cache served."""
+        if not self.telemetry.enabled:
+            return
+        self.telemetry.count("steve_rag_queries_total", len(all_results), kind=kind)
+        self.telemetry.observe("steve_rag_query_batch_size", len(all_results), buckets=SIZE_BUCKETS, kind=kind)
+        if self.query_cache is not None:
+            hits = sum(results is not None for results in all_results)
+            span.set(cache_hits=hits)
+            self.telemetry.count("steve_rag_query_cache_hits_total", hits, kind=kind)
+            self.telemetry.count("steve_rag_query_cache_misses_total", len(all_results) - hits, kind=kind)
+
+    def _lookup_cached(self,
+                       kind: str,
+                       query_texts: List[str],
+                       n_results: int,
+                       all_results: List[Optional[List[Dict[str, Any]]]]) -> List[Any]:
+        """Fills `all_results` with query cache hits and returns the cache key of every query."""
+        if self.query_cache is None:
+            return [None] * len(query_texts)
+
+        cache_keys = []
+        for i, query_text in enumerate(query_texts):
+            cache_key = self.query_cache.make_key(
+                kind, query_text, n_results, self.collection_version)
+            cache_keys.append(cache_key)
+            all_results[i] = self.query_cache.get(cache_key)
+        return cache_keys
+
+    def _fill_missing(self,
+                      fetched: Dict[str, List[Dict[str, Any]]],
+                      query_texts: List[str],
+                      all_results: List[Optional[List[Dict[str, Any]]]],
+                      cache_keys: List[Any]) -> None:
+        """Fills the gaps in `all_results` with freshly fetched results and caches them."""
+        for i, query_text in enumerate(query_texts):
+            if all_results[i] is not None:
+                continue
+            all_results[i] = [dict(result) for result in fetched[query_text]]
+            if self.query_cache is not None:
+                self.query_cache.put(cache_keys[i], all_results[i])
+
+    def load_chunks_into_rag(self,
+                             chunks_dir: str = "data/chunks",
+                             embed_batch_size: int = 64,
+                             prefetch_batches: int = 4) -> Dict[str, float]:
+        """Loads chunks from the specified directory into the RAG in bulk.
+
+        The directory is either a chunk store written by `hey_steve/processing/chunking.py`,
+        whose pages are streamed one at a time with their header path and offsets as
+        metadata, or a directory of JSON files each holding a list of chunk texts.
+
+        Reindexing is incremental. Every chunk ID is a hash of its source and text, and a
+        manifest records the content hash and chunk IDs of every source, per chunks
+        directory. Sources whose hash is unchanged are skipped without being parsed, only
+        chunks that are new are embedded, and chunks of edited or deleted sources that no
+        longer exist are removed. Several directories can be loaded into one collection:
+        a directory only removes its own chunks, never one another directory still uses.
+
+        Chunks that need embedding are streamed into fixed-size batches. Files are read
+        and parsed on a background thread while the embedding function works on the
+        previous batch, and embedded chunks are written to Chroma in batches of the
+        client's maximum batch size.
+
+        Args:
+            chunks_dir (str): The chunk store directory, or a directory of JSON chunk files.
+            embed_batch_size (int): The number of chunks embedded per call to the embedding function.
+            prefetch_batches (int): The number of parsed batches the reader thread may queue ahead of the embedder.
+
+        Returns:
+            Dict[str, float]: The number of documents inserted and deleted, the number of unchanged sources, the elapsed seconds and the insert throughput in docs/sec.
+        """
+        with self._write_lock:
+            if ChunkStore.exists(chunks_dir):
+                store = ChunkStore(chunks_dir)
+                files = [source for source, _ in store.iter_sources()]
+                sources = _iter_store_sources(store)
+            else:
+                files = sorted(f for f in os.listdir(chunks_dir) if f.endswith('.json'))
+                sources = _iter_json_sources(chunks_dir, files)
+            manifest = self._load_manifest()
+            directory = os.path.normpath(chunks_dir)
+            old_sources = manifest["directories"].get(directory, {})
+            if not os.path.exists(self.manifest_path) and self.collection.count() > 0:
+                print(f"WARNING: Collection has documents but no manifest was found at {self.manifest_path}. "
+                      "Documents ingested without content-hashed IDs will not be deduplicated; rebuild the collection to fix this.")
+
+            batches: queue.Queue = queue.Queue(maxsize=prefetch_batches)
+            reader_state = {"sources": {}, "removed_ids": [], "unchanged": 0, "error": None}
+            # Set when the consumer stops, so a reader blocked on a full queue exits
+            stop = threading.Event()
+            reader = threading.Thread(
+                target=_read_chunk_batches,
+                args=(sources, old_sources,
+                      embed_batch_size, batches, reader_state, stop),
+                name="chunk-reader",
+                daemon=True
+            )
+
+            max_batch_size = self.client.get_max_batch_size()
+            ids: List[str] = []
+            texts: List[str] = []
+            metadatas: List[Dict[str, Any]] = []
+            embeddings: List[Any] = []
+            num_documents = 0
+
+            start_time = time.perf_counter()
+            reader.start()
+            try:
+                with tqdm(desc="Inserting directory of chunks", unit="doc") as progress:
+                    while (batch := batches.get()) is not None:
+                        # Chunks left behind by an interrupted run are already embedded
+                        new_ids = set(self._filter_existing_ids(
+                            [doc["id"] for doc in batch]))
+                        batch = [doc for doc in batch if doc["id"] in new_ids]
+                        if not batch:
+                            continue
+
+                        batch_texts = [DOCUMENT_PREFIX + doc["text"] for doc in batch]
+                        embeddings.extend(self.embedding_fn(batch_texts))
+                        ids.extend(doc["id"] for doc in batch)
+                        texts.extend(batch_texts)
+                        metadatas.extend(doc["metadata"] for doc in batch)
+
+                        if len(ids) >= max_batch_size:
+                            self._write_batches(ids, texts, metadatas, embeddings)
+                            ids, texts, metadatas, embeddings = [], [], [], []
+
+                        num_documents += len(batch)
+                        progress.update(len(batch))
+            finally:
+                stop.set()
+                reader.join()
+            if reader_state["error"] is not None:
+                raise reader_state["error"]
+            if ids:
+                self._write_batches(ids, texts, metadatas, embeddings)
+
+            # Sources that disappeared from the directory lose all of their chunks
+            removed_ids = reader_state["removed_ids"]
+            for filename in set(old_sources) - set(files):
+                removed_ids.extend(old_sources[filename]["ids"])
+            # A chunk with the same source name and text in another directory has the same ID
+            shared_ids = {chunk_id
+                          for other, other_sources in manifest["directories"].items() if other != directory
+                          for entry in other_sources.values() for chunk_id in entry["ids"]}
+            removed_ids = [chunk_id for chunk_id in removed_ids if chunk_id not in shared_ids]
+            self._delete_batches(removed_ids)
+
+            manifest["directories"][directory] = reader_state["sources"]
+            self._save_manifest(manifest)
+
+            if self.bm25_index_path is not None and (
+                    num_documents or removed_ids or self.bm25_index is None):
+                self.build_bm25_index()
+
+            elapsed = time.perf_counter() - start_time
+            docs_per_sec = num_documents / elapsed if elapsed > 0 else 0.0
+            print(f"Inserted {num_documents} and deleted {len(removed_ids)} documents from {len(files)} sources "
+                  f"({reader_state['unchanged']} unchanged) in {elapsed:.1f}s ({docs_per_sec:.1f} docs/sec)")
+
+            return {
+                "documents": num_documents,
+                "deleted": len(removed_ids),
+                "unchanged_files": reader_state["unchanged"],
+                "seconds": elapsed,
+                "docs_per_sec": docs_per_sec
+            }
+
+    def build_bm25_index(self, page_size: int = 5000) -> BM25Index:
+        """Builds the BM25 index from every document in the collection and saves it to `bm25_index_path`.
+
+        Args:
+            page_size (int): The number of documents fetched from Chroma per request.
+
+        Returns:
+            BM25Index: The new index.
+        """
+        def iter_documents():
+            offset = 0
+            while True:
+                page = self.collection.get(
+                    include=["documents"], limit=page_size, offset=offset)
+                if not page["ids"]:
+                    return
+                for doc_id, text in zip(page["ids"], page["documents"]):
+                    yield doc_id, text.removeprefix(DOCUMENT_PREFIX)
+                offset += len(page["ids"])
+
+        with self._write_lock:
+            self.bm25_index = BM25Index.build(iter_documents())
+            if self.bm25_index_path is not None:
+                os.makedirs(os.path.dirname(self.bm25_index_path) or ".", exist_ok=True)
+                self.bm25_index.save(self.bm25_index_path)
+            self._invalidate_query_cache()
+        return self.bm25_index
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        """Loads the reindexing manifest, or returns an empty one if it does not exist."""
+        if not os.path.exists(self.manifest_path):
+            return {"version": MANIFEST_VERSION, "directories": {}}
+        with open(self.manifest_path, 'r') as f:
+            manifest = json.load(f)
+        if manifest.get("version") != MANIFEST_VERSION:
+            # Version 1 did not record which directory a source came from. Starting over only
+            # costs a reparse, since chunks already in the collection are not embedded again
+            print(f"Manifest at {self.manifest_path} is from an older version, every source is checked again.")
+            return {"version": MANIFEST_VERSION, "directories": {}}
+        return manifest
+
+    def _save_manifest(self, manifest: Dict[str, Any]) -> None:
+        """Atomically writes the reindexing manifest."""
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+
+def make_chunk_id(source: str, text: str) -> str:
+    """Returns a stable document ID derived from a chunk's source and text.
+
+    Args:
+        source: The name of the file the chunk came from.
+        text: The chunk text, without the embedding prefix.
+
+    Returns:
+        str: A hex digest identifying the chunk.
+    """
+    return hashlib.sha256(f"{source}\0{text}".encode("utf-8")).hexdigest()[:32]
+
+
+def _iter_json_sources(chunks_dir: str, files: List[str]) -> Iterator[Tuple[str, str, Callable[[], List[Tuple[str, Dict[str, Any]]]]]]:
+    """Yields the name, content hash and chunk loader of every JSON chunk file, reading each file once."""
+    for filename in files:
+        with open(os.path.join(chunks_dir, filename), 'rb') as f:
+            content = f.read()
+        yield filename, hashlib.sha256(content).hexdigest(), partial(_parse_json_chunks, filename, content)
+
+
+def _parse_json_chunks(filename: str, content: bytes) -> List[Tuple[str, Dict[str, Any]]]:
+    return [(item, {"source": filename}) for item in json.loads(content) or []]
+
+
+def _iter_store_sources(store: ChunkStore) -> Iterator[Tuple[str, str, Callable[[], List[Tuple[str, Dict[str, Any]]]]]]:
+    """Yields the name, records hash and chunk loader of every page of a chunk store, without reading any records."""
+    for source, entry in store.iter_sources():
+        yield source, entry["hash"], partial(_read_store_chunks, store, source)
+
+
+def _read_store_chunks(store: ChunkStore, source: str) -> List[Tuple[str, Dict[str, Any]]]:
+    chunks = []
+    for record in store.read(source):
+        metadata = {"source": source, "headers": " > ".join(record["headers"])}
+        # Chroma metadata cannot hold None, so unknown offsets are left out
+        if record["start"] is not None:
+            metadata.update(start=record["start"], end=record["end"])
+        chunks.append((record["text"], metadata))
+    return chunks
+
+
+def _read_chunk_batches(sources: Iterable[Tuple[str, str, Callable[[], List[Tuple[str, Dict[str, Any]]]]]],
+                        old_sources: Dict[str, Dict[str, Any]],
+                        batch_size: int,
+                        batches: queue.Queue,
+                        state: Dict[str, Any],
+                        stop: threading.Event) -> None:
+    """Diffs chunk sources against the manifest and puts batches of new documents on a queue.
+
+    Sources whose content hash matches the manifest are not loaded. For the rest, chunks
+    whose IDs are not in the manifest are queued in fixed-size batches and IDs that are
+    no longer present are collected in `state["removed_ids"]`. The updated manifest
+    entries are collected in `state["sources"]`. A None sentinel is always put on the
+    queue last, so the consumer never blocks forever; an exception raised while reading
+    is stored in `state["error"]`. The reader gives up once `stop` is set.
+
+    Args:
+        sources: The name, content hash and chunk loader of every source, in order. A loader returns (text, metadata) pairs.
+        old_sources: The manifest entries from the previous run, keyed by source name.
+        batch_size: The number of documents per batch.
+        batches: The queue to put batches on.
+        state: A dictionary collecting the reader's results.
+        stop: Set by the consumer when it stops taking batches.
+    """
+    batch: List[Dict[str, Any]] = []
+    try:
+        for name, source_hash, load in sources:
+            old_entry = old_sources.get(name)
+            if old_entry is not None and old_entry["hash"] == source_hash:
+                state["sources"][name] = old_entry
+                state["unchanged"] += 1
+                continue
+
+            chunks: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+            for text, metadata in load():
+                chunks.setdefault(make_chunk_id(name, text), (text, metadata))
+
+            old_ids = set(old_entry["ids"]) if old_entry is not None else set()
+            state["removed_ids"].extend(old_ids.difference(chunks))
+            state["sources"][name] = {
+                "hash": source_hash, "ids": list(chunks)}
+
+            for chunk_id, (text, metadata) in chunks.items():
+                if chunk_id in old_ids:
+                    continue
+                batch.append({"id": chunk_id, "text": text,
+                              "metadata": metadata})
+                if len(batch) == batch_size:
+                    if not _put_batch(batches, batch, stop):
+                        return
+                    batch = []
+        if batch:
+            _put_batch(batches, batch, stop)
+    except BaseException as e:
+        state["error"] = e
+    finally:
+        _put_batch(batches, None, stop)
 
-        files = [f for f in os.listdir(chunks_dir) if f.endswith('.json')]
 
-        for filename in tqdm(files, desc="Inserting directory of chunks"):
-            filepath = os.path.join(chunks_dir, filename)
-            with open(filepath, 'r') as f:
-                data = json.load(f)
-                if data:
-                    documents = [{"text": item, "metadata": {
-                        "source": filename}} for item in data]
-                    self.add_documents(documents)
+def _put_batch(batches: queue.Queue, batch: Optional[List[Dict[str, Any]]], stop: threading.Event) -> bool:
+    """Puts a batch on the queue, returning False if the consumer stopped before there was room."""
+    while not stop.is_set():
+        try:
+            batches.put(batch, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
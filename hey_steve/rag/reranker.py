@@ -1,16 +1,135 @@
-import torch
-from sentence_transformers import CrossEncoder
+import threading
+from typing import Optional
+
+import numpy as np
+
+from .backends import load_cross_encoder, score_features
+from .score_cache import ScoreCache
+from .telemetry import SIZE_BUCKETS, Telemetry, get_telemetry
+
+# Chunks are at most 256 tokens of the embedding model, which shares its XLM-RoBERTa
+# tokenizer with bge-reranker-v2-m3, so 512 tokens fit a chunk, the query and the
+# special tokens without truncating the chunk
+RERANKER_MAX_LENGTH = 512
 
 
 class Reranker:
-    def __init__(self, model_name='BAAI/bge-reranker-v2-m3'):
-        self.model = CrossEncoder(
+    def __init__(self, model_name='BAAI/bge-reranker-v2-m3', telemetry: Optional[Telemetry] = None,
+                 backend: str = "torch", score_cache: Optional[ScoreCache] = None,
+                 max_length: Optional[int] = RERANKER_MAX_LENGTH, batch_size: int = 32):
+        # backend is "torch", "torch-int8" or "onnx", see hey_steve/rag/backends.py
+        self.backend = backend
+        # Scores of (query, chunk) pairs seen before are reused instead of recomputed
+        self.score_cache = score_cache
+        # Pairs are truncated to max_length tokens, None keeps the model limit (8192 for bge-reranker-v2-m3)
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.model = load_cross_encoder(
             model_name,
+            backend,
+            max_length=max_length,
             automodel_args={"torch_dtype": "auto"},
         )
+        # Defaults to the shared telemetry, which is off unless set_telemetry enabled it
+        self.telemetry = telemetry if telemetry is not None else get_telemetry()
+
+        self.tokens = 0
+        self.pad_tokens = 0
+        self._stats_lock = threading.Lock()
+        self.telemetry.gauge("reranker_padding_ratio", lambda: self.padding_stats()["padding_ratio"])
+
+    def calculate_scores(self, pairs: list[list[str]]) -> np.ndarray:
+        """Scores (query, document) pairs in batches of similar length.
+
+        The pairs are tokenized once, sorted by their token length and padded batch by
+        batch, so a long chunk only pads the batch of other long chunks. The encoded
+        batches go straight to the model instead of through `predict`, which would
+        tokenize every pair again.
+
+        Args:
+            pairs: The (query, document) pairs.
+
+        Returns:
+            The score of every pair, in the order of `pairs`.
+        """
+        if not pairs:
+            return np.zeros(0, dtype=np.float32)
+        with self.telemetry.span("reranker.calculate_scores", pairs=len(pairs)) as span:
+            encoded = self.model.tokenizer([pair[0] for pair in pairs], [pair[1] for pair in pairs],
+                                           truncation="longest_first", max_length=self.max_length)
+            order = np.argsort([len(input_ids) for input_ids in encoded["input_ids"]], kind="stable")
+
+            batch_scores = []
+            tokens = padded = 0
+            for start in range(0, len(pairs), self.batch_size):
+                batch = order[start:start + self.batch_size]
+                features = self.model.tokenizer.pad(
+                    {key: [values[i] for i in batch] for key, values in encoded.items()}, return_tensors="np")
+                tokens += int(features["attention_mask"].sum())
+                padded += features["attention_mask"].size
+                batch_scores.append(score_features(self.model, features))
+
+            sorted_scores = np.concatenate(batch_scores)
+            scores = np.empty_like(sorted_scores)
+            scores[order] = sorted_scores
+            self._record_padding(tokens, padded - tokens)
+            span.set(tokens=tokens, pad_tokens=padded - tokens)
+        self.telemetry.count("reranker_pairs_scored_total", len(pairs))
+        self.telemetry.observe("reranker_score_batch_size", len(pairs), buckets=SIZE_BUCKETS)
+        return scores
+
+    def _record_padding(self, tokens: int, pad_tokens: int) -> None:
+        with self._stats_lock:
+            self.tokens += tokens
+            self.pad_tokens += pad_tokens
+        self.telemetry.count("reranker_tokens_total", tokens)
+        self.telemetry.count("reranker_pad_tokens_total", pad_tokens)
+
+    def padding_stats(self) -> dict[str, float]:
+        """Returns the real and pad tokens scored so far and the share of pad tokens."""
+        with self._stats_lock:
+            total = self.tokens + self.pad_tokens
+            return {
+                "tokens": self.tokens,
+                "pad_tokens": self.pad_tokens,
+                "padding_ratio": self.pad_tokens / total if total else 0.0
+            }
+
+    def score_documents(self, query_texts: list[str], docs: list[dict]) -> list[float]:
+        """Scores (query, search result) pairs, sending only the pairs missing from the score cache to the model.
+
+        Args:
+            query_texts: The query of every pair.
+            docs: The search result of every pair.
+
+        Returns:
+            The score of every pair, in order.
+        """
+        if not docs:
+            return []
+        if self.score_cache is None:
+            return self.calculate_scores(
+                [[query_text, doc['text']] for query_text, doc in zip(query_texts, docs)]).tolist()
 
-    def calculate_scores(self, pairs: list[list[str]]) -> torch.Tensor:
-        scores = self.model.predict(pairs)
+        query_hashes = {query_text: ScoreCache.query_hash(query_text) for query_text in set(query_texts)}
+        keys = [self.score_cache.make_key(query_hashes[query_text], doc)
+                for query_text, doc in zip(query_texts, docs)]
+        scores = self.score_cache.get_many(keys)
+
+        # The first pair of every missing key is scored, duplicates reuse its score
+        missing = {}
+        for i, score in enumerate(scores):
+            if score is None:
+                missing.setdefault(keys[i], i)
+        if missing:
+            new_scores = self.calculate_scores(
+                [[query_texts[i], docs[i]['text']] for i in missing.values()]).tolist()
+            self.score_cache.put_many(list(missing), new_scores)
+            fetched = dict(zip(missing, new_scores))
+            scores = [fetched[key] if score is None else score for key, score in zip(keys, scores)]
+
+        self.telemetry.count("reranker_score_cache_hits_total", len(keys) - len(missing))
+        self.telemetry.count("reranker_score_cache_misses_total", len(missing))
         return scores
 
     def rerank(self, query_text: str, search_results: list[str]) -> list[str]:
@@ -23,13 +142,111 @@ class Reranker:
         Returns:
             The reranked list of search results.
         """
+        return self.rerank_many([query_text], [search_results])[0]
+
+    def rerank_many(self, query_texts: list[str], search_results: list[list[dict]]) -> list[list[dict]]:
+        """Reranks the search results of several queries, scoring every pair in one batch.
+
+        Args:
+            query_texts: The query texts.
+            search_results: For each query, the list of search results to rerank.
+
+        Returns:
+            For each query, the reranked list of search results.
+        """
+        pair_queries = [query_text for query_text, docs in zip(query_texts, search_results) for _ in docs]
+        pair_docs = [doc for docs in search_results for doc in docs]
+        if not pair_docs:
+            return [[] for _ in query_texts]
+        with self.telemetry.span("reranker.rerank", queries=len(query_texts), candidates=len(pair_docs)):
+            scores = self.score_documents(pair_queries, pair_docs)
+
+        reranked = []
+        offset = 0
+        for docs in search_results:
+            doc_scores = scores[offset:offset + len(docs)]
+            offset += len(docs)
+            reranked_results = sorted(
+                zip(docs, doc_scores), key=lambda x: x[1], reverse=True)
+            reranked.append([result[0] for result in reranked_results])
+
+        return reranked
+
+    def rerank_many_adaptive(self,
+                             query_texts: list[str],
+                             search_results: list[list[dict]],
+                             k: int,
+                             batch_size: int = 5,
+                             margin: float = 1.0) -> list[list[dict]]:
+        """Reranks search results, scoring candidates in distance order and stopping early.
+
+        Each round scores the next `batch_size` candidates of every query that is still
+        active in one batch; the first round scores at least `k`. After a round, a query
+        stops once its remaining candidates cannot plausibly enter its top-k: the best
+        score of its latest batch plus `margin` standard deviations of the scores seen so
+        far is still below its current k-th best score. Retrieval order is correlated with
+        the reranker score, so later candidates rarely beat that bound.
+
+        Args:
+            query_texts: The query texts.
+            search_results: For each query, the list of search results in distance order.
+            k: The number of top results the caller needs.
+            batch_size: The number of candidates scored per query per round.
+            margin: How many standard deviations above the latest batch's best score an unseen candidate may score.
+
+        Returns:
+            For each query, the scored search results sorted by score, followed by the unscored ones in distance order.
+        """
+        with self.telemetry.span("reranker.rerank_adaptive", queries=len(query_texts),
+                                 candidates=sum(map(len, search_results)), k=k) as span:
+            scores = self._score_adaptive(query_texts, search_results, k, batch_size, margin)
+            scored = sum(map(len, scores))
+            span.set(scored=scored)
+        self.telemetry.count("reranker_pairs_skipped_total", sum(map(len, search_results)) - scored)
 
-        pairs = [[query_text, doc['text']] for doc in search_results]
-        scores = self.calculate_scores(pairs)
-        reranked_results = sorted(
-            zip(search_results, scores.tolist()), key=lambda x: x[1], reverse=True)
+        reranked = []
+        for docs, doc_scores in zip(search_results, scores):
+            scored = sorted(zip(docs, doc_scores), key=lambda x: x[1], reverse=True)
+            reranked.append([result[0] for result in scored] + docs[len(doc_scores):])
+        return reranked
+
+    def _score_adaptive(self,
+                        query_texts: list[str],
+                        search_results: list[list[dict]],
+                        k: int,
+                        batch_size: int,
+                        margin: float) -> list[list[float]]:
+        """Scores candidates round by round until every query has stopped, see `rerank_many_adaptive`."""
+        scores: list[list[float]] = [[] for _ in query_texts]
+        active = [q for q, docs in enumerate(search_results) if docs]
+        first_round = True
+
+        while active:
+            docs, owners = [], []
+            for q in active:
+                start = len(scores[q])
+                size = max(k, batch_size) if first_round else batch_size
+                for doc in search_results[q][start:start + size]:
+                    docs.append(doc)
+                    owners.append(q)
+            first_round = False
+
+            for q, score in zip(owners, self.score_documents([query_texts[q] for q in owners], docs)):
+                scores[q].append(score)
+
+            active = [q for q in active
+                      if len(scores[q]) < len(search_results[q])
+                      and self._may_improve(scores[q], k, batch_size, margin)]
+        return scores
 
-        return [result[0] for result in reranked_results]
+    @staticmethod
+    def _may_improve(scores: list[float], k: int, batch_size: int, margin: float) -> bool:
+        """Whether an unscored candidate could still beat the current k-th best score."""
+        if len(scores) < k:
+            return True
+        kth_best = sorted(scores, reverse=True)[k - 1]
+        upper_bound = max(scores[-batch_size:]) + margin * float(np.std(scores))
+        return upper_bound >= kth_best
 
 
 if __name__ == '__main__':
@@ -0,0 +1,191 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .reranker import Reranker
+
+
+class _RerankJob:
+    def __init__(self, query_text: str, search_results: List[Dict[str, Any]]):
+        self.query_text = query_text
+        self.search_results = search_results
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class RerankerService:
+    """
+    A dynamic micro-batching front end for a Reranker.
+
+    Callers submit (query, candidates) jobs from any thread. A worker thread collects
+    queued jobs into one batch until it holds `max_batch_pairs` pairs or `max_wait`
+    seconds have passed since the first job was taken, scores the whole batch with a
+    single `predict` call and resolves every caller's future with its own results.
+
+    The service exposes `rerank`, `rerank_many`, `rerank_many_adaptive`,
+    `calculate_scores` and `padding_stats`, so it can be passed to SteveRAG wherever a
+    Reranker is expected. Batches are traced with the telemetry of the wrapped reranker.
+    """
+
+    def __init__(self,
+                 reranker: Reranker,
+                 max_batch_pairs: Optional[int] = None,
+                 max_wait: float = 0.01):
+        """
+        Initializes the service and starts its worker thread.
+
+        Args:
+            reranker (Reranker): The reranker that scores the batches.
+            max_batch_pairs (Optional[int]): The largest number of (query, document) pairs per batch. Defaults to the reranker's batch size, so a full batch is one forward pass. A single job larger than this is scored on its own.
+            max_wait (float): The longest time in seconds the worker waits for a batch to fill up.
+        """
+        self.reranker = reranker
+        self.max_batch_pairs = max_batch_pairs if max_batch_pairs is not None else reranker.batch_size
+        self.max_wait = max_wait
+
+        self._queue: queue.Queue = queue.Queue()
+        self._carry: Optional[_RerankJob] = None
+        self._metrics_lock = threading.Lock()
+        self._batch_sizes: Dict[int, int] = {}
+        self._requests = 0
+        self._pairs = 0
+        self._batches = 0
+        self._queue_wait = 0.0
+        self._predict_time = 0.0
+
+        self._closed = False
+        self._worker = threading.Thread(
+            target=self._run, name="reranker-service", daemon=True)
+        self._worker.start()
+
+    def submit(self, query_text: str, search_results: List[Dict[str, Any]]) -> Future:
+        """
+        Queues a reranking job.
+
+        Args:
+            query_text: The query text.
+            search_results: The list of search results to rerank.
+
+        Returns:
+            A future resolving to the reranked list of search results.
+        """
+        if self._closed:
+            raise RuntimeError("RerankerService is closed")
+        job = _RerankJob(query_text, search_results)
+        self._queue.put(job)
+        return job.future
+
+    def rerank(self, query_text: str, search_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Reranks search results, blocking until the batch containing them has been scored."""
+        return self.submit(query_text, search_results).result()
+
+    def rerank_many(self,
+                    query_texts: List[str],
+                    search_results: List[List[Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+        """Reranks the search results of several queries, which may share batches with other callers."""
+        futures = [self.submit(query_text, results)
+                   for query_text, results in zip(query_texts, search_results)]
+        return [future.result() for future in futures]
+
+    def rerank_many_adaptive(self,
+                             query_texts: List[str],
+                             search_results: List[List[Dict[str, Any]]],
+                             k: int,
+                             batch_size: int = 5,
+                             margin: float = 1.0) -> List[List[Dict[str, Any]]]:
+        """Adaptive reranking runs its own scoring rounds, so it bypasses the batching queue."""
+        return self.reranker.rerank_many_adaptive(
+            query_texts, search_results, k, batch_size=batch_size, margin=margin)
+
+    def calculate_scores(self, pairs: List[List[str]]) -> np.ndarray:
+        """Scores (query, document) pairs directly with the wrapped reranker, bypassing the batching queue."""
+        return self.reranker.calculate_scores(pairs)
+
+    def padding_stats(self) -> Dict[str, float]:
+        """Returns the padding stats of the wrapped reranker."""
+        return self.reranker.padding_stats()
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Returns counters for tuning the latency/throughput trade-off.
+
+        Returns:
+            The current queue depth, the number of requests, pairs and batches processed,
+            the average batch size in pairs, a histogram of batch sizes bucketed by powers
+            of two, and the average time jobs spent queued and batches spent in predict.
+        """
+        with self._metrics_lock:
+            return {
+                "queue_depth": self._queue.qsize() + (self._carry is not None),
+                "requests": self._requests,
+                "pairs": self._pairs,
+                "batches": self._batches,
+                "avg_batch_pairs": self._pairs / self._batches if self._batches else 0.0,
+                "batch_pairs_histogram": dict(sorted(self._batch_sizes.items())),
+                "avg_queue_wait": self._queue_wait / self._requests if self._requests else 0.0,
+                "avg_predict_time": self._predict_time / self._batches if self._batches else 0.0
+            }
+
+    def close(self) -> None:
+        """Stops accepting jobs, finishes the queued ones and stops the worker thread."""
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+
+    def _next_batch(self) -> Optional[List[_RerankJob]]:
+        """Blocks for the first job, then collects more until the batch is full or the deadline passes."""
+        first = self._carry if self._carry is not None else self._queue.get()
+        self._carry = None
+        if first is None:
+            return None
+
+        batch = [first]
+        num_pairs = len(first.search_results)
+        deadline = time.perf_counter() + self.max_wait
+        while num_pairs < self.max_batch_pairs:
+            timeout = deadline - time.perf_counter()
+            try:
+                job = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                # Finish this batch, then stop on the next call
+                self._queue.put(None)
+                break
+            if num_pairs + len(job.search_results) > self.max_batch_pairs:
+                self._carry = job
+                break
+            batch.append(job)
+            num_pairs += len(job.search_results)
+        return batch
+
+    def _run(self) -> None:
+        while (batch := self._next_batch()) is not None:
+            started = time.perf_counter()
+            num_pairs = sum(len(job.search_results) for job in batch)
+            try:
+                with self.reranker.telemetry.span("reranker_service.batch", jobs=len(batch), pairs=num_pairs):
+                    results = self.reranker.rerank_many(
+                        [job.query_text for job in batch],
+                        [job.search_results for job in batch])
+            except Exception as e:
+                for job in batch:
+                    job.future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+
+            for job, reranked in zip(batch, results):
+                job.future.set_result(reranked)
+
+            bucket = 1 << max(num_pairs - 1, 0).bit_length()
+            with self._metrics_lock:
+                self._batches += 1
+                self._requests += len(batch)
+                self._pairs += num_pairs
+                self._batch_sizes[bucket] = self._batch_sizes.get(bucket, 0) + 1
+                self._queue_wait += sum(started - job.enqueued_at for job in batch)
+                self._predict_time += finished - started
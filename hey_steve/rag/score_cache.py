@@ -0,0 +1,94 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from .query_cache import QueryCache
+
+
+class ScoreCache:
+    """
+    A thread-safe LRU cache of reranker scores.
+
+    Scores are keyed by a hash of the normalized query and the ID of the chunk, so a
+    reissued query, or a similar one whose candidates overlap, only has its new pairs
+    scored. Chunk IDs are derived from the chunk source and text, so a cached score
+    never outlives the text it was computed for. A cache belongs to one reranker model:
+    scores of different models or backends are not comparable.
+    """
+
+    def __init__(self, max_size: int = 20000):
+        """
+        Initializes an empty cache.
+
+        Args:
+            max_size (int): The maximum number of scores. The least recently used score is evicted first.
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[Hashable, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def query_hash(query_text: str) -> str:
+        """Hashes the normalized query, so queries that only differ in case, whitespace or trailing punctuation share scores."""
+        normalized = QueryCache.normalize_query(query_text)
+        return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+    @staticmethod
+    def chunk_id(doc: Dict[str, Any]) -> str:
+        """Returns the ID of a search result, or a hash of its text if it has none."""
+        doc_id = doc.get("id")
+        if doc_id is not None:
+            return doc_id
+        return hashlib.blake2b(doc["text"].encode("utf-8"), digest_size=16).hexdigest()
+
+    def make_key(self, query_hash: str, doc: Dict[str, Any]) -> Tuple[str, str]:
+        return (query_hash, self.chunk_id(doc))
+
+    def get_many(self, keys: List[Hashable]) -> List[Optional[float]]:
+        """Returns the cached score of every key, None for the keys that are not cached."""
+        with self._lock:
+            scores = []
+            for key in keys:
+                score = self._entries.get(key)
+                if score is not None:
+                    self._entries.move_to_end(key)
+                scores.append(score)
+            hits = sum(score is not None for score in scores)
+            self.hits += hits
+            self.misses += len(keys) - hits
+            return scores
+
+    def put_many(self, keys: List[Hashable], scores: List[float]) -> None:
+        """Stores scores, evicting the least recently used ones if the cache is full."""
+        with self._lock:
+            for key, score in zip(keys, scores):
+                self._entries[key] = score
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Removes every score. The hit/miss counters are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict[str, float]:
+        """Returns the size of the cache and its hit, miss and eviction counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
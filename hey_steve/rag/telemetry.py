@@ -0,0 +1,379 @@
+"""Spans and Prometheus-style metrics for the retrieval pipeline.
+
+Telemetry is off by default: the shared instance has no exporters, so `span` returns a
+no-op span and counters and histograms return at once. Once exporters are given, every
+span records its duration, attributes and parent, feeds a duration histogram and is
+handed to the exporters when it ends.
+
+    telemetry = Telemetry([InMemoryExporter()])
+    set_telemetry(telemetry)  # before building SteveRAG and Reranker
+    with telemetry.span("steve_rag.query", batch_size=4) as span:
+        span.set(cache_hits=1)
+    telemetry.count("steve_rag_queries_total", 4, kind="query")
+    print(telemetry.render_prometheus())
+"""
+
+import itertools
+import json
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+SPAN_DURATION_METRIC = "hey_steve_span_duration_seconds"
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("hey_steve_current_span", default=None)
+_span_ids = itertools.count(1)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Span:
+    """
+    A timed operation with attributes, nested under the span that was current when it started.
+
+    Spans are context managers. An exception raised inside one is recorded as its error
+    and propagates.
+    """
+
+    def __init__(self, telemetry: "Telemetry", name: str, attributes: Dict[str, Any]):
+        self.telemetry = telemetry
+        self.name = name
+        self.attributes = attributes
+        self.span_id = next(_span_ids)
+        self.parent_id: Optional[int] = None
+        self.trace_id = self.span_id
+        self.start_time = 0.0
+        self.duration = 0.0
+        self.error: Optional[str] = None
+        # Exporters keep their per-span state here, e.g. the bridged OpenTelemetry span
+        self.exporter_state: Dict[int, Any] = {}
+        self._started = 0.0
+        self._token = None
+
+    def set(self, **attributes: Any) -> None:
+        """Adds or overwrites attributes."""
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        parent = _current_span.get()
+        if parent is not None:
+            self.parent_id = parent.span_id
+            self.trace_id = parent.trace_id
+        self._token = _current_span.set(self)
+        self.start_time = time.time()
+        self._started = time.perf_counter()
+        for exporter in self.telemetry.exporters:
+            exporter.on_start(self)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.duration = time.perf_counter() - self._started
+        if exc_type is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        self.telemetry.observe(SPAN_DURATION_METRIC, self.duration, span=self.name)
+        for exporter in self.telemetry.exporters:
+            exporter.on_end(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the span as a JSON-serializable dictionary."""
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "trace_id": self.trace_id,
+            "start_time": self.start_time,
+            "duration_ms": self.duration * 1000,
+            "attributes": self.attributes,
+            "error": self.error
+        }
+
+
+class _NoopSpan:
+    """The span returned while telemetry is off. It records nothing."""
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class SpanExporter:
+    """Receives spans as they start and end. Subclasses override the hooks they need."""
+
+    def on_start(self, span: Span) -> None:
+        pass
+
+    def on_end(self, span: Span) -> None:
+        pass
+
+    def shutdown(self) -> None:
+        pass
+
+
+class InMemoryExporter(SpanExporter):
+    """Keeps finished spans in memory, for tests and interactive inspection."""
+
+    def __init__(self):
+        self._spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def on_end(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self, name: Optional[str] = None) -> List[Span]:
+        """Returns the finished spans in the order they ended, optionally only those with a name."""
+        with self._lock:
+            return [span for span in self._spans if name is None or span.name == name]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+
+class FileExporter(SpanExporter):
+    """Appends every finished span to a JSONL file."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): The JSONL file. Spans are appended to it, one JSON object per line.
+        """
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def on_end(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class OpenTelemetryExporter(SpanExporter):
+    """
+    Mirrors spans as OpenTelemetry spans, so they show up under the spans of the caller.
+
+    Every span is started as an OpenTelemetry span in the current OpenTelemetry context,
+    e.g. inside the tool call span of a smolagents agent, and becomes the parent of the
+    spans started inside it.
+    """
+
+    def __init__(self, tracer_provider: Any = None, tracer_name: str = "hey_steve"):
+        """
+        Args:
+            tracer_provider: The OpenTelemetry tracer provider. Defaults to the global one.
+            tracer_name (str): The name of the tracer.
+        """
+        from opentelemetry import context, trace
+
+        self._context = context
+        self._trace = trace
+        self.tracer = trace.get_tracer(tracer_name, tracer_provider=tracer_provider)
+
+    def on_start(self, span: Span) -> None:
+        otel_span = self.tracer.start_span(span.name)
+        token = self._context.attach(self._trace.set_span_in_context(otel_span))
+        span.exporter_state[id(self)] = (otel_span, token)
+
+    def on_end(self, span: Span) -> None:
+        otel_span, token = span.exporter_state.pop(id(self))
+        otel_span.set_attributes({key: value for key, value in span.attributes.items()
+                                  if isinstance(value, (str, bool, int, float))})
+        if span.error is not None:
+            otel_span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, span.error))
+        self._context.detach(token)
+        otel_span.end()
+
+
+class _Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            index = len(self.buckets)
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Telemetry:
+    """
+    Records spans, counters, histograms and gauges, and hands finished spans to exporters.
+
+    Metric names and labels follow the Prometheus conventions: counters end in `_total`,
+    durations are in seconds, and labels are keyword arguments. All methods are thread-safe.
+    """
+
+    def __init__(self, exporters: Sequence[SpanExporter] = (), enabled: Optional[bool] = None):
+        """
+        Args:
+            exporters (Sequence[SpanExporter]): The exporters finished spans are handed to.
+            enabled (Optional[bool]): Whether anything is recorded. Defaults to whether there are exporters.
+        """
+        self.exporters = list(exporters)
+        self.enabled = bool(self.exporters) if enabled is None else enabled
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], _Histogram] = {}
+        self._gauges: Dict[Tuple[str, Labels], Callable[[], float]] = {}
+        self._lock = threading.Lock()
+
+    def span(self, name: str, **attributes: Any):
+        """
+        Starts a span, to be used as a context manager.
+
+        Args:
+            name (str): The span name, e.g. "steve_rag.query".
+            **attributes: The initial attributes, e.g. the batch size.
+
+        Returns:
+            The span, or a no-op span if telemetry is off.
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, attributes)
+
+    def count(self, name: str, value: float = 1, **labels: Any) -> None:
+        """Adds to a counter."""
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = DURATION_BUCKETS, **labels: Any) -> None:
+        """
+        Records a value in a histogram.
+
+        Args:
+            name (str): The histogram name.
+            value (float): The observed value.
+            buckets (Sequence[float]): The upper bounds of the buckets, used when the histogram is created.
+            **labels: The labels of the series.
+        """
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def gauge(self, name: str, callback: Callable[[], float], **labels: Any) -> None:
+        """Registers a gauge whose value is read from `callback` whenever metrics are collected."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[(name, _labels(labels))] = callback
+
+    def metrics(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Collects every metric.
+
+        Returns:
+            Dict[str, List[Dict[str, Any]]]: The counters and gauges with their name, labels and
+            value, and the histograms with their name, labels, buckets, per-bucket counts, sum
+            and count. The last bucket count is for values above the largest bound.
+        """
+        with self._lock:
+            counters = list(self._counters.items())
+            histograms = [(key, histogram.buckets, list(histogram.counts), histogram.sum, histogram.count)
+                          for key, histogram in self._histograms.items()]
+            gauges = list(self._gauges.items())
+        return {
+            "counters": [{"name": name, "labels": dict(labels), "value": value}
+                         for (name, labels), value in counters],
+            "histograms": [{"name": name, "labels": dict(labels), "buckets": list(buckets),
+                            "counts": counts, "sum": total, "count": count}
+                           for (name, labels), buckets, counts, total, count in histograms],
+            "gauges": [{"name": name, "labels": dict(labels), "value": float(callback())}
+                       for (name, labels), callback in gauges]
+        }
+
+    def render_prometheus(self) -> str:
+        """Renders every metric in the Prometheus text exposition format."""
+        metrics = self.metrics()
+        lines = []
+        typed = set()
+
+        def declare(name: str, kind: str) -> None:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for metric in sorted(metrics["counters"], key=lambda m: m["name"]):
+            declare(metric["name"], "counter")
+            lines.append(f"{metric['name']}{_format_labels(metric['labels'])} {metric['value']:g}")
+        for metric in sorted(metrics["gauges"], key=lambda m: m["name"]):
+            declare(metric["name"], "gauge")
+            lines.append(f"{metric['name']}{_format_labels(metric['labels'])} {metric['value']:g}")
+        for metric in sorted(metrics["histograms"], key=lambda m: m["name"]):
+            name, labels = metric["name"], metric["labels"]
+            declare(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(metric["buckets"] + ["+Inf"], metric["counts"]):
+                cumulative += count
+                le = bound if isinstance(bound, str) else f"{bound:g}"
+                lines.append(f"{name}_bucket{_format_labels({**labels, 'le': le})} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {metric['sum']:g}")
+            lines.append(f"{name}_count{_format_labels(labels)} {metric['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self, path: str) -> None:
+        """Writes every metric to a file in the Prometheus text format, e.g. for the node exporter textfile collector."""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+
+    def shutdown(self) -> None:
+        """Shuts the exporters down."""
+        for exporter in self.exporters:
+            exporter.shutdown()
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+_telemetry = Telemetry()
+
+
+def get_telemetry() -> Telemetry:
+    """Returns the shared telemetry, which components use when none is passed to them."""
+    return _telemetry
+
+
+def set_telemetry(telemetry: Telemetry) -> None:
+    """Replaces the shared telemetry. Components built afterwards record to it."""
+    global _telemetry
+    _telemetry = telemetry
@@ -1,48 +1,151 @@
-import os
+from typing import Optional, TypeVar
+
 from mcp.server.fastmcp import FastMCP
 from chromadb.utils.embedding_functions.sentence_transformer_embedding_function import SentenceTransformerEmbeddingFunction
 from hey_steve.rag.rag import SteveRAG
+from hey_steve.rag.query_cache import QueryCache
+from hey_steve.rag.lazy import LazyHandle, StartupReport
+from hey_steve.agents_and_tools.mc_data_store import McDataStore
+from hey_steve.agents_and_tools.recipe_graph import RecipeGraph
+from hey_steve.agents_and_tools.reverse_index import ReverseIndex
 # fastmcp dev run_mcp.py
 
+T = TypeVar("T")
+
+# The longest a request waits for a component that is still loading before it is told to retry
+LOAD_WAIT = 20.0
+
+
+def build_rag() -> SteveRAG:
+    # reranker = Reranker(score_cache=ScoreCache())
+    return SteveRAG(
+        collection_name="mc_rag_custom",
+        embedding_function=SentenceTransformerEmbeddingFunction(
+            "nomic-ai/nomic-embed-text-v2-moe", trust_remote_code=True),
+        embedding_cache_dir="data/embedding_cache",
+        query_cache=QueryCache(),
+        bm25_index_path="data/bm25_index.npz",
+    )
+
 
 mcp = FastMCP("Hey-Steve")
 
-# reranker = Reranker()
-steve_rag = SteveRAG(
-    collection_name="mc_rag_custom",
-    embedding_function=SentenceTransformerEmbeddingFunction(
-        "nomic-ai/nomic-embed-text-v2-moe", trust_remote_code=True),
-)
+# Components load in the background, so the server answers right away and a request
+# only waits for the components it uses
+startup_report = StartupReport()
+steve_rag_handle = LazyHandle("steve_rag", build_rag, warm_up=SteveRAG.warm_up, report=startup_report).start()
+mc_data_handle = LazyHandle("mc_data", McDataStore.load, report=startup_report).start()
+recipe_graph_handle = LazyHandle(
+    "recipe_graph", lambda: RecipeGraph(mc_data_handle.get()), report=startup_report).start()
+reverse_index_handle = LazyHandle(
+    "reverse_index", lambda: ReverseIndex.load(mc_data_handle.get()), report=startup_report).start()
+handles = [steve_rag_handle, mc_data_handle, recipe_graph_handle, reverse_index_handle]
+startup_report.print_when_ready(handles)
+
+
+async def load(handle: LazyHandle[T]) -> Optional[T]:
+    """Waits for a component, returning None if it is still loading after LOAD_WAIT seconds."""
+    try:
+        return await handle.aget(timeout=LOAD_WAIT)
+    except TimeoutError:
+        return None
+
 
-recipe_files = [f.replace(".json", "") for f in os.listdir(
-            "data/mc/recipe") if f.endswith('.json')]
+def still_loading(handle: LazyHandle) -> str:
+    return f"The {handle.name} component is still loading ({handle.state}), please try again in a few seconds."
 
 @mcp.tool()
-def mc_kownlege_base(query: str, n_results: int = 5):
+def server_status():
+    """Report whether every component of the server is ready, and how long each took to start"""
+    states = "\n".join(f"{handle.name}: {handle.state}" + (f" ({handle.error})" if handle.error else "")
+                       for handle in handles)
+    return states + "\n\n" + startup_report.render()
+
+@mcp.tool()
+async def mc_kownlege_base(query: str, n_results: int = 5):
     """Retrieve semantically related documents to the querey"""
-    
-    docs = steve_rag.query_with_reranking(query, n_results=n_results)
+    steve_rag = await load(steve_rag_handle)
+    if steve_rag is None:
+        return still_loading(steve_rag_handle)
+
+    docs = await steve_rag.aquery_with_reranking(query, n_results=n_results)
     return "\nRetrieved documents:\n" + "".join(
         [f"\n\n===== Document {str(i)} =====\n" +
             doc['text'].replace("search_document: ", "") for i, doc in enumerate(docs)]
     )
 
 @mcp.tool()
-def recipe_lookup(item_name: str):
+async def recipe_lookup(item_name: str):
     """Retrieve the crafting recipe for an item in Minecraft"""
     item_name = item_name.lower()
+    mc_data = await load(mc_data_handle)
+    if mc_data is None:
+        return still_loading(mc_data_handle)
 
-    if item_name in recipe_files:
-        with open(os.path.join("data/mc/recipe", item_name + ".json"), "r") as f:
-            return f"The crafting recipe for {item_name} is \n" + f.read() + \
-                "\n The pattern represents a 3x3 crafting table grid. \
-                    If pattern does not show all 9 positions, if can be in any position while maintian the exact shape."
+    if item_name in mc_data.recipes:
+        return f"The crafting recipe for {item_name} is \n" + mc_data.render_recipe(item_name)
     else:
-        item_name_parts = item_name.split("_")
-        possible_matches = set()
-        for part in item_name_parts:
-            for recipe in recipe_files:
-                if part in recipe:
-                    possible_matches.add(recipe.strip(".json"))
-
-        return f"No exact match is found, but here are a list of possible matches:" + ", ".join(possible_matches)
+        possible_matches = mc_data.recipe_index.search(item_name)
+
+        return f"No exact match is found, but here are a list of possible matches: " + ", ".join(possible_matches)
+
+@mcp.tool()
+async def crafting_tree_lookup(item_name: str, count: int = 1):
+    """Resolve the full crafting tree and total raw materials needed to craft an item in Minecraft"""
+    item_name = item_name.lower()
+    if count < 1:
+        return f"count must be at least 1, got {count}."
+    recipe_graph = await load(recipe_graph_handle)
+    if recipe_graph is None:
+        return still_loading(recipe_graph_handle)
+    mc_data = mc_data_handle.get()
+    tree = recipe_graph.render(item_name, count)
+
+    if tree is not None:
+        return tree
+    elif recipe_graph.is_raw_material(item_name):
+        return f"{item_name} is a raw material, it is not crafted from other items."
+    else:
+        possible_matches = mc_data.recipe_index.search(item_name)
+
+        return f"No exact match is found, but here are a list of possible matches: " + ", ".join(possible_matches)
+
+@mcp.tool()
+async def item_uses_lookup(item_name: str):
+    """List every recipe that consumes an item in Minecraft"""
+    item_name = item_name.lower()
+    reverse_index = await load(reverse_index_handle)
+    if reverse_index is None:
+        return still_loading(reverse_index_handle)
+    uses = reverse_index.render_uses(item_name)
+
+    if uses is not None:
+        return uses
+    elif item_name in reverse_index.drops:
+        return f"{item_name} is not used in any recipe."
+    else:
+        possible_matches = reverse_index.item_index.search(item_name)
+
+        return f"No exact match is found, but here are a list of possible matches: " + ", ".join(possible_matches)
+
+@mcp.tool()
+async def item_drops_lookup(item_name: str):
+    """List every block, entity or chest loot table that can drop an item in Minecraft, with chances and conditions"""
+    item_name = item_name.lower()
+    reverse_index = await load(reverse_index_handle)
+    if reverse_index is None:
+        return still_loading(reverse_index_handle)
+    drops = reverse_index.render_drops(item_name)
+
+    if drops is not None:
+        return drops
+    elif item_name in reverse_index.uses:
+        return f"{item_name} is not dropped by any loot table."
+    else:
+        possible_matches = reverse_index.item_index.search(item_name)
+
+        return f"No exact match is found, but here are a list of possible matches: " + ", ".join(possible_matches)
+
+
+# Every tool is registered, so the server can answer while the components load
+startup_report.mark("server_ready")
@@ -7,6 +7,7 @@ from smolagents import ToolCallingAgent, GradioUI, LiteLLMModel
 from hey_steve.agents_and_tools import *
 from hey_steve.rag import *
 import os
+import sys
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -17,6 +18,8 @@ trace_provider.add_span_processor(
     SimpleSpanProcessor(OTLPSpanExporter(endpoint)))
 
 SmolagentsInstrumentor().instrument(tracer_provider=trace_provider)
+# Nest retrieval and reranking spans under the tool call spans
+set_telemetry(Telemetry([OpenTelemetryExporter(trace_provider)]))
 
 
 # Create a LLM
@@ -26,24 +29,46 @@ model = LiteLLMModel(
 )
 
 
-# reranker = Reranker()
-steve_rag = SteveRAG(
-    collection_name="mc_rag_custom",
-    embedding_function=SentenceTransformerEmbeddingFunction(
-        "nomic-ai/nomic-embed-text-v2-moe", trust_remote_code=True),
-)
-# steve_rag.load_chunks_into_rag("data/chunks")
+def build_rag() -> SteveRAG:
+    # reranker = Reranker(score_cache=ScoreCache())
+    steve_rag = SteveRAG(
+        collection_name="mc_rag_custom",
+        embedding_function=SentenceTransformerEmbeddingFunction(
+            "nomic-ai/nomic-embed-text-v2-moe", trust_remote_code=True),
+        embedding_cache_dir="data/embedding_cache",
+        query_cache=QueryCache(),
+        bm25_index_path="data/bm25_index.npz",
+    )
+    # steve_rag.load_chunks_into_rag("data/chunks")
+    return steve_rag
+
+
+# The models load and warm up in the background while the game data loads and the UI
+# starts; the retriever tool waits for them on its first call
+startup_report = StartupReport(stream=sys.stdout)
+steve_rag = LazyHandle("steve_rag", build_rag, warm_up=SteveRAG.warm_up, report=startup_report).start()
 retrieverTool = RetrieverTool(steve_rag)
+with startup_report.stage("mc_data"):
+    mc_data = McDataStore.load()
+with startup_report.stage("reverse_index"):
+    reverse_index = ReverseIndex.load(mc_data)
+with startup_report.stage("recipe_graph"):
+    recipe_graph = RecipeGraph(mc_data)
 
 
 agent = ToolCallingAgent(
     tools=[
         retrieverTool,
-        RecipeTool(),
-        LootTableTool()
+        RecipeTool(store=mc_data),
+        LootTableTool(store=mc_data),
+        CraftingTreeTool(recipe_graph),
+        ItemUsesTool(reverse_index),
+        ItemDropsTool(reverse_index)
     ],
     model=model,
     add_base_tools=True
 )
 
+startup_report.mark("agent_ready")
+startup_report.print_when_ready([steve_rag])
 GradioUI(agent).launch()
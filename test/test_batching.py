@@ -0,0 +1,62 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from hey_steve.rag.batching import AsyncMicroBatcher
+
+
+class RecordingBatchFn:
+    """Doubles every item and records the group and items of every batch."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.batches = []
+
+    def __call__(self, group, items):
+        self.batches.append((group, list(items)))
+        if self.fail:
+            raise ValueError("batch failed")
+        return [item * 2 for item in items]
+
+
+def run(batch_fn, coroutine_fn, **kwargs):
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        batcher = AsyncMicroBatcher(batch_fn, executor, **kwargs)
+        return asyncio.run(coroutine_fn(batcher))
+
+
+def test_concurrent_requests_are_merged_by_group():
+    batch_fn = RecordingBatchFn()
+
+    async def submit_all(batcher):
+        return await asyncio.gather(*(batcher.submit(i % 2, i) for i in range(6)))
+
+    results = run(batch_fn, submit_all, max_batch_size=3, max_wait=1.0)
+    assert results == [0, 2, 4, 6, 8, 10]
+    # Each group filled up to max_batch_size, so neither waited for its timer
+    assert sorted(batch_fn.batches) == [(0, [0, 2, 4]), (1, [1, 3, 5])]
+
+
+def test_partial_batches_are_flushed_after_max_wait():
+    batch_fn = RecordingBatchFn()
+
+    async def submit_two(batcher):
+        started = time.perf_counter()
+        results = await asyncio.gather(batcher.submit("g", 1), batcher.submit("g", 2))
+        return results, time.perf_counter() - started
+
+    results, elapsed = run(batch_fn, submit_two, max_batch_size=16, max_wait=0.05)
+    assert results == [2, 4]
+    assert batch_fn.batches == [("g", [1, 2])]
+    assert 0.05 <= elapsed < 1.0
+
+
+def test_batch_errors_reach_every_waiter():
+    batch_fn = RecordingBatchFn(fail=True)
+
+    async def submit_all(batcher):
+        return await asyncio.gather(*(batcher.submit("g", i) for i in range(3)), return_exceptions=True)
+
+    results = run(batch_fn, submit_all, max_batch_size=3, max_wait=1.0)
+    assert len(batch_fn.batches) == 1
+    assert all(isinstance(result, ValueError) and str(result) == "batch failed" for result in results)
@@ -0,0 +1,23 @@
+from hey_steve.rag.benchmark import compare_results, quality_regressions, retrieval_metrics, source_rank
+
+
+def test_retrieval_metrics():
+    docs = [{"text": "search_document: a"}, {"text": "search_document: b"}]
+    ranks = [source_rank(docs, "a"), source_rank(docs, "b"), source_rank(docs, "c"), 4]
+    assert ranks == [1, 2, None, 4]
+
+    metrics = retrieval_metrics(ranks, ks=(1, 5))
+    assert metrics["recall@1"] == 0.25
+    assert metrics["recall@5"] == 0.75
+    assert metrics["mrr"] == (1 + 1 / 2 + 1 / 4) / 4
+
+
+def test_quality_regressions_only_flag_large_quality_drops():
+    baseline = {"meta": {"commit": "a"}, "results": {
+        "query": {"recall@5": 0.80, "mrr": 0.60, "latency": {"p95_ms": 40.0}}}}
+    current = {"meta": {"commit": "b"}, "results": {
+        "query": {"recall@5": 0.79, "mrr": 0.55, "latency": {"p95_ms": 80.0}}}}
+
+    rows = compare_results(baseline, current)
+    assert [row["metric"] for row in quality_regressions(rows, max_drop=0.02)] == ["query.mrr"]
+    assert quality_regressions(rows, max_drop=0.1) == []
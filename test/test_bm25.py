@@ -0,0 +1,66 @@
+import json
+
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+from hey_steve.rag.bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+from hey_steve.rag.query_cache import QueryCache
+from hey_steve.rag.rag import SteveRAG
+
+DOCUMENTS = [
+    ("stone", "Stone is mined with a pickaxe and drops cobblestone."),
+    ("pickaxe", "A pickaxe is a tool. The diamond pickaxe mines obsidian."),
+    ("gate", "The dark_oak_fence_gate is crafted from dark oak planks and sticks."),
+    ("sand", "Sand falls when nothing supports it."),
+]
+
+
+class LengthEmbedding(EmbeddingFunction[Documents]):
+    def __call__(self, input: Documents) -> Embeddings:
+        return [[float(len(text)), 1.0] for text in input]
+
+
+def test_tokenize_keeps_identifiers_and_their_parts():
+    assert tokenize("Dark_Oak_Fence_Gate!") == ["dark_oak_fence_gate", "dark", "oak", "fence", "gate"]
+
+
+def test_search_ranks_documents_by_bm25():
+    index = BM25Index.build(DOCUMENTS)
+    results = index.search("diamond pickaxe", n_results=3)
+    assert [doc_id for doc_id, _ in results] == ["pickaxe", "stone"]
+    assert results[0][1] > results[1][1] > 0
+    assert [doc_id for doc_id, _ in index.search("dark_oak_fence_gate")] == ["gate"]
+    assert index.search("creeper") == []
+    assert len(index.search("pickaxe stone sand gate", n_results=2)) == 2
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = BM25Index.build(DOCUMENTS, k1=1.2, b=0.5)
+    path = str(tmp_path / "bm25.npz")
+    index.save(path)
+    loaded = BM25Index.load(path)
+
+    assert loaded.doc_ids == index.doc_ids and loaded.vocab == index.vocab
+    assert (loaded.k1, loaded.b) == (1.2, 0.5)
+    for query in ("diamond pickaxe", "dark oak", "sand falls"):
+        assert loaded.search(query) == index.search(query)
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d", "a"]], k=1)
+    assert [doc_id for doc_id, _ in fused] == ["b", "a", "d", "c"]
+    assert fused[0][1] == 1 / 2 + 1 / 3
+
+
+def test_hybrid_candidates_do_not_fill_the_query_cache(tmp_path):
+    (tmp_path / "chunks").mkdir()
+    (tmp_path / "chunks" / "pages.json").write_text(json.dumps([text for _, text in DOCUMENTS]))
+    query_cache = QueryCache()
+    steve_rag = SteveRAG(collection_name="test_hybrid", embedding_function=LengthEmbedding(),
+                         persist_directory=str(tmp_path / "chroma"), query_cache=query_cache,
+                         bm25_index_path=str(tmp_path / "bm25.npz"))
+    steve_rag.load_chunks_into_rag(str(tmp_path / "chunks"))
+
+    results = steve_rag.query_many_hybrid(["diamond pickaxe", "diamond pickaxe"], n_results=2)
+    assert results[0] == results[1] and len(results[0]) == 2
+    assert any("diamond pickaxe" in doc["text"] for doc in results[0])
+    assert query_cache.stats()["size"] == 0
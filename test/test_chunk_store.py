@@ -0,0 +1,60 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "hey_steve", "processing"))
+
+from chunk_store import ChunkStore  # noqa: E402
+
+
+def record(text, headers=("Stone",)):
+    return {"headers": list(headers), "start": 0, "end": len(text), "text": text}
+
+
+def test_put_commit_and_stream(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    store.put("Stone.md", "h1", [record("Stone is a block."), record("It drops cobblestone.")])
+    store.put("Dirt.md", "h2", [record("Dirt is a block.", ["Dirt"])])
+    assert not ChunkStore.exists(str(tmp_path))
+    store.commit()
+
+    reopened = ChunkStore(str(tmp_path))
+    assert reopened.page_hash("Stone.md") == "h1"
+    assert [r["text"] for r in reopened.read("Dirt.md")] == ["Dirt is a block."]
+    assert list(reopened.iter_texts()) == ["Stone is a block.", "It drops cobblestone.", "Dirt is a block."]
+    assert next(reopened.iter_records())["source"] == "Stone.md"
+
+
+def test_replaced_pages_are_compacted(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    store.put("Stone.md", "h1", [record("old " * 50)])
+    store.put("Dirt.md", "h2", [record("Dirt is a block.")])
+    store.commit()
+    old_file = store.path
+
+    store.put("Stone.md", "h3", [record("new")])
+    store.remove("Dirt.md")
+    store.commit()
+
+    assert not os.path.exists(old_file)
+    assert list(ChunkStore(str(tmp_path)).iter_texts()) == ["new"]
+    with open(store.path, "rb") as f:
+        assert [json.loads(line)["text"] for line in f] == ["new"]
+
+
+def test_uncommitted_records_are_dropped(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    store.put("Stone.md", "h1", [record("Stone is a block.")])
+    store.commit()
+
+    # A run interrupted before its commit leaves records that the manifest does not know
+    interrupted = ChunkStore(str(tmp_path))
+    interrupted.put("Dirt.md", "h2", [record("Dirt is a block.")])
+    interrupted._file.flush()
+
+    resumed = ChunkStore(str(tmp_path))
+    assert resumed.page_hash("Dirt.md") is None
+    resumed.put("Sand.md", "h3", [record("Sand falls.")])
+    resumed.commit()
+    with open(resumed.path, "rb") as f:
+        assert [json.loads(line)["text"] for line in f] == ["Stone is a block.", "Sand falls."]
@@ -0,0 +1,84 @@
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "hey_steve", "processing"))
+
+from download_pages import PageDownloader, download_pages, page_filename  # noqa: E402
+
+PAGE = b"<html>" + b"minecraft " * 200 + b"</html>"
+
+
+class WikiHandler(BaseHTTPRequestHandler):
+    """Serves every page with an ETag, and fails the first request of /w/Flaky with a 503."""
+    requests_seen = []
+    flaky_failed = False
+
+    def do_GET(self):
+        WikiHandler.requests_seen.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/w/Missing":
+            self.send_error(404)
+            return
+        if self.path == "/w/Flaky" and not WikiHandler.flaky_failed:
+            WikiHandler.flaky_failed = True
+            self.send_error(503)
+            return
+        etag = '"' + self.path + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), WikiHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/w/"
+
+
+def test_download_revalidate_and_resume(tmp_path):
+    server, base_url = serve()
+    try:
+        names = ["Stone", "Tutorial:Mining", "Flaky", "Missing"]
+        options = {"workers": 4, "rate": 0, "backoff": 0.01}
+
+        first = download_pages(names, str(tmp_path), base_url, **options)
+        assert first.counts == {"downloaded": 3, "not_modified": 0, "skipped": 0, "failed": 1}
+        assert (tmp_path / page_filename("Tutorial:Mining")).read_bytes() == PAGE
+        assert page_filename("Tutorial:Mining") == "Tutorial_Mining.html"
+
+        # A fresh state skips every page without a request
+        WikiHandler.requests_seen.clear()
+        resumed = download_pages(names[:3], str(tmp_path), base_url, **options)
+        assert resumed.counts["skipped"] == 3
+        assert WikiHandler.requests_seen == []
+
+        # Once stale, pages are revalidated with their ETag instead of downloaded
+        stale = download_pages(names[:3], str(tmp_path), base_url, max_age=0, **options)
+        assert stale.counts["not_modified"] == 3
+        assert all(etag is not None for _, etag in WikiHandler.requests_seen)
+    finally:
+        server.shutdown()
+
+
+def test_rate_limit_spaces_requests(tmp_path):
+    server, base_url = serve()
+    try:
+        downloader = PageDownloader(str(tmp_path), workers=4, rate=20)
+        pages = [(base_url + name, str(tmp_path / page_filename(name))) for name in "ABCDEF"]
+        started = time.monotonic()
+        assert downloader.download(pages) == {}
+        # 6 requests at 20 per second take at least 5 intervals of 50ms
+        assert time.monotonic() - started >= 0.25
+    finally:
+        server.shutdown()
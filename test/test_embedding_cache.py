@@ -0,0 +1,66 @@
+import threading
+
+import numpy as np
+
+from hey_steve.rag.embedding_cache import CachedEmbeddingFunction
+
+
+class CharEmbedding:
+    """Embeds a text as its length and the code of its first character, counting the texts it embeds."""
+
+    model_name = "char-embedding"
+
+    def __init__(self):
+        self.embedded = []
+
+    def __call__(self, input):
+        self.embedded.extend(input)
+        return [[float(len(text)), float(ord(text[0]))] for text in input]
+
+
+def expected(text):
+    return [float(len(text)), float(ord(text[0]))]
+
+
+def test_cache_serves_stored_embeddings_across_instances(tmp_path):
+    embedder = CharEmbedding()
+    cache = CachedEmbeddingFunction(embedder, cache_dir=str(tmp_path))
+    assert [v.tolist() for v in cache(["apple", "kiwi", "apple"])] == [expected("apple"), expected("kiwi"), expected("apple")]
+    assert embedder.embedded == ["apple", "kiwi"]
+
+    reloaded = CachedEmbeddingFunction(CharEmbedding(), cache_dir=str(tmp_path))
+    assert [v.tolist() for v in reloaded(["kiwi"])] == [expected("kiwi")]
+    assert reloaded.stats()["hits"] == 1
+
+
+def test_instances_sharing_a_directory_keep_rows_aligned(tmp_path):
+    # Each instance stands in for a process with its own view of the files
+    first = CachedEmbeddingFunction(CharEmbedding(), cache_dir=str(tmp_path))
+    second = CachedEmbeddingFunction(CharEmbedding(), cache_dir=str(tmp_path))
+
+    first(["apple", "banana"])
+    second(["cherry", "apple"])
+    first(["damson"])
+
+    texts = ["apple", "banana", "cherry", "damson"]
+    for cache in (first, second, CachedEmbeddingFunction(CharEmbedding(), cache_dir=str(tmp_path))):
+        assert [v.tolist() for v in cache(texts)] == [expected(text) for text in texts]
+    assert len(CachedEmbeddingFunction(CharEmbedding(), cache_dir=str(tmp_path))) == 4
+
+
+def test_concurrent_appends_keep_rows_aligned(tmp_path):
+    caches = [CachedEmbeddingFunction(CharEmbedding(), cache_dir=str(tmp_path)) for _ in range(4)]
+    words = [chr(ord("a") + i) * (i + 1) for i in range(26)]
+
+    def embed(cache, offset):
+        for i in range(len(words)):
+            cache([words[(i + offset) % len(words)]])
+
+    threads = [threading.Thread(target=embed, args=(cache, 7 * i)) for i, cache in enumerate(caches)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    reloaded = CachedEmbeddingFunction(CharEmbedding(), cache_dir=str(tmp_path))
+    assert np.array(reloaded(words)).tolist() == [expected(word) for word in words]
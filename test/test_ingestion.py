@@ -0,0 +1,91 @@
+import json
+import threading
+
+import pytest
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+from hey_steve.rag.rag import SteveRAG
+
+
+class HashEmbedding(EmbeddingFunction[Documents]):
+    """A deterministic stand-in embedding, counting the texts it embeds."""
+
+    def __init__(self):
+        self.embedded = 0
+
+    def __call__(self, input: Documents) -> Embeddings:
+        self.embedded += len(input)
+        return [[float(len(text)), float(sum(map(ord, text)) % 97), 1.0] for text in input]
+
+
+class FailingEmbedding(EmbeddingFunction[Documents]):
+    def __call__(self, input: Documents) -> Embeddings:
+        raise RuntimeError("model crashed")
+
+
+def write_chunks(directory, name, chunks):
+    directory.mkdir(exist_ok=True)
+    (directory / name).write_text(json.dumps(chunks))
+
+
+def make_rag(tmp_path, embedding_function=None):
+    return SteveRAG(collection_name="test_chunks", embedding_function=embedding_function or HashEmbedding(),
+                    persist_directory=str(tmp_path / "chroma"))
+
+
+def test_embedding_errors_stop_the_reader(tmp_path):
+    chunks_dir = tmp_path / "chunks"
+    for i in range(20):
+        write_chunks(chunks_dir, f"page_{i:02}.json", [f"chunk {i} {j}" for j in range(4)])
+    steve_rag = make_rag(tmp_path, FailingEmbedding())
+
+    with pytest.raises(RuntimeError, match="model crashed"):
+        steve_rag.load_chunks_into_rag(str(chunks_dir), embed_batch_size=1, prefetch_batches=1)
+    assert not any(thread.name == "chunk-reader" for thread in threading.enumerate())
+
+
+def collection_texts(steve_rag):
+    return sorted(text.removeprefix("search_document: ") for text in steve_rag.collection.get()["documents"])
+
+
+def test_reindexing_only_embeds_changes_and_removes_stale_chunks(tmp_path):
+    chunks_dir = tmp_path / "chunks"
+    write_chunks(chunks_dir, "stone.json", ["Stone is a block.", "Stone drops cobblestone."])
+    write_chunks(chunks_dir, "dirt.json", ["Dirt is a block."])
+    write_chunks(chunks_dir, "sand.json", ["Sand falls."])
+    embedding = HashEmbedding()
+    steve_rag = make_rag(tmp_path, embedding)
+
+    first = steve_rag.load_chunks_into_rag(str(chunks_dir))
+    assert first["documents"] == 4 and embedding.embedded == 4
+    ids = set(steve_rag.collection.get()["ids"])
+
+    # Reloading unchanged sources embeds nothing and keeps the content-hashed IDs
+    again = make_rag(tmp_path, embedding).load_chunks_into_rag(str(chunks_dir))
+    assert again["documents"] == 0 and again["unchanged_files"] == 3 and embedding.embedded == 4
+    assert set(steve_rag.collection.get()["ids"]) == ids
+
+    write_chunks(chunks_dir, "stone.json", ["Stone is a block.", "Stone is mined with a pickaxe."])
+    (chunks_dir / "sand.json").unlink()
+    changed = make_rag(tmp_path, embedding).load_chunks_into_rag(str(chunks_dir))
+    assert changed == {**changed, "documents": 1, "deleted": 2, "unchanged_files": 1}
+    assert embedding.embedded == 5
+    assert collection_texts(steve_rag) == ["Dirt is a block.", "Stone is a block.", "Stone is mined with a pickaxe."]
+
+    manifest = json.loads((tmp_path / "chroma" / "test_chunks_manifest.json").read_text())
+    assert set(manifest["directories"][str(chunks_dir)]) == {"stone.json", "dirt.json"}
+
+
+def test_directories_loaded_into_one_collection_keep_their_chunks(tmp_path):
+    write_chunks(tmp_path / "chunks", "stone.json", ["Stone is a block."])
+    write_chunks(tmp_path / "chunks_custom", "notes.json", ["Creepers fear cats."])
+    steve_rag = make_rag(tmp_path)
+
+    steve_rag.load_chunks_into_rag(str(tmp_path / "chunks"))
+    result = steve_rag.load_chunks_into_rag(str(tmp_path / "chunks_custom"))
+    assert result["deleted"] == 0
+    assert collection_texts(steve_rag) == ["Creepers fear cats.", "Stone is a block."]
+
+    (tmp_path / "chunks_custom" / "notes.json").unlink()
+    steve_rag.load_chunks_into_rag(str(tmp_path / "chunks_custom"))
+    assert collection_texts(steve_rag) == ["Stone is a block."]
@@ -0,0 +1,72 @@
+import asyncio
+import io
+import threading
+
+import pytest
+
+from hey_steve.rag.lazy import LazyHandle, StartupReport
+
+
+def test_handle_loads_in_background_and_warms_up():
+    release = threading.Event()
+    warmed = []
+    report = StartupReport(stream=io.StringIO())
+
+    def factory():
+        release.wait()
+        return "model"
+
+    handle = LazyHandle("model", factory, warm_up=lambda value: warmed.append(value) or {"embed": 0.5},
+                        report=report)
+    assert handle.state == "pending"
+    handle.start()
+    assert handle.state == "loading"
+    with pytest.raises(TimeoutError):
+        handle.get(timeout=0.01)
+    assert not handle.wait(timeout=0.01)
+
+    release.set()
+    assert handle.get(timeout=5) == "model"
+    assert handle.ready and warmed == ["model"]
+    phases = report.as_dict()["components"]["model"]
+    assert set(phases) == {"load", "warm_up", "warm_up.embed"} and phases["warm_up.embed"] == 0.5
+
+
+def test_get_starts_loading_and_raises_the_load_error():
+    def factory():
+        raise OSError("model not found")
+
+    handle = LazyHandle("model", factory)
+    with pytest.raises(OSError, match="model not found"):
+        handle.get(timeout=5)
+    assert handle.state == "failed" and isinstance(handle.error, OSError)
+
+
+def test_aget_timeout_does_not_cancel_loading():
+    release = threading.Event()
+    handle = LazyHandle("model", lambda: release.wait() and "model").start()
+
+    async def wait_twice():
+        with pytest.raises(TimeoutError):
+            await handle.aget(timeout=0.01)
+        release.set()
+        return await handle.aget(timeout=5)
+
+    assert asyncio.run(wait_twice()) == "model"
+
+
+def test_report_prints_once_every_handle_is_done():
+    stream = io.StringIO()
+    report = StartupReport(stream=stream)
+    with report.stage("mc_data"):
+        pass
+    handle = LazyHandle("steve_rag", lambda: "rag", report=report).start()
+    report.print_when_ready([handle])
+    handle.get(timeout=5)
+
+    for _ in range(100):
+        if "all_ready" in stream.getvalue():
+            break
+        threading.Event().wait(0.01)
+    output = stream.getvalue()
+    assert "mc_data" in output and "steve_rag" in output and "all_ready" in output
@@ -0,0 +1,31 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "hey_steve", "processing"))
+
+from markdown_cleanup import DEFAULT_STAGES, clean_markdown, iter_segments  # noqa: E402
+
+GOLDEN_DIR = os.path.join(os.path.dirname(__file__), "golden")
+
+
+def read_golden(name):
+    # newline='' keeps the '\r\n' lines of the input as they are
+    with open(os.path.join(GOLDEN_DIR, name), "r", encoding="utf-8", newline="") as f:
+        return f.read()
+
+
+def test_clean_markdown_matches_golden_file():
+    """The expected file was produced by the previous chain remove_unwanted_heading_2,
+    remove_json_blocks, remove_junk_content and replace_weird_unicode."""
+    markdown_content = read_golden("markdown_cleanup_input.md")
+    assert clean_markdown(markdown_content) == read_golden("markdown_cleanup_expected.md")
+
+
+def test_clean_markdown_does_not_depend_on_segment_size():
+    markdown_content = read_golden("markdown_cleanup_input.md")
+    expected = read_golden("markdown_cleanup_expected.md")
+    for size in (1, 7, 64):
+        segments = iter_segments(markdown_content, size)
+        for stage in DEFAULT_STAGES:
+            segments = stage(segments)
+        assert "".join(segments) == expected
@@ -0,0 +1,81 @@
+import json
+
+from hey_steve.agents_and_tools import mc_data_store
+from hey_steve.agents_and_tools.mc_data_store import McDataStore, normalize_loot_table, normalize_recipe
+
+
+def write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data))
+
+
+def make_data_dirs(tmp_path):
+    write_json(tmp_path / "recipe" / "stick.json", {
+        "type": "minecraft:crafting_shaped", "pattern": ["#", "#"],
+        "key": {"#": {"tag": "minecraft:planks"}}, "result": {"id": "minecraft:stick", "count": 4}})
+    write_json(tmp_path / "loot_table" / "blocks" / "dirt.json", {
+        "type": "minecraft:block", "pools": [{"rolls": 1, "entries": [{"type": "minecraft:item", "name": "minecraft:dirt"}]}]})
+    write_json(tmp_path / "tags" / "planks.json", {"values": ["minecraft:oak_planks"]})
+    return dict(recipe_dir=str(tmp_path / "recipe"), loot_table_dir=str(tmp_path / "loot_table"),
+                tag_dir=str(tmp_path / "tags"), cache_path=str(tmp_path / "store.json"))
+
+
+def test_recipe_results_are_normalized_in_every_format():
+    modern = normalize_recipe({"type": "minecraft:crafting_shapeless", "ingredients": ["minecraft:oak_log"],
+                               "result": {"id": "minecraft:oak_planks", "count": 4}})
+    legacy = normalize_recipe({"type": "minecraft:smelting", "ingredient": {"item": "minecraft:raw_iron"},
+                               "result": {"item": "minecraft:iron_ingot"}, "experience": 0.7})
+    stonecutting = normalize_recipe({"type": "minecraft:stonecutting", "ingredient": {"item": "minecraft:stone"},
+                                     "result": "minecraft:stone_slab", "count": 2})
+
+    assert modern == {"type": "crafting_shapeless", "result": ["oak_planks", 4], "ingredients": [["oak_log"]]}
+    assert legacy == {"type": "smelting", "result": ["iron_ingot", 1], "ingredient": ["raw_iron"], "experience": 0.7}
+    assert stonecutting == {"type": "stonecutting", "result": ["stone_slab", 2], "ingredient": ["stone"]}
+
+
+def test_load_rebuilds_the_cache_when_files_or_version_change(tmp_path, monkeypatch):
+    dirs = make_data_dirs(tmp_path)
+    assert set(McDataStore.load(**dirs).recipes) == {"stick"}
+
+    # A fresh cache is served as is, so an edit to it shows up
+    cache = json.loads((tmp_path / "store.json").read_text())
+    cache["recipes"]["stick"]["result"] = ["cached_stick", 4]
+    (tmp_path / "store.json").write_text(json.dumps(cache))
+    assert McDataStore.load(**dirs).recipes["stick"]["result"] == ["cached_stick", 4]
+
+    monkeypatch.setattr(mc_data_store, "STORE_VERSION", mc_data_store.STORE_VERSION + 1)
+    assert McDataStore.load(**dirs).recipes["stick"]["result"] == ["stick", 4]
+    assert json.loads((tmp_path / "store.json").read_text())["version"] == mc_data_store.STORE_VERSION
+
+    write_json(tmp_path / "recipe" / "torch.json", {
+        "type": "minecraft:crafting_shaped", "pattern": ["c", "#"],
+        "key": {"c": {"item": "minecraft:coal"}, "#": {"item": "minecraft:stick"}}, "result": {"id": "minecraft:torch", "count": 4}})
+    assert set(McDataStore.load(**dirs).recipes) == {"stick", "torch"}
+
+
+def test_recipes_and_loot_tables_are_rendered_as_text(tmp_path):
+    store = McDataStore.load(**make_data_dirs(tmp_path))
+    assert store.render_recipe("stick") == "\n".join([
+        "Recipe stick (crafting_shaped)",
+        "result: stick x4",
+        "pattern (3x3 crafting grid, ' ' is empty):",
+        "  #",
+        "  #",
+        "  # = any #planks",
+        "The shape can be placed anywhere in the grid as long as it stays intact."])
+    assert store.render_recipe("torch") is None
+
+    loot_table = normalize_loot_table({"type": "minecraft:block", "pools": [{
+        "rolls": {"type": "minecraft:uniform", "min": 1, "max": 2},
+        "conditions": [{"condition": "minecraft:survives_explosion"}],
+        "entries": [{"type": "minecraft:item", "name": "minecraft:flint", "weight": 1,
+                     "functions": [{"function": "minecraft:apply_bonus", "enchantment": "minecraft:fortune"}]},
+                    {"type": "minecraft:item", "name": "minecraft:gravel", "weight": 9}]}]})
+    store.loot_tables["blocks/gravel"] = loot_table
+    assert store.render_loot_table("blocks/gravel") == "\n".join([
+        "Loot table blocks/gravel (block)",
+        "Pool 1, rolls 1-2, only if survives_explosion:",
+        "  - flint (weight 1/10, +fortune bonus)",
+        "  - gravel (weight 9/10)"])
+    assert store.render_loot_table("blocks/dirt") == "\n".join([
+        "Loot table blocks/dirt (block)", "Pool 1, rolls 1:", "  - dirt"])
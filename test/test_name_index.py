@@ -0,0 +1,44 @@
+from fuzzywuzzy import fuzz
+
+from hey_steve.agents_and_tools.name_index import NameIndex
+
+NAMES = ["oak_planks", "oak_door", "oak_log", "dark_oak_planks", "dark_oak_fence_gate", "stick",
+         "netherite_ingot", "iron_ingot", "gold_ingot", "netherite_upgrade_smithing_template",
+         "diamond_pickaxe", "iron_pickaxe", "cobblestone", "stone", "stone_bricks", "crafting_table"]
+
+
+def full_scan(query, limit=10, min_score=50):
+    """The reference: WRatio over every name, with the same whole-word bonus and tie-breaks as the index."""
+    tokens = set(query.split("_"))
+    scored = [(fuzz.WRatio(query.replace("_", " "), name.replace("_", " "))
+               + 10 * bool(tokens & set(name.split("_"))), name) for name in NAMES]
+    scored = [(score, name) for score, name in scored if score >= min_score]
+    scored.sort(key=lambda x: (-x[0], len(x[1]), x[1]))
+    return [name for _, name in scored[:limit]]
+
+
+def test_search_matches_a_full_scan_on_its_top_results():
+    index = NameIndex({name: [f"{name}.json"] for name in NAMES})
+    for query in ("oak", "netherite_ingto", "pickaxe", "stone_brick", "crafting", "dark_oak_fence"):
+        results = index.search(query)
+        reference = full_scan(query, limit=len(NAMES))
+        assert results[0] == reference[0], query
+        # The index only skips weak resemblances; what it returns is ranked like the full scan
+        assert results == [name for name in reference if name in results], query
+
+
+def test_candidates_come_from_tokens_and_trigrams():
+    index = NameIndex({name: [f"{name}.json"] for name in NAMES})
+    # A whole word selects every name containing it
+    assert set(index.search("oak")) >= {"oak_planks", "oak_door", "oak_log", "dark_oak_planks", "dark_oak_fence_gate"}
+    # A misspelling shares enough trigrams
+    assert index.search("netherite_ingto")[0] == "netherite_ingot"
+    # Nothing in common, nothing returned
+    assert index.search("zzzz") == []
+
+
+def test_results_are_capped_and_exact_names_found():
+    index = NameIndex({name: [f"{name}.json"] for name in NAMES})
+    assert len(index.search("oak", limit=2)) == 2
+    assert "stick" in index and index.paths("stick") == ["stick.json"]
+    assert index.paths("creeper") is None
@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+from hey_steve.rag import query_cache as query_cache_module
+from hey_steve.rag.query_cache import QueryCache
+from hey_steve.rag.rag import SteveRAG
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def use_fake_clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(query_cache_module, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    clock = use_fake_clock(monkeypatch)
+    cache = QueryCache(ttl=10.0)
+    key = cache.make_key("query", "What is a creeper?", 5, 0)
+    cache.put(key, [{"id": "1"}])
+
+    clock.now = 10.0
+    assert cache.get(cache.make_key("query", "what is a  creeper", 5, 0)) == [{"id": "1"}]
+    clock.now = 10.5
+    assert cache.get(key) is None
+    assert cache.stats() == {"size": 0, "hits": 1, "misses": 1, "evictions": 0, "hit_rate": 0.5}
+
+
+def test_least_recently_used_entries_are_evicted(monkeypatch):
+    use_fake_clock(monkeypatch)
+    cache = QueryCache(max_size=2, ttl=None)
+    cache.put("a", [{"id": "a"}])
+    cache.put("b", [{"id": "b"}])
+    cache.get("a")
+    cache.put("c", [{"id": "c"}])
+
+    assert cache.get("b") is None
+    assert cache.get("a") == [{"id": "a"}] and cache.get("c") == [{"id": "c"}]
+    assert cache.stats()["evictions"] == 1
+
+
+class CountingEmbedding(EmbeddingFunction[Documents]):
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, input: Documents) -> Embeddings:
+        self.calls += 1
+        return [[float(len(text)), 1.0] for text in input]
+
+
+def test_writes_invalidate_cached_results(tmp_path):
+    embedding = CountingEmbedding()
+    query_cache = QueryCache()
+    steve_rag = SteveRAG(collection_name="test_cache", embedding_function=embedding,
+                         persist_directory=str(tmp_path), query_cache=query_cache)
+    steve_rag.add_documents([{"text": "Stone is a block.", "metadata": {"source": "stone"}}])
+    version = steve_rag.collection_version
+
+    first = steve_rag.query("stone", n_results=2)
+    calls = embedding.calls
+    assert steve_rag.query("Stone?", n_results=2) == first and embedding.calls == calls
+
+    steve_rag.add_documents([{"text": "Dirt is a block.", "metadata": {"source": "dirt"}}])
+    assert steve_rag.collection_version > version and query_cache.stats()["size"] == 0
+    assert len(steve_rag.query("stone", n_results=2)) == 2
@@ -0,0 +1,33 @@
+import pytest
+
+from hey_steve.agents_and_tools.mc_data_store import McDataStore
+from hey_steve.agents_and_tools.recipe_graph import RecipeGraph
+
+
+def make_graph() -> RecipeGraph:
+    recipes = {
+        "oak_planks": {"type": "crafting_shapeless", "result": ["oak_planks", 4], "ingredients": [["#oak_logs"]]},
+        "stick": {"type": "crafting_shaped", "result": ["stick", 4], "pattern": ["#", "#"],
+                  "key": {"#": ["#planks"]}},
+        "iron_ingot": {"type": "smelting", "result": ["iron_ingot", 1], "ingredient": ["raw_iron"]},
+    }
+    tags = {"oak_logs": ["oak_log", "oak_wood"], "planks": ["oak_planks"]}
+    return RecipeGraph(McDataStore(recipes, {}, tags))
+
+
+def test_raw_materials_are_known_items_without_a_recipe():
+    graph = make_graph()
+    assert graph.is_raw_material("oak_log")
+    assert graph.is_raw_material("raw_iron")
+    assert not graph.is_raw_material("stick")
+    assert not graph.is_raw_material("diamond_sword")
+
+
+def test_resolve_reuses_leftovers_and_rejects_counts_below_one():
+    graph = make_graph()
+    result = graph.resolve("stick", 5)
+    assert result["raw_materials"] == {"oak_log": 1}
+    assert result["leftovers"] == {"stick": 3}
+
+    with pytest.raises(ValueError):
+        graph.resolve("stick", -1)
@@ -0,0 +1,98 @@
+import numpy as np
+
+from hey_steve.rag import reranker as reranker_module
+from hey_steve.rag.reranker import Reranker
+from hey_steve.rag.reranker_service import RerankerService
+from hey_steve.rag.score_cache import ScoreCache
+
+
+class WordTokenizer:
+    """A stand-in tokenizer with one token per word, plus a start and an end token."""
+
+    def __call__(self, queries, docs, truncation, max_length):
+        lengths = [min(len(query.split()) + len(doc.split()) + 2, max_length) for query, doc in zip(queries, docs)]
+        return {"input_ids": [[1] * length for length in lengths],
+                "attention_mask": [[1] * length for length in lengths]}
+
+    def pad(self, features, return_tensors):
+        width = max(map(len, features["input_ids"]))
+        return {key: np.array([row + [0] * (width - len(row)) for row in rows])
+                for key, rows in features.items()}
+
+
+class TokenCountModel:
+    """Scores a pair by its number of tokens and records the lengths of every batch."""
+
+    def __init__(self):
+        self.tokenizer = WordTokenizer()
+        self.batches = []
+
+    def predict(self, pairs, **kwargs):
+        raise AssertionError("pairs are tokenized once and scored with score_features")
+
+    def score_features(self, features):
+        lengths = features["attention_mask"].sum(axis=1)
+        self.batches.append(lengths.tolist())
+        return lengths.astype(np.float32)
+
+
+def make_reranker(monkeypatch, **kwargs):
+    model = TokenCountModel()
+    monkeypatch.setattr(reranker_module, "load_cross_encoder", lambda *args, **kw: model)
+    return Reranker(**kwargs), model
+
+
+def test_pairs_are_scored_by_length_and_returned_in_order(monkeypatch):
+    reranker, model = make_reranker(monkeypatch, max_length=8, batch_size=2)
+    pairs = [["q", "a b c d"], ["q", "a"], ["q", "a b c d e f g h i"], ["q", "a b"]]
+
+    scores = reranker.calculate_scores(pairs)
+
+    assert scores.tolist() == [7, 4, 8, 5]
+    assert model.batches == [[4, 5], [7, 8]]
+    # One pad token per batch
+    assert reranker.padding_stats() == {"tokens": 24, "pad_tokens": 2, "padding_ratio": 2 / 26}
+
+
+def test_cached_pairs_are_not_rescored(monkeypatch):
+    reranker, model = make_reranker(monkeypatch, score_cache=ScoreCache())
+    docs = [{"id": str(i), "text": " ".join("w" * i)} for i in range(1, 4)]
+
+    first = reranker.rerank_many(["What is a creeper?"], [docs])
+    second = reranker.rerank_many(["what is a creeper", "What is a zombie?"], [docs, docs[:1]])
+
+    assert [doc["id"] for doc in first[0]] == ["3", "2", "1"]
+    assert second[0] == first[0] and second[1] == docs[:1]
+    assert [len(lengths) for lengths in model.batches] == [3, 1]
+
+
+def test_service_forwards_scoring_to_its_reranker(monkeypatch):
+    reranker, model = make_reranker(monkeypatch, batch_size=2)
+    service = RerankerService(reranker)
+    try:
+        docs = [{"id": "1", "text": "a"}, {"id": "2", "text": "a b"}]
+        assert [doc["id"] for doc in service.rerank("q", docs)] == ["2", "1"]
+        assert service.calculate_scores([["q", "a b c"]]).tolist() == [6]
+        assert service.padding_stats() == reranker.padding_stats()
+    finally:
+        service.close()
+
+
+def test_service_merges_concurrent_jobs_into_one_batch(monkeypatch):
+    reranker, model = make_reranker(monkeypatch, batch_size=4)
+    service = RerankerService(reranker, max_wait=0.5)
+    try:
+        assert service.max_batch_pairs == 4
+        docs = [{"id": "1", "text": "a"}, {"id": "2", "text": "a b"}]
+        futures = [service.submit(f"query {i}", docs) for i in range(3)]
+        results = [future.result() for future in futures]
+    finally:
+        service.close()
+
+    assert [[doc["id"] for doc in reranked] for reranked in results] == [["2", "1"]] * 3
+    # The first two jobs fill the batch, the third one is carried over to the next
+    assert [len(lengths) for lengths in model.batches] == [4, 2]
+    metrics = service.metrics()
+    assert metrics["requests"] == 3 and metrics["pairs"] == 6 and metrics["batches"] == 2
+    assert metrics["batch_pairs_histogram"] == {2: 1, 4: 1}
+    assert metrics["avg_queue_wait"] > 0
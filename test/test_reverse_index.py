@@ -0,0 +1,73 @@
+import json
+
+from hey_steve.agents_and_tools import reverse_index
+from hey_steve.agents_and_tools.mc_data_store import McDataStore
+from hey_steve.agents_and_tools.reverse_index import ReverseIndex
+
+
+def make_store() -> McDataStore:
+    recipes = {
+        "stick": {"type": "crafting_shaped", "result": ["stick", 4], "pattern": ["#", "#"],
+                  "key": {"#": ["#planks"]}},
+        "crafting_table": {"type": "crafting_shaped", "result": ["crafting_table", 1], "pattern": ["##", "##"],
+                           "key": {"#": ["#planks"]}},
+        "chest": {"type": "crafting_shaped", "result": ["chest", 1], "pattern": ["###", "# #", "###"],
+                  "key": {"#": ["oak_planks", "#planks"]}},
+    }
+    loot_tables = {
+        "blocks/gravel": {"type": "block", "pools": [{"rolls": 1, "conditions": ["survives_explosion"], "entries": [
+            {"kind": "alternatives", "children": [
+                {"kind": "item", "name": "gravel", "conditions": ["match_tool silk_touch"]},
+                {"kind": "item", "name": "flint", "weight": 1, "bonus": ["fortune"]}]}]}]},
+        "chests/village": {"type": "chest", "pools": [{"rolls": [1, 3], "entries": [
+            {"kind": "item", "name": "flint", "weight": 1, "count": [1, 2]},
+            {"kind": "tag", "name": "planks", "weight": 3}]}]},
+    }
+    tags = {"planks": ["oak_planks", "#birch"], "birch": ["birch_planks"]}
+    return McDataStore(recipes, loot_tables, tags)
+
+
+def test_uses_list_tag_alternatives_once_per_recipe():
+    index = ReverseIndex.build(make_store())
+
+    assert index.uses["birch_planks"] == [["chest", "#planks"], ["crafting_table", "#planks"], ["stick", "#planks"]]
+    # An item listed directly and through a tag is used once, without the tag
+    assert index.uses["oak_planks"] == [["chest", None], ["crafting_table", "#planks"], ["stick", "#planks"]]
+    assert [name for name, _ in index.uses["#planks"]] == ["chest", "crafting_table", "stick"]
+    assert index.render_uses("oak_planks") == "\n".join([
+        "oak_planks is used in 3 recipes:",
+        "- chest (crafting_shaped) makes chest",
+        "- crafting_table (crafting_shaped) makes crafting_table, as any #planks",
+        "- stick (crafting_shaped) makes stick x4, as any #planks"])
+    assert index.render_uses("diamond") is None
+
+
+def test_drops_carry_chance_conditions_and_tag_members():
+    index = ReverseIndex.build(make_store())
+
+    assert index.drops["flint"] == [
+        {"source": "blocks/gravel", "pool": 1, "chance": 1.0, "rolls": 1, "bonus": ["fortune"],
+         "conditions": ["survives_explosion"]},
+        {"source": "chests/village", "pool": 1, "chance": 0.25, "rolls": [1, 3], "count": [1, 2], "conditions": []}]
+    assert index.drops["gravel"][0]["conditions"] == ["survives_explosion", "match_tool silk_touch"]
+    assert [drop["chance"] for drop in index.drops["birch_planks"]] == [0.75]
+    assert index.render_drops("flint") == "\n".join([
+        "flint can be dropped by 2 loot tables:",
+        "- blocks/gravel (pool 1, 100.0% per roll, rolls 1, +fortune bonus, if survives_explosion)",
+        "- chests/village (pool 1, 25.0% per roll, rolls 1-3, x1-2)"])
+    assert index.render_drops("stick") is None
+
+
+def test_load_rebuilds_the_cache_when_the_store_version_changes(tmp_path, monkeypatch):
+    store = make_store()
+    store.fingerprint = [[3, 1.0], [2, 1.0], [2, 1.0]]
+    cache_path = str(tmp_path / "reverse_index.json")
+    ReverseIndex.load(store, cache_path)
+
+    cache = json.loads((tmp_path / "reverse_index.json").read_text())
+    cache["uses"] = {"cached": [["stick", None]]}
+    (tmp_path / "reverse_index.json").write_text(json.dumps(cache))
+    assert set(ReverseIndex.load(store, cache_path).uses) == {"cached"}
+
+    monkeypatch.setattr(reverse_index, "STORE_VERSION", reverse_index.STORE_VERSION + 1)
+    assert "oak_planks" in ReverseIndex.load(store, cache_path).uses
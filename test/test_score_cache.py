@@ -0,0 +1,27 @@
+from hey_steve.rag.score_cache import ScoreCache
+
+
+def test_queries_share_scores_after_normalization():
+    cache = ScoreCache()
+    doc = {"id": "wiki/Creeper#0", "text": "search_document: Creepers explode."}
+    cache.put_many([cache.make_key(ScoreCache.query_hash("What is a creeper?"), doc)], [0.9])
+
+    key = cache.make_key(ScoreCache.query_hash("  what is a CREEPER "), doc)
+    other = cache.make_key(ScoreCache.query_hash("what is a zombie"), doc)
+    assert cache.get_many([key, other]) == [0.9, None]
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_chunks_without_id_are_keyed_by_text():
+    assert ScoreCache.chunk_id({"text": "a"}) == ScoreCache.chunk_id({"text": "a"})
+    assert ScoreCache.chunk_id({"text": "a"}) != ScoreCache.chunk_id({"text": "b"})
+
+
+def test_least_recently_used_scores_are_evicted():
+    cache = ScoreCache(max_size=2)
+    cache.put_many(["a", "b"], [1.0, 2.0])
+    cache.get_many(["a"])
+    cache.put_many(["c"], [3.0])
+
+    assert cache.get_many(["a", "b", "c"]) == [1.0, None, 3.0]
+    assert len(cache) == 2 and cache.stats()["evictions"] == 1
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from hey_steve.rag.telemetry import NOOP_SPAN, FileExporter, InMemoryExporter, Telemetry
+
+
+def test_disabled_telemetry_records_nothing():
+    telemetry = Telemetry()
+    assert telemetry.span("steve_rag.query", batch_size=1) is NOOP_SPAN
+    telemetry.count("steve_rag_queries_total")
+    telemetry.observe("steve_rag_query_batch_size", 4)
+    assert telemetry.metrics() == {"counters": [], "histograms": [], "gauges": []}
+
+
+def test_spans_nest_and_record_errors():
+    exporter = InMemoryExporter()
+    telemetry = Telemetry([exporter])
+    with telemetry.span("steve_rag.query", batch_size=2) as outer:
+        with telemetry.span("steve_rag.embed"):
+            pass
+        outer.set(cache_hits=1)
+    with pytest.raises(ValueError):
+        with telemetry.span("reranker.rerank"):
+            raise ValueError("bad pair")
+
+    embed, query, rerank = exporter.spans()
+    assert embed.parent_id == query.span_id and embed.trace_id == query.trace_id
+    assert query.parent_id is None
+    assert query.attributes == {"batch_size": 2, "cache_hits": 1}
+    assert rerank.parent_id is None and rerank.error == "ValueError: bad pair"
+    assert [span.name for span in exporter.spans("steve_rag.embed")] == ["steve_rag.embed"]
+
+
+def test_prometheus_rendering():
+    telemetry = Telemetry(enabled=True)
+    telemetry.count("steve_rag_queries_total", 3, kind="query")
+    telemetry.observe("steve_rag_query_batch_size", 3, buckets=(1, 4), kind="query")
+    telemetry.observe("steve_rag_query_batch_size", 8, buckets=(1, 4), kind="query")
+    telemetry.gauge("steve_rag_query_cache_entries", lambda: 7)
+
+    lines = telemetry.render_prometheus().splitlines()
+    assert 'steve_rag_queries_total{kind="query"} 3' in lines
+    assert 'steve_rag_query_batch_size_bucket{kind="query",le="1"} 0' in lines
+    assert 'steve_rag_query_batch_size_bucket{kind="query",le="4"} 1' in lines
+    assert 'steve_rag_query_batch_size_bucket{kind="query",le="+Inf"} 2' in lines
+    assert 'steve_rag_query_batch_size_count{kind="query"} 2' in lines
+    assert "steve_rag_query_cache_entries 7" in lines
+
+
+def test_file_exporter_writes_jsonl(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    telemetry = Telemetry([FileExporter(str(path))])
+    with telemetry.span("steve_rag.add_documents", documents=3):
+        pass
+    telemetry.shutdown()
+
+    (line,) = path.read_text().splitlines()
+    span = json.loads(line)
+    assert span["name"] == "steve_rag.add_documents"
+    assert span["attributes"] == {"documents": 3} and span["duration_ms"] >= 0
@@ -0,0 +1,66 @@
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "hey_steve", "processing"))
+
+from token_splitter import TokenBudgetSplitter, token_histogram  # noqa: E402
+
+
+class WordTokenizer:
+    """Tokenizes words and punctuation, returning offset mappings like a fast tokenizer."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, texts, add_special_tokens=False, return_offsets_mapping=True):
+        self.calls += 1
+        return {"offset_mapping": [[m.span() for m in re.finditer(r"\w+|[^\w\s]", text)] for text in texts]}
+
+
+def test_short_sections_are_kept_whole():
+    splitter = TokenBudgetSplitter(WordTokenizer(), target_tokens=20, overlap_tokens=2)
+    [[piece]] = splitter.split_sections([("Content of Stone. ", "Stone is a block.")])
+    assert piece == {"header": "Content of Stone. ", "text": "Stone is a block.", "start": 0, "end": 17, "tokens": 9}
+
+
+def test_long_sections_fit_the_budget_and_split_at_separators():
+    tokenizer = WordTokenizer()
+    splitter = TokenBudgetSplitter(tokenizer, target_tokens=24, overlap_tokens=4)
+    sentence = "Stone can be mined with any pickaxe. "
+    content = sentence * 6 + "\n\n" + sentence * 6
+    sections = [("Content of Stone. ", content), ("", "Short.")]
+    pieces, short = splitter.split_sections(sections)
+
+    assert tokenizer.calls == 1
+    assert short[0]["tokens"] == 2
+    assert len(pieces) > 2
+    for piece in pieces:
+        assert piece["tokens"] <= 24
+        assert content[piece["start"]:piece["end"]] == piece["text"]
+        # Pieces end at a sentence or paragraph break, not mid-sentence
+        assert piece["text"].endswith(".")
+    # Consecutive pieces overlap and together cover the whole section
+    assert pieces[0]["start"] == 0 and pieces[-1]["end"] == len(content.rstrip())
+    for previous, piece in zip(pieces, pieces[1:]):
+        assert piece["start"] < previous["end"]
+
+
+def test_long_headers_are_cut_to_fit_the_budget():
+    splitter = TokenBudgetSplitter(WordTokenizer(), target_tokens=20, overlap_tokens=2)
+    header = "Content of " + " > ".join(["Stone"] * 20) + ". "
+    content = "Stone can be mined with any pickaxe. " * 4
+    [pieces] = splitter.split_sections([(header, content)])
+
+    # The header is cut to 20 - (2 * 2 + 1) tokens, leaving 5 tokens of text per piece
+    assert {piece["header"] for piece in pieces} == {"Content of" + " Stone >" * 6 + " Stone"}
+    for piece in pieces:
+        assert piece["tokens"] <= 20
+    assert pieces[-1]["end"] == len(content.rstrip())
+
+
+def test_histogram_reports_budget_use():
+    report = token_histogram([10, 20, 40, 200], bin_size=32, max_length=256)
+    assert report.splitlines()[0].startswith("4 chunks, mean 67.5")
+    assert "26% of the 256 token budget used" in report
+    assert report.splitlines()[1].split()[:2] == ["0-31", "2"]